@@ -0,0 +1,22 @@
+"""
+Removal of abandoned cart lines.
+"""
+from django.utils import timezone
+from app.core.cleanup import delete_in_batches
+from .models import CartItem
+
+
+def expire_cart_items(older_than, batch_size=5000, pause=0.0, progress=None):
+    """
+    Delete cart lines not updated for older_than (a timedelta) in batches.
+
+    Oldest lines go first; lines that a live cart request holds are skipped
+    and left for the next run (see delete_in_batches). Returns
+    {'deleted', 'batches', 'seconds', 'rows_per_second'}.
+    """
+    # Граница фиксируется на старте, чтобы проход завершался
+    cutoff = timezone.now() - older_than
+    return delete_in_batches(
+        CartItem.objects.filter(updated_at__lt=cutoff), 'updated_at',
+        batch_size=batch_size, pause=pause, progress=progress,
+    )
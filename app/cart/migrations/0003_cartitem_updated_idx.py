@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 07:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cartitem',
+            index=models.Index(fields=['updated_at'], name='cartitem_updated_idx'),
+        ),
+    ]
@@ -9,6 +9,16 @@ from app.products.models import Product
 User = get_user_model()
 
 
+def line_total():
+    """
+    Database expression for the price of a cart line: quantity * product price.
+    """
+    return models.ExpressionWrapper(
+        models.F('quantity') * models.F('product__price'),
+        output_field=models.DecimalField(max_digits=12, decimal_places=2),
+    )
+
+
 class CartItem(models.Model):
     """
     Cart item model.
@@ -38,6 +48,10 @@ class CartItem(models.Model):
         verbose_name_plural = 'Элементы корзины'
         unique_together = ['user', 'product']
         ordering = ['-added_at']
+        indexes = [
+            # Удаление брошенных корзин (см. cleanup.py)
+            models.Index(fields=['updated_at'], name='cartitem_updated_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.product.name} x{self.quantity}"
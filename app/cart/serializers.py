@@ -2,11 +2,12 @@
 Cart serializers for the shop.
 """
 from rest_framework import serializers
+from app.core.serializers import MAX_ID, SparseFieldsMixin
 from .models import CartItem
 from app.products.serializers import ProductSerializer
 
 
-class CartItemSerializer(serializers.ModelSerializer):
+class CartItemSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """
     Cart item serializer.
     """
@@ -21,12 +22,19 @@ class CartItemSerializer(serializers.ModelSerializer):
             'total_price', 'added_at', 'updated_at'
         ]
         read_only_fields = ['id', 'added_at', 'updated_at']
+        expandable_fields = ['product']
+        only_requires = {'total_price': ['quantity', 'product__price']}
 
 
 class CartItemCreateSerializer(serializers.ModelSerializer):
     """
     Cart item create serializer.
+
+    The product is taken by id: its activity and stock are checked by the
+    cart upsert itself (see CartService.add_item).
     """
+    product = serializers.IntegerField(min_value=1, max_value=MAX_ID)
+
     class Meta:
         model = CartItem
         fields = ['product', 'quantity']
@@ -36,20 +44,6 @@ class CartItemCreateSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Количество должно быть положительным")
         return value
 
-    def validate(self, attrs):
-        product = attrs['product']
-        quantity = attrs['quantity']
-        
-        if not product.is_active:
-            raise serializers.ValidationError("Товар не активен")
-        
-        if not product.has_sufficient_stock(quantity):
-            raise serializers.ValidationError(
-                f"Недостаточно товара на складе. Доступно: {product.stock_quantity}"
-            )
-        
-        return attrs
-
 
 class CartItemUpdateSerializer(serializers.ModelSerializer):
     """
@@ -76,10 +70,44 @@ class CartItemUpdateSerializer(serializers.ModelSerializer):
         return attrs
 
 
+class CartOperationSerializer(serializers.Serializer):
+    """
+    One operation of a batch cart change.
+
+    add increases the quantity of a product, set replaces it (0 removes the
+    line) and remove drops the line.
+    """
+    OPERATIONS = ['add', 'set', 'remove']
+
+    op = serializers.ChoiceField(choices=OPERATIONS)
+    product = serializers.IntegerField(min_value=1, max_value=MAX_ID)
+    quantity = serializers.IntegerField(required=False, min_value=0)
+
+    def validate(self, attrs):
+        quantity = attrs.get('quantity')
+        if attrs['op'] == 'add' and not quantity:
+            raise serializers.ValidationError("Количество должно быть положительным")
+        if attrs['op'] == 'set' and quantity is None:
+            raise serializers.ValidationError("Не указано количество")
+        return attrs
+
+
+class CartSummaryItemSerializer(serializers.Serializer):
+    """
+    Compact cart line for the summary: product name and price without nested objects.
+    """
+    id = serializers.IntegerField()
+    product_id = serializers.IntegerField()
+    name = serializers.CharField()
+    price = serializers.DecimalField(max_digits=10, decimal_places=2)
+    quantity = serializers.IntegerField()
+    total_price = serializers.DecimalField(max_digits=12, decimal_places=2)
+
+
 class CartSummarySerializer(serializers.Serializer):
     """
     Cart summary serializer.
     """
     total_items = serializers.IntegerField()
-    total_price = serializers.DecimalField(max_digits=10, decimal_places=2)
-    items = CartItemSerializer(many=True) 
\ No newline at end of file
+    total_price = serializers.DecimalField(max_digits=12, decimal_places=2)
+    items = CartSummaryItemSerializer(many=True) 
\ No newline at end of file
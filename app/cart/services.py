@@ -0,0 +1,326 @@
+"""
+Cart services for the shop.
+"""
+from decimal import Decimal
+from django.db import connection, transaction
+from django.db.models import F, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from app.products.models import Product
+from .models import CartItem, line_total
+
+# Вставка или увеличение количества одним запросом. Остаток проверяется в том же
+# запросе: для новой строки в SELECT, для существующей в условии DO UPDATE.
+ADD_ITEM_SQL = """
+INSERT INTO cart_cartitem (user_id, product_id, quantity, added_at, updated_at)
+SELECT %(user_id)s, p.id, %(quantity)s, %(now)s, %(now)s
+FROM products_product p
+WHERE p.id = %(product_id)s AND p.is_active AND p.stock_quantity >= %(quantity)s
+ON CONFLICT (user_id, product_id) DO UPDATE SET
+    quantity = cart_cartitem.quantity + EXCLUDED.quantity,
+    updated_at = EXCLUDED.updated_at
+WHERE cart_cartitem.quantity + EXCLUDED.quantity <= (
+    SELECT p.stock_quantity FROM products_product p WHERE p.id = EXCLUDED.product_id
+)
+RETURNING id, quantity
+"""
+
+# Новые строки пакетного изменения. Если параллельный add_item уже вставил ту же
+# строку, количества складываются, как в ADD_ITEM_SQL, и только в пределах остатка.
+INSERT_LINES_SQL = """
+INSERT INTO cart_cartitem (user_id, product_id, quantity, added_at, updated_at)
+SELECT %s, v.product_id, v.quantity, %s, %s
+FROM (VALUES {values}) AS v (product_id, quantity)
+ON CONFLICT (user_id, product_id) DO UPDATE SET
+    quantity = cart_cartitem.quantity + EXCLUDED.quantity,
+    updated_at = EXCLUDED.updated_at
+WHERE cart_cartitem.quantity + EXCLUDED.quantity <= (
+    SELECT p.stock_quantity FROM products_product p WHERE p.id = EXCLUDED.product_id
+)
+RETURNING product_id
+"""
+
+
+class CartService:
+    """
+    Service class for cart operations.
+    """
+
+    @staticmethod
+    def add_item(user, product_id, quantity):
+        """
+        Add quantity of a product to the user's cart.
+
+        Returns the cart item id and its new quantity. Raises ValueError if the
+        product is missing or inactive, or if the cart would exceed its stock.
+        """
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(ADD_ITEM_SQL, {
+                    'user_id': user.pk,
+                    'product_id': product_id,
+                    'quantity': quantity,
+                    'now': timezone.now(),
+                })
+                row = cursor.fetchone()
+            if row is None:
+                raise ValueError(CartService._add_error(user, product_id, quantity))
+            return row
+
+        with transaction.atomic():
+            # Без ON CONFLICT строка товара блокируется, чтобы параллельные
+            # добавления выполнялись по очереди
+            product = (
+                Product.objects.select_for_update().filter(pk=product_id)
+                .only('id', 'is_active', 'stock_quantity').first()
+            )
+            item = CartItem.objects.filter(user=user, product_id=product_id).first()
+            in_cart = item.quantity if item else 0
+            if product is None or not product.is_active or not product.has_sufficient_stock(in_cart + quantity):
+                raise ValueError(CartService._add_error(user, product_id, quantity))
+            if item is None:
+                item = CartItem.objects.create(user=user, product_id=product_id, quantity=quantity)
+            else:
+                item.quantity = in_cart + quantity
+                item.save(update_fields=['quantity', 'updated_at'])
+            return item.id, item.quantity
+
+    @staticmethod
+    def plan_operations(operations, products, current):
+        """
+        Resulting quantities of add/set/remove operations and their errors.
+
+        products maps product id to {'is_active', 'stock_quantity'}, current maps
+        product id to the quantity already in the cart. Returns
+        ({product_id: quantity}, errors) for the products touched; the final
+        quantity of each product is checked once and an error refers to the
+        last operation on it.
+        """
+        quantities = {}
+        last_index = {}
+        errors = []
+        for index, operation in enumerate(operations):
+            pk = operation['product']
+            if pk not in products:
+                # Строки удаленного товара в корзине уже нет
+                if operation['op'] != 'remove':
+                    errors.append({'index': index, 'product': pk, 'errors': {'product': ['Товар не найден']}})
+                continue
+            quantity = quantities.get(pk, current.get(pk, 0))
+            if operation['op'] == 'add':
+                quantities[pk] = quantity + operation['quantity']
+            elif operation['op'] == 'set':
+                quantities[pk] = operation['quantity']
+            else:
+                quantities[pk] = 0
+            last_index[pk] = index
+
+        for pk, index in last_index.items():
+            product, quantity = products[pk], quantities[pk]
+            if quantity and not product['is_active']:
+                errors.append({'index': index, 'product': pk, 'errors': {'product': ['Товар не активен']}})
+            elif quantity > product['stock_quantity']:
+                errors.append({'index': index, 'product': pk, 'errors': {'quantity': [
+                    f'Недостаточно товара на складе. Доступно: {product["stock_quantity"]}'
+                ]}})
+        return quantities, sorted(errors, key=lambda error: error['index'])
+
+    @staticmethod
+    def _products_with_cart(user, product_ids):
+        # Прочитанные строки корзины блокируются до конца транзакции: параллельный
+        # add_item по ним дождется записи и прибавит количество к новому значению
+        current = dict(
+            CartItem.objects.select_for_update().filter(user=user, product_id__in=product_ids)
+            .order_by('product_id').values_list('product_id', 'quantity')
+        )
+        products = {
+            row['id']: row for row in Product.objects.filter(pk__in=product_ids)
+            .values('id', 'is_active', 'stock_quantity')
+        }
+        return products, current
+
+    @staticmethod
+    def _write_lines(user, quantities, current):
+        """
+        Write planned quantities; returns ids of new lines that could not be merged.
+
+        Lines read under lock are overwritten. Lines that were not in the cart
+        are inserted on PostgreSQL so that a line added concurrently is summed
+        with them; if the sum exceeds stock the line is left as it is and its
+        product id is returned.
+        """
+        removed = [pk for pk, quantity in quantities.items() if not quantity and pk in current]
+        changed = {
+            pk: quantity for pk, quantity in quantities.items() if quantity and quantity != current.get(pk)
+        }
+        if removed:
+            CartItem.objects.filter(user=user, product_id__in=removed).delete()
+
+        rejected = []
+        if connection.vendor == 'postgresql':
+            added = {pk: quantity for pk, quantity in changed.items() if pk not in current}
+            changed = {pk: quantity for pk, quantity in changed.items() if pk in current}
+            if added:
+                rejected = CartService._insert_lines(user, added)
+        if changed:
+            CartItem.objects.bulk_create(
+                [CartItem(user=user, product_id=pk, quantity=quantity) for pk, quantity in changed.items()],
+                update_conflicts=True,
+                unique_fields=['user', 'product'],
+                update_fields=['quantity', 'updated_at'],
+            )
+        return rejected
+
+    @staticmethod
+    def _insert_lines(user, quantities):
+        now = timezone.now()
+        params = [user.pk, now, now]
+        for pk, quantity in quantities.items():
+            params.extend((pk, quantity))
+        values_sql = ', '.join(['(%s::bigint, %s::integer)'] * len(quantities))
+        with connection.cursor() as cursor:
+            cursor.execute(INSERT_LINES_SQL.format(values=values_sql), params)
+            written = {row[0] for row in cursor.fetchall()}
+        return [pk for pk in quantities if pk not in written]
+
+    @staticmethod
+    def apply_operations(user, operations):
+        """
+        Apply validated add/set/remove operations to the user's cart at once.
+
+        Current cart lines are locked and read with one query and products with
+        another; lines are then removed with one DELETE, existing ones updated
+        with one INSERT ... ON CONFLICT and new ones inserted with another.
+        Returns a list of per-operation errors; if it is not empty, nothing was
+        changed.
+        """
+        with transaction.atomic():
+            products, current = CartService._products_with_cart(
+                user, {operation['product'] for operation in operations}
+            )
+            quantities, errors = CartService.plan_operations(operations, products, current)
+            if errors:
+                return errors
+            rejected = CartService._write_lines(user, quantities, current)
+            if rejected:
+                # Параллельное добавление заняло остаток: пакет не применяется
+                transaction.set_rollback(True)
+                last_index = {operation['product']: index for index, operation in enumerate(operations)}
+                return sorted((
+                    {'index': last_index[pk], 'product': pk, 'errors': {'quantity': [
+                        f'Недостаточно товара на складе. Доступно: {products[pk]["stock_quantity"]}'
+                    ]}}
+                    for pk in rejected
+                ), key=lambda error: error['index'])
+        return []
+
+    @staticmethod
+    def merge_items(user, items):
+        """
+        Add {product_id: quantity} lines (e.g. an anonymous cart) to the user's cart.
+
+        Quantities are summed with the lines already in the cart and capped by
+        stock; missing and inactive products are skipped. Uses the same reads
+        and writes as apply_operations. Returns the number of lines changed.
+        """
+        with transaction.atomic():
+            products, current = CartService._products_with_cart(user, set(items))
+            quantities = {}
+            for pk, quantity in items.items():
+                product = products.get(pk)
+                if product is None or not product['is_active']:
+                    continue
+                merged = min(current.get(pk, 0) + quantity, product['stock_quantity'])
+                if merged > current.get(pk, 0):
+                    quantities[pk] = merged
+            rejected = CartService._write_lines(user, quantities, current)
+        return len(quantities) - len(rejected)
+
+    @staticmethod
+    def line_problem(line, expected_price=None):
+        """
+        (reason, message) if a cart line with product fields cannot be ordered, else None.
+        """
+        if not line['is_active']:
+            return 'inactive', f"Товар {line['name']} недоступен для заказа"
+        if line['stock_quantity'] < line['quantity']:
+            return 'insufficient_stock', (
+                f"Недостаточно товара {line['name']} на складе. Доступно: {line['stock_quantity']}"
+            )
+        if expected_price is not None and expected_price != line['price']:
+            return 'price_changed', (
+                f"Цена товара {line['name']} изменилась: {expected_price} -> {line['price']} руб."
+            )
+        return None
+
+    @staticmethod
+    def check_availability(user, expected_prices=None):
+        """
+        Check every line of the user's cart with one query.
+
+        expected_prices optionally maps product id to the price the customer
+        saw; lines whose current price differs are reported too. Returns
+        {'lines', 'problems', 'total_items', 'total_amount'}, where each problem
+        is a line with 'reason' (inactive, insufficient_stock, price_changed)
+        and a 'message' for the customer.
+        """
+        expected_prices = expected_prices or {}
+        lines = list(CartItem.objects.filter(user=user).values(
+            'id', 'product_id', 'quantity',
+            name=F('product__name'),
+            price=F('product__price'),
+            stock_quantity=F('product__stock_quantity'),
+            is_active=F('product__is_active'),
+        ))
+
+        problems = []
+        total_amount = Decimal('0')
+        for line in lines:
+            line['total_price'] = line['price'] * line['quantity']
+            total_amount += line['total_price']
+            problem = CartService.line_problem(line, expected_prices.get(line['product_id']))
+            if problem:
+                problems.append({**line, 'reason': problem[0], 'message': problem[1]})
+
+        return {
+            'lines': lines,
+            'problems': problems,
+            'total_items': sum(line['quantity'] for line in lines),
+            'total_amount': total_amount,
+        }
+
+    @staticmethod
+    def get_summary(user):
+        """
+        Cart totals and compact lines of the user's cart.
+        """
+        cart_items = CartItem.objects.filter(user=user)
+        # Итоги считаются в БД, строки читаются без объектов товара и категории
+        summary = cart_items.aggregate(
+            total_items=Coalesce(Sum('quantity'), 0),
+            total_price=Coalesce(Sum(line_total()), Decimal('0')),
+        )
+        summary['items'] = cart_items.values(
+            'id', 'product_id', 'quantity',
+            name=F('product__name'), price=F('product__price'), total_price=line_total(),
+        )
+        return summary
+
+    @staticmethod
+    def _add_error(user, product_id, quantity):
+        # Причина отказа выясняется только при ошибке, в основном пути запрос один
+        product = Product.objects.filter(pk=product_id).only('is_active', 'stock_quantity').first()
+        if product is None:
+            return 'Товар не найден'
+        if not product.is_active:
+            return 'Товар не активен'
+        in_cart = (
+            CartItem.objects.filter(user=user, product_id=product_id)
+            .values_list('quantity', flat=True).first() or 0
+        )
+        if in_cart:
+            return (
+                f'Недостаточно товара на складе. Доступно: {product.stock_quantity}, '
+                f'уже в корзине: {in_cart}'
+            )
+        return f'Недостаточно товара на складе. Доступно: {product.stock_quantity}'
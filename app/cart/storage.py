@@ -0,0 +1,217 @@
+"""
+Cart storage backends: database lines for users, cache entries for anonymous carts.
+"""
+import re
+import time
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from decimal import Decimal
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from app.products.models import Product
+from .models import CartItem
+from .services import CartService
+
+CART_TOKEN_HEADER = 'X-Cart-Token'
+
+_token_re = re.compile(r'^[0-9a-f]{32}$')
+
+
+class CartStorage(ABC):
+    """
+    Common interface of cart storages.
+    """
+    token = None
+
+    @abstractmethod
+    def items(self):
+        """
+        Cart lines as {product_id: quantity}.
+        """
+
+    @abstractmethod
+    def add(self, product_id, quantity):
+        """
+        Add quantity of a product; raises ValueError if it cannot be ordered.
+        """
+
+    @abstractmethod
+    def apply_operations(self, operations):
+        """
+        Apply add/set/remove operations at once; returns per-operation errors.
+        """
+
+    @abstractmethod
+    def summary(self):
+        """
+        Cart totals and compact lines, as CartSummarySerializer expects.
+        """
+
+    @abstractmethod
+    def clear(self):
+        """
+        Remove every line of the cart.
+        """
+
+
+class DatabaseCartStorage(CartStorage):
+    """
+    Durable cart of an authenticated user stored as CartItem rows.
+    """
+
+    def __init__(self, user):
+        self.user = user
+
+    def items(self):
+        return dict(CartItem.objects.filter(user=self.user).values_list('product_id', 'quantity'))
+
+    def add(self, product_id, quantity):
+        CartService.add_item(self.user, product_id, quantity)
+
+    def apply_operations(self, operations):
+        return CartService.apply_operations(self.user, operations)
+
+    def summary(self):
+        return CartService.get_summary(self.user)
+
+    def clear(self):
+        CartItem.objects.filter(user=self.user).delete()
+
+
+class CacheCartStorage(CartStorage):
+    """
+    Anonymous cart kept as one {product_id: quantity} entry in the cart cache.
+
+    Reads and writes do not touch the database except for one product query
+    to validate changes or render the summary. The entry expires
+    CART_ANONYMOUS_TTL seconds after the last change. Changes of one cart are
+    serialized with a lock entry, so concurrent requests with the same token
+    do not overwrite each other's lines.
+    """
+
+    def __init__(self, token):
+        self.token = token
+        self.key = f'cart:anonymous:{token}'
+        self.cache = caches[settings.CART_CACHE_ALIAS]
+
+    def items(self):
+        return self.cache.get(self.key) or {}
+
+    def _save(self, items):
+        if items:
+            self.cache.set(self.key, items, settings.CART_ANONYMOUS_TTL)
+        else:
+            self.cache.delete(self.key)
+
+    @contextmanager
+    def _locked(self):
+        lock_key = f'{self.key}:lock'
+        deadline = time.monotonic() + settings.CART_LOCK_TIMEOUT
+        locked = self.cache.add(lock_key, 1, timeout=settings.CART_LOCK_TIMEOUT)
+        # Блокировка упавшего запроса истекает сама, дольше ее срока не ждем
+        while not locked and time.monotonic() < deadline:
+            time.sleep(0.01)
+            locked = self.cache.add(lock_key, 1, timeout=settings.CART_LOCK_TIMEOUT)
+        try:
+            yield
+        finally:
+            if locked:
+                self.cache.delete(lock_key)
+
+    def add(self, product_id, quantity):
+        errors = self.apply_operations([{'op': 'add', 'product': product_id, 'quantity': quantity}])
+        if errors:
+            raise ValueError(next(iter(errors[0]['errors'].values()))[0])
+
+    def apply_operations(self, operations):
+        products = {
+            row['id']: row for row in Product.objects.filter(
+                pk__in={operation['product'] for operation in operations}
+            ).values('id', 'is_active', 'stock_quantity')
+        }
+        # Чтение, планирование и запись корзины под одной блокировкой токена
+        with self._locked():
+            items = self.items()
+            quantities, errors = CartService.plan_operations(operations, products, items)
+            if errors:
+                return errors
+            for pk, quantity in quantities.items():
+                if quantity:
+                    items[pk] = quantity
+                else:
+                    items.pop(pk, None)
+            self._save(items)
+        return []
+
+    def summary(self):
+        items = self.items()
+        products = Product.objects.filter(pk__in=items).only('id', 'name', 'price').in_bulk()
+        lines = []
+        # Позиции в порядке добавления, новые первыми, как у корзины в БД
+        for pk, quantity in reversed(list(items.items())):
+            product = products.get(pk)
+            if product is None:
+                continue
+            lines.append({
+                'id': None,
+                'product_id': pk,
+                'name': product.name,
+                'price': product.price,
+                'quantity': quantity,
+                'total_price': product.price * quantity,
+            })
+        return {
+            'total_items': sum(line['quantity'] for line in lines),
+            'total_price': sum((line['total_price'] for line in lines), Decimal('0')),
+            'items': lines,
+        }
+
+    def clear(self):
+        self.cache.delete(self.key)
+
+
+def get_cart_storage(request, create=False):
+    """
+    Storage of the current cart: the user's rows or the anonymous cart named
+    by the X-Cart-Token header.
+
+    With create=True a new token is issued to anonymous clients that have
+    none; otherwise such clients get an empty cart with token None.
+    """
+    if request.user.is_authenticated:
+        return DatabaseCartStorage(request.user)
+    token = request.headers.get(CART_TOKEN_HEADER, '').lower()
+    if not _token_re.match(token):
+        token = uuid.uuid4().hex if create else None
+    return CacheCartStorage(token)
+
+
+def attach_cart_token(response, storage):
+    """
+    Return the anonymous cart token to the client in the response header.
+    """
+    if storage.token:
+        response[CART_TOKEN_HEADER] = storage.token
+    return response
+
+
+def merge_anonymous_cart(request, user):
+    """
+    Move the anonymous cart named in the request into the user's cart.
+
+    Called on login, registration and checkout; returns the number of lines
+    changed.
+    """
+    token = request.headers.get(CART_TOKEN_HEADER, '').lower()
+    if not _token_re.match(token):
+        return 0
+    storage = CacheCartStorage(token)
+    items = storage.items()
+    if not items:
+        return 0
+    merged = CartService.merge_items(user, items)
+    # Анонимная корзина удаляется только после коммита слияния
+    transaction.on_commit(storage.clear)
+    return merged
@@ -8,6 +8,7 @@ from .views import (
     CartItemUpdateView,
     CartItemRemoveView,
     CartSummaryView,
+    CartBatchView,
     ClearCartView,
     UpdateCartItemQuantityView
 )
@@ -16,6 +17,7 @@ urlpatterns = [
     path('', CartListView.as_view(), name='cart-list'),
     path('add/', CartItemAddView.as_view(), name='cart-add'),
     path('summary/', CartSummaryView.as_view(), name='cart-summary'),
+    path('batch/', CartBatchView.as_view(), name='cart-batch'),
     path('clear/', ClearCartView.as_view(), name='cart-clear'),
     path('<int:pk>/update/', CartItemUpdateView.as_view(), name='cart-item-update'),
     path('<int:pk>/remove/', CartItemRemoveView.as_view(), name='cart-item-remove'),
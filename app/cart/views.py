@@ -2,25 +2,34 @@
 Cart views for the shop.
 """
 from rest_framework import generics, status
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 from rest_framework.views import APIView
+from django.conf import settings
+from django.db.models import Count, Max
 from django.shortcuts import get_object_or_404
+from app.core.conditional import conditional_get
+from app.core.views import SparseFieldsViewMixin
 from .models import CartItem
+from .storage import attach_cart_token, get_cart_storage
 from .serializers import (
     CartItemSerializer,
     CartItemCreateSerializer,
     CartItemUpdateSerializer,
+    CartOperationSerializer,
     CartSummarySerializer
 )
 
 
-class CartListView(generics.ListAPIView):
+class CartListView(SparseFieldsViewMixin, generics.ListAPIView):
     """
     Cart items list view.
     """
     serializer_class = CartItemSerializer
     permission_classes = [IsAuthenticated]
+    cursor_ordering = ('-added_at', 'id')
 
     def get_queryset(self):
         return CartItem.objects.filter(user=self.request.user).select_related('product', 'product__category')
@@ -29,24 +38,23 @@ class CartListView(generics.ListAPIView):
 class CartItemAddView(generics.CreateAPIView):
     """
     Add item to cart view.
+
+    Anonymous clients get a cart token in the X-Cart-Token response header
+    and send it back with later cart requests.
     """
     serializer_class = CartItemCreateSerializer
-    permission_classes = [IsAuthenticated]
-
-    def perform_create(self, serializer):
-        user = self.request.user
-        product = serializer.validated_data['product']
-        quantity = serializer.validated_data['quantity']
+    permission_classes = [AllowAny]
 
-        cart_item, created = CartItem.objects.get_or_create(
-            user=user,
-            product=product,
-            defaults={'quantity': quantity}
-        )
+    def create(self, request, *args, **kwargs):
+        self.storage = get_cart_storage(request, create=True)
+        return attach_cart_token(super().create(request, *args, **kwargs), self.storage)
 
-        if not created:
-            cart_item.quantity += quantity
-            cart_item.save()
+    def perform_create(self, serializer):
+        try:
+            self.storage.add(serializer.validated_data['product'], serializer.validated_data['quantity'])
+        except ValueError as e:
+            # Тот же формат ошибки, что и у проверок сериализатора
+            raise ValidationError({api_settings.NON_FIELD_ERRORS_KEY: [str(e)]})
 
 
 class CartItemUpdateView(generics.UpdateAPIView):
@@ -76,34 +84,72 @@ class CartItemRemoveView(generics.DestroyAPIView):
         return Response({'message': 'Товар удален из корзины'}, status=status.HTTP_200_OK)
 
 
+def cart_validators(view, request):
+    if not request.user.is_authenticated:
+        return None
+    state = CartItem.objects.filter(user=request.user).aggregate(
+        count=Count('id'),
+        items=Max('updated_at'),
+        products=Max('product__updated_at'),
+    )
+    # Без Last-Modified: после удаления позиции MAX(updated_at) может уменьшиться
+    return None, f"{state['count']}|{state['items']}|{state['products']}"
+
+
 class CartSummaryView(APIView):
     """
     Get cart summary.
     """
-    permission_classes = [IsAuthenticated]
+    permission_classes = [AllowAny]
 
+    @conditional_get(cart_validators)
     def get(self, request):
-        cart_items = CartItem.objects.filter(user=request.user).select_related('product')
-        total_items = sum(item.quantity for item in cart_items)
-        total_price = sum(item.total_price for item in cart_items)
+        storage = get_cart_storage(request)
+        return attach_cart_token(Response(CartSummarySerializer(storage.summary()).data), storage)
+
+
+class CartBatchView(APIView):
+    """
+    Apply many add/set/remove operations to the cart in one request.
 
-        data = {
-            'total_items': total_items,
-            'total_price': total_price,
-            'items': CartItemSerializer(cart_items, many=True).data
-        }
+    Either every operation is applied or none; the response is the resulting
+    cart summary.
+    """
+    permission_classes = [AllowAny]
 
-        return Response(CartSummarySerializer(data).data)
+    def post(self, request):
+        operations = request.data.get('operations') if isinstance(request.data, dict) else None
+        if not isinstance(operations, list) or not operations:
+            return Response({'error': 'Ожидается непустой список operations'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(operations) > settings.CART_BATCH_LIMIT:
+            return Response(
+                {'error': f'Не более {settings.CART_BATCH_LIMIT} операций за запрос'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        serializer = CartOperationSerializer(data=operations, many=True)
+        if not serializer.is_valid():
+            errors = [
+                {'index': index, 'errors': row_errors}
+                for index, row_errors in enumerate(serializer.errors) if row_errors
+            ]
+            return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        storage = get_cart_storage(request, create=True)
+        errors = storage.apply_operations(serializer.validated_data)
+        if errors:
+            return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+        return attach_cart_token(Response(CartSummarySerializer(storage.summary()).data), storage)
 
 
 class ClearCartView(APIView):
     """
     Clear all items from cart.
     """
-    permission_classes = [IsAuthenticated]
+    permission_classes = [AllowAny]
 
     def post(self, request):
-        CartItem.objects.filter(user=request.user).delete()
+        get_cart_storage(request).clear()
         return Response({'message': 'Корзина очищена'}, status=status.HTTP_200_OK)
 
 
@@ -0,0 +1,41 @@
+"""
+Batched removal of old rows for the cleanup commands.
+"""
+import time
+from django.db import transaction
+
+
+def delete_in_batches(queryset, order_field, batch_size=5000, pause=0.0, progress=None):
+    """
+    Delete the rows of queryset in batches, oldest order_field first.
+
+    Every batch is a short transaction of its own: the next rows are picked
+    through the order_field index with FOR UPDATE SKIP LOCKED, so rows that a
+    live request holds are skipped and left for the next run. progress, if
+    given, is called with the stats after each non-empty batch. Returns
+    {'deleted', 'batches', 'seconds', 'rows_per_second'}.
+    """
+    stats = {'deleted': 0, 'batches': 0, 'seconds': 0.0, 'rows_per_second': 0.0}
+    started = time.monotonic()
+
+    while True:
+        with transaction.atomic():
+            ids = list(
+                queryset.order_by(order_field).select_for_update(skip_locked=True)
+                .values_list('pk', flat=True)[:batch_size]
+            )
+            if ids:
+                deleted, _ = queryset.model.objects.filter(pk__in=ids).delete()
+                stats['deleted'] += deleted
+                stats['batches'] += 1
+        if progress and ids:
+            progress(stats)
+        if len(ids) < batch_size:
+            break
+        if pause:
+            time.sleep(pause)
+
+    elapsed = time.monotonic() - started
+    stats['seconds'] = round(elapsed, 2)
+    stats['rows_per_second'] = round(stats['deleted'] / elapsed, 1) if elapsed else 0.0
+    return stats
@@ -0,0 +1,41 @@
+"""
+Conditional GET support (ETag / Last-Modified) for API views.
+"""
+import hashlib
+from functools import wraps
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+def conditional_get(validators):
+    """
+    Answer GET requests with 304 when the client's copy is still current.
+
+    validators(view, request, *args, **kwargs) runs one cheap query and returns
+    (last_modified, token), or None if the object does not exist. The ETag is
+    built from the token, last_modified and the full path, so that responses
+    with different query parameters get different tags. last_modified may be
+    None when it cannot only grow (e.g. rows may be deleted).
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            result = validators(self, request, *args, **kwargs)
+            if result is None:
+                return method(self, request, *args, **kwargs)
+
+            last_modified, token = result
+            material = f'{request.get_full_path()}|{token}|{last_modified.isoformat() if last_modified else ""}'
+            etag = quote_etag(hashlib.md5(material.encode()).hexdigest())
+            timestamp = int(last_modified.timestamp()) if last_modified else None
+
+            response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+            if response is None:
+                response = method(self, request, *args, **kwargs)
+            if response.status_code in (200, 304):
+                response['ETag'] = etag
+                if timestamp is not None:
+                    response['Last-Modified'] = http_date(timestamp)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,104 @@
+"""
+Streaming CSV / NDJSON export helpers for admin endpoints.
+"""
+import csv
+import datetime
+import json
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+# Строк на одну выборку серверного курсора
+EXPORT_CHUNK_SIZE = 2000
+
+# Строки склеиваются в блоки примерно такого размера перед отправкой клиенту
+EXPORT_BUFFER_SIZE = 64 * 1024
+
+
+class _Echo:
+    """
+    File-like object that returns what csv.writer writes to it.
+    """
+
+    def write(self, value):
+        return value
+
+
+def _csv_lines(columns, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def _ndjson_lines(columns, rows):
+    for row in rows:
+        yield json.dumps(dict(zip(columns, row)), cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+
+EXPORT_FORMATS = {
+    'csv': (_csv_lines, 'text/csv; charset=utf-8'),
+    'ndjson': (_ndjson_lines, 'application/x-ndjson; charset=utf-8'),
+}
+
+
+def _buffered(lines):
+    buffer, size = [], 0
+    for line in lines:
+        buffer.append(line)
+        size += len(line)
+        if size >= EXPORT_BUFFER_SIZE:
+            yield ''.join(buffer).encode()
+            buffer, size = [], 0
+    if buffer:
+        yield ''.join(buffer).encode()
+
+
+def export_response(file_format, columns, rows, filename):
+    """
+    Stream rows (an iterable of tuples matching columns) as CSV or NDJSON.
+
+    rows should be lazy, e.g. values_list(...).iterator(chunk_size=...), so
+    memory use does not depend on the size of the export.
+    """
+    render, content_type = EXPORT_FORMATS[file_format]
+    response = StreamingHttpResponse(_buffered(render(columns, rows)), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{file_format}"'
+    return response
+
+
+def _parse_moment(value, param, end):
+    try:
+        day = parse_date(value)
+        moment = None if day else parse_datetime(value)
+    except ValueError:
+        day = moment = None
+    if day is not None:
+        # Дата без времени включает весь день
+        if end:
+            day += datetime.timedelta(days=1)
+        moment = datetime.datetime.combine(day, datetime.time.min)
+        lookup = 'lt' if end else 'gte'
+    elif moment is not None:
+        lookup = 'lte' if end else 'gte'
+    else:
+        raise ValueError(f'Некорректное значение {param}')
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return lookup, moment
+
+
+def date_range_filter(params, field, start_param='date_from', end_param='date_to'):
+    """
+    Build filter kwargs for a date range from ISO dates or datetimes in params.
+
+    Raises ValueError for values that cannot be parsed.
+    """
+    filters = {}
+    for param, end in ((start_param, False), (end_param, True)):
+        value = params.get(param)
+        if value:
+            lookup, moment = _parse_moment(value.strip(), param, end)
+            filters[f'{field}__{lookup}'] = moment
+    return filters
@@ -0,0 +1,93 @@
+"""
+Idempotency-Key support for unsafe API requests.
+"""
+import datetime
+import hashlib
+from functools import wraps
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from .cleanup import delete_in_batches
+from .models import IdempotencyKey
+
+IDEMPOTENCY_KEY_HEADER = 'Idempotency-Key'
+IDEMPOTENCY_REPLAYED_HEADER = 'Idempotent-Replayed'
+
+MAX_KEY_LENGTH = 255
+
+
+def _fingerprint(request):
+    material = b'|'.join([request.method.encode(), request.get_full_path().encode(), request.body])
+    return hashlib.sha256(material).hexdigest()
+
+
+def idempotent(method):
+    """
+    Run a POST handler at most once per Idempotency-Key of the user.
+
+    The key row is inserted in the same transaction as the handler's changes
+    and filled with its response before commit. A retry with the same key
+    gets the stored response without running the handler; a duplicate that
+    arrives while the first request is still running waits on the key's
+    unique index until it commits (or rolls back, and then runs itself).
+    Server errors are not stored, so they may be retried. Requests without
+    the header are handled as before.
+    """
+    @wraps(method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_KEY_HEADER)
+        if key is None:
+            return method(self, request, *args, **kwargs)
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return Response(
+                {'error': f'Заголовок {IDEMPOTENCY_KEY_HEADER} должен быть от 1 до {MAX_KEY_LENGTH} символов'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        fingerprint = _fingerprint(request)
+        now = timezone.now()
+        with transaction.atomic():
+            # Истекший ключ с тем же значением не должен мешать новому запросу
+            IdempotencyKey.objects.filter(user=request.user, key=key, expires_at__lte=now).delete()
+            record, created = IdempotencyKey.objects.get_or_create(
+                user=request.user, key=key,
+                defaults={
+                    'fingerprint': fingerprint,
+                    'expires_at': now + datetime.timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL),
+                }
+            )
+            if not created:
+                if record.fingerprint != fingerprint:
+                    return Response(
+                        {'error': 'Ключ идемпотентности уже использован для другого запроса'},
+                        status=status.HTTP_422_UNPROCESSABLE_ENTITY
+                    )
+                response = Response(record.response, status=record.status_code)
+                response[IDEMPOTENCY_REPLAYED_HEADER] = 'true'
+                return response
+
+            response = method(self, request, *args, **kwargs)
+            if response.status_code >= 500:
+                # Ключ не сохраняется, повтор выполнит запрос заново
+                transaction.set_rollback(True)
+                return response
+            record.status_code = response.status_code
+            record.response = response.data
+            record.save(update_fields=['status_code', 'response'])
+        return response
+    return wrapper
+
+
+def purge_idempotency_keys(batch_size=5000, pause=0.0, progress=None):
+    """
+    Delete expired idempotency keys in batches.
+
+    Oldest keys go first through the expires_at index (see delete_in_batches).
+    Returns {'deleted', 'batches', 'seconds', 'rows_per_second'}.
+    """
+    return delete_in_batches(
+        IdempotencyKey.objects.filter(expires_at__lt=timezone.now()), 'expires_at',
+        batch_size=batch_size, pause=pause, progress=progress,
+    )
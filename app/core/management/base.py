@@ -0,0 +1,57 @@
+"""
+Base class for the batched cleanup management commands.
+"""
+import time
+from abc import ABC, abstractmethod
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+
+class BatchDeleteCommand(ABC, BaseCommand):
+    """
+    Run a batched delete once or every --every seconds and report its stats.
+
+    Subclasses set noun (what is deleted, for the summary line) and implement
+    purge(options, batch_size, pause, progress) returning delete_in_batches
+    stats.
+    """
+
+    noun = 'rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--pause', type=float, default=0.0,
+            help='Seconds to sleep between batches to limit load',
+        )
+        parser.add_argument(
+            '--every', type=int, default=0,
+            help='Repeat the run every N seconds instead of running once',
+        )
+
+    @abstractmethod
+    def purge(self, options, batch_size, pause, progress):
+        """
+        Run one batched delete with the given options; returns its stats.
+        """
+
+    def handle(self, *args, **options):
+        while True:
+            stats = self.purge(
+                options,
+                batch_size=max(options['batch_size'], 1),
+                pause=options['pause'],
+                progress=self.report_progress if options['verbosity'] > 1 else None,
+            )
+            self.stdout.write(self.style.SUCCESS(
+                f"Deleted {stats['deleted']} {self.noun} in {stats['batches']} batches, "
+                f"{stats['seconds']}s ({stats['rows_per_second']} rows/s)"
+            ))
+            if not options['every']:
+                break
+            # Между проходами соединение не держится открытым
+            connection.close()
+            time.sleep(options['every'])
+
+    def report_progress(self, stats):
+        self.stdout.write(f"  batch {stats['batches']}: {stats['deleted']} deleted")
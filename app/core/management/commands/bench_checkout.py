@@ -0,0 +1,59 @@
+"""
+Django management command to benchmark checkout.
+"""
+import statistics
+import time
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from app.cart.models import CartItem
+from app.orders.services import OrderService
+from app.products.models import Category, Product
+from app.users.models import User
+
+
+class Command(BaseCommand):
+    """Django command to measure checkout latency and query count by cart size"""
+
+    help = 'Seed a cart of each size, check it out and report latency and queries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[1, 10, 50, 200, 500])
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        # Все созданные данные откатываются
+        with transaction.atomic():
+            self.run(options)
+            transaction.set_rollback(True)
+
+    def run(self, options):
+        category = Category.objects.create(name='Бенчмарк оформления')
+        products = Product.objects.bulk_create(
+            Product(
+                name=f'Товар {i}', description='', price=Decimal('10.00'),
+                stock_quantity=1000000, category=category
+            )
+            for i in range(max(options['sizes']))
+        )
+        user = User.objects.create_user(
+            username='bench-checkout', email='bench-checkout@example.com',
+            password='bench-checkout', balance=Decimal('99999999.00')
+        )
+
+        self.stdout.write(f'{"lines":>6} {"median ms":>10} {"max ms":>8} {"queries":>8}')
+        for size in options['sizes']:
+            timings, queries = [], 0
+            for _ in range(options['repeat']):
+                CartItem.objects.bulk_create(
+                    CartItem(user=user, product=product, quantity=1) for product in products[:size]
+                )
+                with CaptureQueriesContext(connection) as context:
+                    started = time.perf_counter()
+                    OrderService.create_order_from_cart(user)
+                    timings.append((time.perf_counter() - started) * 1000)
+                queries = len(context.captured_queries)
+            self.stdout.write(
+                f'{size:>6} {statistics.median(timings):>10.1f} {max(timings):>8.1f} {queries:>8}'
+            )
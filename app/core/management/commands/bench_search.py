@@ -0,0 +1,100 @@
+"""
+Django management command to benchmark product search.
+"""
+import random
+import statistics
+import time
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from app.products.models import Category, Product
+from app.products.search import search_products
+
+WORDS = [
+    'смартфон', 'ноутбук', 'наушники', 'часы', 'планшет', 'камера', 'колонка',
+    'куртка', 'джинсы', 'футболка', 'кроссовки', 'рюкзак', 'роман', 'учебник',
+    'детектив', 'чайник', 'пылесос', 'телевизор', 'монитор', 'клавиатура',
+    'беспроводной', 'черный', 'белый', 'компактный', 'игровой', 'классический',
+]
+
+# Запросы как при наборе в строке поиска, включая опечатку
+SEARCH_TERMS = ['смарт', 'беспроводные наушники', 'клавиатура игровая', 'тилевизор', 'ку']
+
+
+class Command(BaseCommand):
+    """Django command to compare full-text search latency with the LIKE path"""
+
+    help = 'Seed products and compare ?search= latency: icontains vs full-text index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[100000, 1000000])
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument(
+            '--keep', action='store_true',
+            help='Keep seeded products instead of rolling them back',
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.run(options)
+            if not options['keep']:
+                transaction.set_rollback(True)
+
+    def run(self, options):
+        rng = random.Random(42)
+        categories = [
+            Category.objects.create(name=f'Бенчмарк {word}') for word in WORDS[:8]
+        ]
+        seeded = 0
+        for size in sorted(options['sizes']):
+            seeded += self.seed(rng, categories, size - seeded, options['batch_size'])
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE products_product')
+
+            self.stdout.write(f'\n{seeded} products')
+            for term in SEARCH_TERMS:
+                like = self.measure(
+                    lambda: Product.objects.filter(is_active=True, name__icontains=term),
+                    options['repeat'],
+                )
+                indexed = self.measure(
+                    lambda: search_products(Product.objects.filter(is_active=True), term),
+                    options['repeat'],
+                )
+                self.stdout.write(
+                    f'  {term!r:28} LIKE p50={like[0]:8.2f}ms p95={like[1]:8.2f}ms | '
+                    f'FTS p50={indexed[0]:8.2f}ms p95={indexed[1]:8.2f}ms'
+                )
+
+    def seed(self, rng, categories, count, batch_size):
+        created = 0
+        while created < count:
+            batch = []
+            for _ in range(min(batch_size, count - created)):
+                words = rng.sample(WORDS, 3)
+                batch.append(Product(
+                    name=' '.join(words).capitalize(),
+                    description=' '.join(rng.choices(WORDS, k=12)),
+                    price=Decimal(rng.randint(100, 200000)) / 100,
+                    stock_quantity=rng.randint(0, 500),
+                    category=rng.choice(categories),
+                ))
+            Product.objects.bulk_create(batch, batch_size=batch_size)
+            created += len(batch)
+        return created
+
+    @staticmethod
+    def measure(make_queryset, repeat):
+        """
+        Time the first page plus the count, as ProductListView does.
+        """
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            queryset = make_queryset()
+            queryset.count()
+            list(queryset[:20])
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        return statistics.median(timings), timings[int(len(timings) * 0.95) - 1]
@@ -0,0 +1,83 @@
+"""
+Django management command to build resized variants of product images.
+"""
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from django.core.management.base import BaseCommand
+from django.db import connections
+from PIL import Image
+from app.products.cache import invalidate_catalog
+from app.products.images import needs_variants, render_variants, save_variants, store_variants
+from app.products.models import Product
+
+
+class Command(BaseCommand):
+    """Django command to backfill thumbnail, card and zoom variants in parallel"""
+
+    help = 'Build WebP/JPEG variants for product images that do not have up-to-date ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Rebuild variants even if they are up to date',
+        )
+
+    def handle(self, *args, **options):
+        workers = max(options['workers'], 1)
+        # Дочерние процессы не должны наследовать открытое соединение с БД
+        connections.close_all()
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork'))
+        # С fork все процессы создаются при первой задаче, пока соединение закрыто
+        executor.submit(int).result()
+
+        products = (
+            Product.objects.exclude(image='').exclude(image__isnull=True)
+            .only('id', 'image', 'image_variants').order_by('id')
+        )
+        pending = (
+            product for product in products.iterator(chunk_size=500)
+            if options['force'] or needs_variants(product)
+        )
+
+        started = time.monotonic()
+        done = failed = 0
+        with executor:
+            in_flight = {}
+            # В обработке одновременно не больше 2 файлов на процесс, чтобы память не росла
+            while True:
+                while len(in_flight) < workers * 2:
+                    product = next(pending, None)
+                    if product is None:
+                        break
+                    try:
+                        with product.image.open('rb') as f:
+                            data = f.read()
+                    except OSError as e:
+                        failed += 1
+                        self.stderr.write(f'Товар {product.id}: {e}')
+                        continue
+                    in_flight[executor.submit(render_variants, data)] = (product.id, product.image.name)
+                if not in_flight:
+                    break
+
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    product_id, source = in_flight.pop(future)
+                    try:
+                        rendered = future.result()
+                    except (OSError, ValueError, Image.DecompressionBombError) as e:
+                        failed += 1
+                        self.stderr.write(f'Товар {product_id}: {e}')
+                        continue
+                    if save_variants(product_id, source, store_variants(rendered)):
+                        done += 1
+
+        invalidate_catalog()
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Built variants for {done} products ({failed} failed) '
+            f'in {elapsed:.1f}s with {workers} workers'
+        ))
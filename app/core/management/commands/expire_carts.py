@@ -0,0 +1,21 @@
+"""
+Django management command to delete abandoned cart lines.
+"""
+import datetime
+from django.conf import settings
+from app.cart.cleanup import expire_cart_items
+from app.core.management.base import BatchDeleteCommand
+
+
+class Command(BatchDeleteCommand):
+    """Django command to remove cart items untouched for a configurable period"""
+
+    help = 'Delete cart items not updated for --days days in batches'
+    noun = 'cart items'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.CART_EXPIRY_DAYS)
+        super().add_arguments(parser)
+
+    def purge(self, options, **kwargs):
+        return expire_cart_items(datetime.timedelta(days=options['days']), **kwargs)
@@ -0,0 +1,57 @@
+"""
+Django management command to bulk import the product catalog.
+"""
+import os
+from django.core.management.base import BaseCommand, CommandError
+from app.products.importer import CatalogImporter
+
+FORMATS = {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl'}
+
+
+class Command(BaseCommand):
+    """Django command to upsert categories and products from CSV or JSONL"""
+
+    help = (
+        'Import products from CSV or JSONL (columns: sku, name, description, price, '
+        'stock_quantity, category, is_active), updating existing products by sku'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=sorted(set(FORMATS.values())))
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--no-copy', action='store_true',
+            help='Use bulk_create upserts instead of COPY on PostgreSQL',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or FORMATS.get(os.path.splitext(path)[1].lower())
+        if file_format is None:
+            raise CommandError('Не удалось определить формат файла, укажите --format')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть положительным')
+
+        importer = CatalogImporter(
+            batch_size=options['batch_size'],
+            use_copy=False if options['no_copy'] else None,
+            progress=lambda stats: self.stdout.write(
+                f"  {stats['rows']} rows read, {stats['imported']} imported"
+            ),
+        )
+        try:
+            with open(path, encoding='utf-8', newline='') as stream:
+                stats = importer.run(stream, file_format)
+        except OSError as e:
+            raise CommandError(f'Не удалось прочитать файл: {e}')
+
+        for line_no, message in importer.errors:
+            self.stderr.write(f'Строка {line_no}: {message}')
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {stats['imported']} of {stats['rows']} rows "
+            f"({stats['failed']} failed, {stats['categories_created']} new categories) "
+            f"in {stats['seconds']}s, {stats['rows_per_second']} rows/s, "
+            f"max RSS {stats['max_rss_kb'] // 1024} MB "
+            f"[{'COPY' if importer.use_copy else 'bulk_create'}]"
+        ))
@@ -0,0 +1,15 @@
+"""
+Django management command to delete expired idempotency keys.
+"""
+from app.core.idempotency import purge_idempotency_keys
+from app.core.management.base import BatchDeleteCommand
+
+
+class Command(BatchDeleteCommand):
+    """Django command to remove idempotency keys past their TTL"""
+
+    help = 'Delete expired idempotency keys in batches'
+    noun = 'idempotency keys'
+
+    def purge(self, options, **kwargs):
+        return purge_idempotency_keys(**kwargs)
@@ -0,0 +1,15 @@
+"""
+Django management command to rebuild per-category product statistics.
+"""
+from django.core.management.base import BaseCommand
+from app.products.stats import reconcile_category_stats
+
+
+class Command(BaseCommand):
+    """Django command to recompute category product counts and price bounds"""
+
+    help = 'Recompute product_count, min_price and max_price of every category'
+
+    def handle(self, *args, **options):
+        fixed = reconcile_category_stats()
+        self.stdout.write(self.style.SUCCESS(f'Categories corrected: {fixed}'))
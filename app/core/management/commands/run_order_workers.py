@@ -0,0 +1,88 @@
+"""
+Django management command to process queued checkouts.
+"""
+import multiprocessing
+import signal
+import time
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from app.orders.jobs import queue_stats, run_next_job
+
+
+def work(poll, once):
+    """
+    Run due jobs one after another; returns the number processed.
+    """
+    processed = 0
+    while True:
+        if run_next_job() is not None:
+            processed += 1
+            continue
+        if once:
+            break
+        time.sleep(poll)
+    connection.close()
+    return processed
+
+
+def _stop(signum, frame):
+    raise SystemExit(0)
+
+
+class Command(BaseCommand):
+    """Django command to run checkout workers claiming jobs with SKIP LOCKED"""
+
+    help = 'Process queued checkout jobs in one or more worker processes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=1, help='Number of worker processes')
+        parser.add_argument(
+            '--poll', type=float, default=1.0,
+            help='Seconds to sleep when no job is due',
+        )
+        parser.add_argument(
+            '--stats-every', type=int, default=60,
+            help='Print queue depth every N seconds',
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Exit when no job is due instead of waiting for new ones',
+        )
+
+    def handle(self, *args, **options):
+        concurrency = max(options['concurrency'], 1)
+        if concurrency == 1:
+            processed = work(options['poll'], options['once'])
+            self.stdout.write(self.style.SUCCESS(f'Processed {processed} checkout jobs'))
+            return
+
+        # Дочерние процессы не должны наследовать открытое соединение с БД
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        processes = [
+            context.Process(target=work, args=(options['poll'], options['once']), daemon=True)
+            for _ in range(concurrency)
+        ]
+        signal.signal(signal.SIGTERM, _stop)
+        try:
+            for process in processes:
+                process.start()
+            while any(process.is_alive() for process in processes):
+                for process in processes:
+                    process.join(timeout=options['stats_every'] / concurrency)
+                self.report_stats()
+        finally:
+            # Незавершенная транзакция воркера откатывается, задание остается в очереди
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()
+            for process in processes:
+                process.join()
+            connection.close()
+
+    def report_stats(self):
+        stats = queue_stats()
+        self.stdout.write(
+            f"queued={stats['queued']} due={stats['due']} retrying={stats['retrying']} "
+            f"oldest={stats['oldest_seconds']}s"
+        )
@@ -0,0 +1,38 @@
+"""
+Core models shared by the shop apps.
+"""
+from django.conf import settings
+from django.db import models
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class IdempotencyKey(models.Model):
+    """
+    Stored response of a request made with an Idempotency-Key header.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='idempotency_keys',
+        verbose_name='Пользователь'
+    )
+    key = models.CharField(max_length=255, verbose_name='Ключ')
+    # Хэш метода, пути и тела запроса: ключ нельзя переиспользовать для другого запроса
+    fingerprint = models.CharField(max_length=64, verbose_name='Отпечаток запроса')
+    status_code = models.PositiveSmallIntegerField(null=True, verbose_name='Код ответа')
+    # Кодировщик DRF: повтор отдает те же значения, что и исходный ответ
+    response = models.JSONField(null=True, encoder=JSONEncoder, verbose_name='Ответ')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
+    expires_at = models.DateTimeField(verbose_name='Истекает')
+
+    class Meta:
+        verbose_name = 'Ключ идемпотентности'
+        verbose_name_plural = 'Ключи идемпотентности'
+        unique_together = ['user', 'key']
+        indexes = [
+            # Удаление истекших ключей (см. idempotency.py)
+            models.Index(fields=['expires_at'], name='idempotency_expires_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id}: {self.key}"
@@ -0,0 +1,72 @@
+"""
+Pagination classes for the project.
+"""
+from rest_framework.pagination import BasePagination, CursorPagination, PageNumberPagination
+
+
+class CreatedAtCursorPagination(CursorPagination):
+    """
+    Keyset pagination over (-created_at, id).
+
+    Views may override the key with a ``cursor_ordering`` attribute.
+    """
+    ordering = ('-created_at', 'id')
+
+    def get_ordering(self, request, queryset, view):
+        return getattr(view, 'cursor_ordering', self.ordering)
+
+
+class ShopPagination(BasePagination):
+    """
+    Page number pagination by default; keyset pagination on request.
+
+    The client opts in with ``?pagination=cursor`` and then follows the
+    ``next``/``previous`` links, which carry the ``cursor`` parameter. Cursor
+    pages skip the COUNT(*) and the OFFSET scan, so their cost does not grow
+    with depth and rows inserted meanwhile do not shift the pages.
+    """
+    pagination_query_param = 'pagination'
+    page_number_class = PageNumberPagination
+    cursor_class = CreatedAtCursorPagination
+
+    def __init__(self):
+        self.paginator = self.page_number_class()
+
+    @property
+    def display_page_controls(self):
+        return getattr(self.paginator, 'display_page_controls', False)
+
+    def use_cursor(self, request):
+        return (
+            request.query_params.get(self.pagination_query_param) == 'cursor'
+            or self.cursor_class.cursor_query_param in request.query_params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.use_cursor(request):
+            self.paginator = self.cursor_class()
+        return self.paginator.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        return self.paginator.get_paginated_response_schema(schema)
+
+    def to_html(self):
+        return self.paginator.to_html()
+
+    def get_results(self, data):
+        return data['results']
+
+    def get_schema_operation_parameters(self, view):
+        return self.page_number_class().get_schema_operation_parameters(view) + [
+            {
+                'name': self.pagination_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Set to "cursor" to use keyset pagination',
+                'schema': {'type': 'string', 'enum': ['cursor']},
+            },
+            *self.cursor_class().get_schema_operation_parameters(view),
+        ]
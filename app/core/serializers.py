@@ -0,0 +1,133 @@
+"""
+Shared serializer helpers for the project.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+
+# Наибольший id (bigint): больший id не должен доходить до базы данных
+MAX_ID = 2 ** 63 - 1
+
+
+class SparseFieldsMixin:
+    """
+    Sparse fieldsets and opt-in expansion for read serializers.
+
+    ``?fields=id,name,category.name`` limits the output to the listed fields
+    and ``?expand=category`` renders a nested object in full. Once either
+    parameter is present, fields from ``Meta.expandable_fields`` come back as
+    primary keys unless expanded. Dotted names address nested serializers,
+    e.g. ``?expand=product&fields=quantity,product.name`` on the cart.
+
+    ``Meta.only_requires`` maps computed fields to the model columns they
+    read, so that views can pass the requested columns to ``.only()``.
+    """
+    fields_query_param = 'fields'
+    expand_query_param = 'expand'
+
+    def get_field_path(self):
+        """
+        Dotted path of this serializer from the root serializer.
+        """
+        names = []
+        node = self
+        while node.parent is not None:
+            if node.field_name:
+                names.append(node.field_name)
+            node = node.parent
+        return '.'.join(reversed(names))
+
+    def get_sparse_params(self):
+        """
+        Return (fields, expand) name sets for this level, or None if not requested.
+        """
+        request = self.context.get('request')
+        if request is None:
+            return None
+        params = request.query_params
+        if self.fields_query_param not in params and self.expand_query_param not in params:
+            return None
+
+        prefix = self.get_field_path()
+
+        def level_names(param):
+            names, nested = set(), set()
+            for value in params.get(param, '').split(','):
+                value = value.strip()
+                if prefix:
+                    if not value.startswith(prefix + '.'):
+                        continue
+                    value = value[len(prefix) + 1:]
+                if not value:
+                    continue
+                name, _, rest = value.partition('.')
+                names.add(name)
+                if rest:
+                    nested.add(name)
+            return names, nested
+
+        fields, nested = level_names(self.fields_query_param)
+        expand, _ = level_names(self.expand_query_param)
+        # Запрос вложенного поля (product.name) подразумевает раскрытие product
+        return fields, expand | nested
+
+    def get_fields(self):
+        fields = super().get_fields()
+        sparse = self.get_sparse_params()
+        if sparse is None:
+            return fields
+        requested, expand = sparse
+
+        for name in getattr(self.Meta, 'expandable_fields', ()):
+            if name in fields and name not in expand:
+                field = fields[name]
+                source = field.source if field.source != name else None
+                fields[name] = serializers.PrimaryKeyRelatedField(
+                    read_only=True,
+                    many=isinstance(field, serializers.ListSerializer),
+                    source=source,
+                )
+
+        if requested:
+            fields = {name: field for name, field in fields.items() if name in requested}
+        return fields
+
+    def get_queryset_only(self):
+        """
+        Return (only, select_related) lookups for the rendered fields.
+        """
+        model = self.Meta.model
+        requires = getattr(self.Meta, 'only_requires', {})
+        only, related = set(), set()
+
+        for name, field in self.fields.items():
+            if field.write_only:
+                continue
+            for path in requires.get(name, ()):
+                only.add(path)
+                if '__' in path:
+                    related.add(path.rsplit('__', 1)[0])
+            if field.source == '*':
+                continue
+
+            attrs = field.source_attrs
+            try:
+                model_field = model._meta.get_field(attrs[0])
+            except FieldDoesNotExist:
+                continue
+            if not model_field.concrete:
+                # Обратные связи загружаются через prefetch_related
+                continue
+            if not model_field.is_relation:
+                only.add(model_field.name)
+                continue
+
+            only.add(model_field.name)
+            if isinstance(field, SparseFieldsMixin):
+                related.add(model_field.name)
+                nested_only, nested_related = field.get_queryset_only()
+                only.update(f'{model_field.name}__{path}' for path in nested_only)
+                related.update(f'{model_field.name}__{path}' for path in nested_related)
+            elif len(attrs) > 1:
+                related.add(model_field.name)
+                only.add('__'.join(attrs))
+        return only, related
@@ -1,10 +1,12 @@
 """
 Core views for the project.
 """
+from django.core.exceptions import FieldDoesNotExist
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework import status
+from .serializers import SparseFieldsMixin
 
 
 @api_view(['GET'])
@@ -25,4 +27,30 @@ class HealthCheckView:
     """
     @staticmethod
     def as_view():
-        return health_check 
\ No newline at end of file
+        return health_check
+
+
+class SparseFieldsViewMixin:
+    """
+    Load only the columns rendered for ?fields= / ?expand= requests.
+    """
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        serializer = self.get_serializer()
+        if not isinstance(serializer, SparseFieldsMixin) or serializer.get_sparse_params() is None:
+            return queryset
+        only, related = serializer.get_queryset_only()
+        # Поля сортировки нужны курсорной пагинации
+        model = queryset.model
+        for name in queryset.query.order_by or model._meta.ordering:
+            if not isinstance(name, str):
+                continue
+            name = name.lstrip('-')
+            try:
+                only.add(model._meta.get_field(name).name)
+            except FieldDoesNotExist:
+                pass
+        queryset = queryset.select_related(None)
+        if related:
+            queryset = queryset.select_related(*related)
+        return queryset.only(*only)
@@ -1,8 +1,10 @@
 """
 Admin configuration for orders app.
 """
-from django.contrib import admin
-from .models import Order, OrderItem
+from django.conf import settings
+from django.contrib import admin, messages
+from .cancellation import bulk_cancel_orders
+from .models import CheckoutJob, Order, OrderItem
 
 
 class OrderItemInline(admin.TabularInline):
@@ -28,6 +30,7 @@ class OrderAdmin(admin.ModelAdmin):
     ordering = ['-created_at']
     
     inlines = [OrderItemInline]
+    actions = ['cancel_orders']
     
     readonly_fields = ['created_at', 'updated_at', 'total_amount']
     
@@ -42,4 +45,25 @@ class OrderAdmin(admin.ModelAdmin):
     
     def items_count(self, obj):
         return obj.items_count
-    items_count.short_description = 'Количество товаров' 
\ No newline at end of file
+    items_count.short_description = 'Количество товаров'
+
+    @admin.action(description='Отменить выбранные заказы')
+    def cancel_orders(self, request, queryset):
+        result = bulk_cancel_orders(queryset.values_list('id', flat=True), settings.ORDER_BULK_CANCEL_CHUNK)
+        self.message_user(
+            request,
+            f'Отменено заказов: {result["cancelled"]}, пропущено: {len(result["skipped"])}',
+            messages.SUCCESS,
+        )
+
+
+@admin.register(CheckoutJob)
+class CheckoutJobAdmin(admin.ModelAdmin):
+    """
+    Checkout job admin.
+    """
+    list_display = ['id', 'user', 'status', 'attempts', 'run_after', 'order', 'created_at']
+    list_filter = ['status', 'created_at']
+    search_fields = ['user__username', 'user__email']
+    raw_id_fields = ['user', 'order']
+    readonly_fields = ['created_at', 'updated_at']
@@ -0,0 +1,82 @@
+"""
+Set-based cancellation of one or many orders.
+"""
+import logging
+from collections import defaultdict
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+from app.products.models import Product
+from app.products.stock import increase_stock
+from app.users.balance import credit_balances
+from app.users.models import User
+from .models import Order, OrderItem
+
+logger = logging.getLogger(__name__)
+
+CANCELLABLE_STATUSES = ['pending', 'paid']
+
+
+def cancel_orders(order_ids):
+    """
+    Cancel the cancellable orders among order_ids in one transaction.
+
+    Orders, then their products, then their users are locked in id order,
+    as checkout and bulk product updates do, so concurrent calls cannot
+    deadlock. Stock of every product is returned with one grouped UPDATE
+    and every user is refunded with one more, whatever the number of
+    orders and lines. Returns the ids of the orders cancelled; orders
+    already cancelled or shipped are skipped.
+    """
+    with transaction.atomic():
+        orders = list(
+            Order.objects.select_for_update().filter(pk__in=order_ids, status__in=CANCELLABLE_STATUSES)
+            .order_by('id').values('id', 'user_id', 'total_amount')
+        )
+        if not orders:
+            return []
+        ids = [order['id'] for order in orders]
+        Order.objects.filter(pk__in=ids).update(status='cancelled', updated_at=timezone.now())
+
+        # Количество каждого товара суммируется по всем отменяемым заказам
+        quantities = dict(
+            OrderItem.objects.filter(order_id__in=ids).values('product_id')
+            .annotate(total=Sum('quantity')).order_by('product_id').values_list('product_id', 'total')
+        )
+        _lock_in_order(Product, quantities)
+        increase_stock(quantities)
+
+        refunds = defaultdict(Decimal)
+        for order in orders:
+            refunds[order['user_id']] += order['total_amount']
+        _lock_in_order(User, refunds)
+        credit_balances(refunds)
+    return ids
+
+
+def _lock_in_order(model, ids):
+    # UPDATE ... FROM VALUES блокирует строки в порядке соединения, поэтому
+    # несколько строк сначала блокируются явно в порядке id
+    if len(ids) > 1:
+        list(model.objects.select_for_update().filter(pk__in=ids).order_by('id').values_list('id'))
+
+
+def bulk_cancel_orders(order_ids, chunk_size=500):
+    """
+    Cancel many orders in chunks, each in a transaction of its own.
+
+    Returns {'cancelled', 'skipped'}: the number of orders cancelled and the
+    ids that were missing or could not be cancelled.
+    """
+    order_ids = sorted(set(order_ids))
+    cancelled = set()
+    for start in range(0, len(order_ids), chunk_size):
+        chunk = cancel_orders(order_ids[start:start + chunk_size])
+        cancelled.update(chunk)
+        if chunk:
+            logger.info(f"Отменено заказов: {len(chunk)} (#{chunk[0]}-#{chunk[-1]})")
+    return {
+        'cancelled': len(cancelled),
+        'skipped': [pk for pk in order_ids if pk not in cancelled],
+    }
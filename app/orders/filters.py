@@ -0,0 +1,18 @@
+"""
+Admin order list filters for the shop.
+"""
+
+
+def filter_orders(queryset, params):
+    """
+    Apply the admin order list filters from query params to an order queryset.
+    """
+    status_filter = params.get('status')
+    if status_filter:
+        queryset = queryset.filter(status=status_filter)
+
+    user_id = params.get('user')
+    if user_id:
+        queryset = queryset.filter(user_id=user_id)
+
+    return queryset
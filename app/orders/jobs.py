@@ -0,0 +1,153 @@
+"""
+Database-backed queue of asynchronous checkouts.
+"""
+import datetime
+import logging
+from decimal import Decimal
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Count, Min, Q
+from django.utils import timezone
+from .models import CheckoutJob
+from .services import OrderService
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_checkout(user, lines=()):
+    """
+    Queue a checkout of the user's cart; returns the job.
+
+    lines are the validated cart lines (see CartService.check_availability).
+    Their prices and quantities are stored with the job, so a cart edited or
+    repriced before the worker runs fails the job instead of being charged.
+    """
+    return CheckoutJob.objects.create(
+        user=user,
+        prices={str(line['product_id']): str(line['price']) for line in lines},
+        quantities={str(line['product_id']): line['quantity'] for line in lines},
+    )
+
+
+def retry_delay(attempts):
+    """
+    Seconds to wait before the next attempt: doubles with every failed one.
+    """
+    return min(settings.ORDER_JOB_RETRY_DELAY * 2 ** (attempts - 1), settings.ORDER_JOB_RETRY_MAX_DELAY)
+
+
+def expected_cart(job):
+    """
+    Keyword arguments of create_order_from_cart for the cart stored with the job.
+    """
+    if not job.quantities:
+        return {}
+    return {
+        'expected_prices': {int(product_id): Decimal(price) for product_id, price in job.prices.items()},
+        'expected_quantities': {int(product_id): quantity for product_id, quantity in job.quantities.items()},
+    }
+
+
+def record_failure(job, error):
+    """
+    Count a failed attempt: reschedule the job with backoff, or fail it once
+    ORDER_JOB_MAX_ATTEMPTS is reached. The caller saves the job.
+    """
+    job.error = str(error)
+    if job.attempts >= settings.ORDER_JOB_MAX_ATTEMPTS:
+        job.status = 'failed'
+    else:
+        job.run_after = timezone.now() + datetime.timedelta(seconds=retry_delay(job.attempts))
+
+
+def log_failure(job, error):
+    """
+    Log a failed attempt as an error once the job has run out of attempts.
+    """
+    if job.status == 'failed':
+        logger.error(f"Задание #{job.id} не выполнено после {job.attempts} попыток: {error}")
+    else:
+        logger.warning(f"Задание #{job.id}, попытка {job.attempts}: {error}")
+
+
+def record_broken_attempt(job_id, error):
+    """
+    Count an attempt whose transaction was rolled back as a whole.
+    """
+    # После обрыва соединение закрывается, следующий запрос откроет новое
+    if connection.connection is not None and not connection.is_usable():
+        connection.close()
+    with transaction.atomic():
+        job = CheckoutJob.objects.select_for_update().get(pk=job_id)
+        if job.status == 'queued':
+            job.attempts += 1
+            record_failure(job, error)
+            job.save()
+    return job
+
+
+def run_next_job():
+    """
+    Claim the oldest due job and run its checkout; returns the job or None.
+
+    The job row is locked with FOR UPDATE SKIP LOCKED for the whole
+    checkout, so parallel workers take different jobs, and the order and
+    the job's new status are committed together. If the worker dies, the
+    transaction rolls back and the job stays queued. A refused checkout
+    (empty cart, no stock, no money) fails the job at once; other errors are
+    retried with backoff up to ORDER_JOB_MAX_ATTEMPTS times. An error that
+    breaks the job's own transaction is recorded in a new one, so such jobs
+    also run out of attempts.
+    """
+    job = failure = None
+    try:
+        with transaction.atomic():
+            job = (
+                CheckoutJob.objects.select_for_update(skip_locked=True, of=('self',))
+                .filter(status='queued', run_after__lte=timezone.now())
+                .select_related('user').order_by('run_after', 'id').first()
+            )
+            if job is None:
+                return None
+
+            job.attempts += 1
+            try:
+                order = OrderService.create_order_from_cart(job.user, **expected_cart(job))
+            except ValueError as e:
+                job.status = 'failed'
+                job.error = str(e)
+            except Exception as e:
+                # Сбой (deadlock): откатилась только точка сохранения заказа
+                failure = e
+                record_failure(job, e)
+            else:
+                job.status = 'done'
+                job.order = order
+                job.error = ''
+            job.save()
+    except DatabaseError as e:
+        if job is None:
+            raise
+        # Транзакция задания прервана целиком: сохраняется исходная ошибка
+        failure = failure or e
+        job = record_broken_attempt(job.pk, failure)
+    if failure is not None:
+        log_failure(job, failure)
+    return job
+
+
+def queue_stats():
+    """
+    Depth of the queue: queued jobs, those already due, those waiting for a
+    retry and the age of the oldest one in seconds.
+    """
+    now = timezone.now()
+    stats = CheckoutJob.objects.filter(status='queued').aggregate(
+        queued=Count('id'),
+        due=Count('id', filter=Q(run_after__lte=now)),
+        retrying=Count('id', filter=Q(attempts__gt=0)),
+        oldest=Min('created_at'),
+    )
+    oldest = stats.pop('oldest')
+    stats['oldest_seconds'] = round((now - oldest).total_seconds(), 1) if oldest else 0.0
+    return stats
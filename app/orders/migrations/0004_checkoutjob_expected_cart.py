@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-18 07:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0003_checkoutjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='checkoutjob',
+            name='prices',
+            field=models.JSONField(blank=True, default=dict, verbose_name='Ожидаемые цены'),
+        ),
+        migrations.AddField(
+            model_name='checkoutjob',
+            name='quantities',
+            field=models.JSONField(blank=True, default=dict, verbose_name='Ожидаемые количества'),
+        ),
+    ]
@@ -4,6 +4,7 @@ Order models for the shop.
 from django.db import models
 from django.core.validators import MinValueValidator
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 from app.products.models import Product
 from decimal import Decimal
 
@@ -48,6 +49,11 @@ class Order(models.Model):
         verbose_name = 'Заказ'
         verbose_name_plural = 'Заказы'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at', 'id'], name='order_created_idx'),
+            models.Index(fields=['user', '-created_at'], name='order_user_created_idx'),
+            models.Index(fields=['status', '-created_at'], name='order_status_created_idx'),
+        ]
 
     def __str__(self):
         return f"Заказ #{self.id} - {self.user.username} ({self.total_amount} руб.)"
@@ -69,18 +75,12 @@ class Order(models.Model):
         """
         Cancel order and return items to stock.
         """
-        if not self.can_be_cancelled():
+        # Модуль отмены сам импортирует модели заказов
+        from .cancellation import cancel_orders
+
+        if not self.can_be_cancelled() or not cancel_orders([self.pk]):
             raise ValueError("Заказ не может быть отменен")
-        
-        # Возвращаем товары на склад
-        for item in self.order_items.all():
-            item.product.increase_stock(item.quantity)
-        
-        # Возвращаем деньги пользователю
-        self.user.add_balance(self.total_amount)
-        
         self.status = 'cancelled'
-        self.save()
 
 
 class OrderItem(models.Model):
@@ -128,4 +128,58 @@ class OrderItem(models.Model):
         Calculate total price before saving.
         """
         self.total_price = self.price * self.quantity
-        super().save(*args, **kwargs) 
\ No newline at end of file
+        super().save(*args, **kwargs)
+
+
+class CheckoutJob(models.Model):
+    """
+    Queued checkout of a user's cart, processed by run_order_workers.
+    """
+    STATUS_CHOICES = [
+        ('queued', 'В очереди'),
+        ('done', 'Выполнено'),
+        ('failed', 'Ошибка'),
+    ]
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='checkout_jobs',
+        verbose_name='Пользователь'
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default='queued',
+        verbose_name='Статус'
+    )
+    # Проверенная при постановке корзина: {id товара: цена} и {id товара: количество}
+    prices = models.JSONField(default=dict, blank=True, verbose_name='Ожидаемые цены')
+    quantities = models.JSONField(default=dict, blank=True, verbose_name='Ожидаемые количества')
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name='Попыток')
+    run_after = models.DateTimeField(default=timezone.now, verbose_name='Выполнить после')
+    order = models.ForeignKey(
+        Order,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name='Заказ'
+    )
+    error = models.TextField(blank=True, verbose_name='Ошибка')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата обновления')
+
+    class Meta:
+        verbose_name = 'Задание оформления заказа'
+        verbose_name_plural = 'Задания оформления заказов'
+        ordering = ['-created_at']
+        indexes = [
+            # Выборка очередных заданий воркерами (см. jobs.py); завершенные в индекс не входят
+            models.Index(
+                fields=['run_after', 'id'], name='checkoutjob_queued_idx', condition=models.Q(status='queued')
+            ),
+        ]
+
+    def __str__(self):
+        return f"Задание #{self.id} - {self.user.username} ({self.get_status_display()})"
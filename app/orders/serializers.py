@@ -2,11 +2,13 @@
 Order serializers for the shop.
 """
 from rest_framework import serializers
-from .models import Order, OrderItem
+from app.cart.services import CartService
+from app.core.serializers import SparseFieldsMixin
+from .models import CheckoutJob, Order, OrderItem
 from app.products.serializers import ProductSerializer
 
 
-class OrderItemSerializer(serializers.ModelSerializer):
+class OrderItemSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """
     Order item serializer.
     """
@@ -19,9 +21,10 @@ class OrderItemSerializer(serializers.ModelSerializer):
             'id', 'product', 'product_name', 'quantity',
             'price', 'total_price'
         ]
+        expandable_fields = ['product']
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """
     Order serializer.
     """
@@ -36,39 +39,83 @@ class OrderSerializer(serializers.ModelSerializer):
             'items_count', 'order_items', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
+        expandable_fields = ['order_items']
+        only_requires = {'status_display': ['status']}
 
 
 class OrderCreateSerializer(serializers.Serializer):
     """
     Order creation serializer.
+
+    prices optionally maps product ids to the prices the customer saw; the
+    order is refused if any of them has changed since.
     """
+    prices = serializers.DictField(
+        child=serializers.DecimalField(max_digits=10, decimal_places=2), required=False
+    )
+
+    def validate_prices(self, value):
+        try:
+            return {int(product_id): price for product_id, price in value.items()}
+        except ValueError:
+            raise serializers.ValidationError("Ключами должны быть ID товаров")
+
     def validate(self, attrs):
         user = self.context['request'].user
-        
-        # Проверяем корзину
-        from app.cart.models import CartItem
-        cart_items = CartItem.objects.filter(user=user)
-        
-        if not cart_items.exists():
+
+        # Вся корзина проверяется одним запросом
+        availability = CartService.check_availability(user, attrs.get('prices'))
+
+        if not availability['lines']:
             raise serializers.ValidationError("Корзина пуста")
-        
+
         # Проверяем баланс
-        total_amount = sum(item.total_price for item in cart_items)
+        total_amount = availability['total_amount']
         if not user.has_sufficient_balance(total_amount):
             raise serializers.ValidationError(
                 f"Недостаточно средств на балансе. Требуется: {total_amount} руб."
             )
-        
-        # Проверяем доступность товаров
-        for item in cart_items:
-            if not item.can_be_ordered():
-                raise serializers.ValidationError(
-                    f"Товар {item.product.name} недоступен для заказа"
-                )
-        
+
+        if availability['problems']:
+            raise serializers.ValidationError({
+                'problems': [
+                    {
+                        'product_id': problem['product_id'],
+                        'reason': problem['reason'],
+                        'message': problem['message'],
+                    }
+                    for problem in availability['problems']
+                ]
+            })
+
+        # Проверенные строки нужны асинхронному оформлению (см. enqueue_checkout)
+        attrs['lines'] = availability['lines']
         return attrs
 
 
+class CheckoutJobSerializer(serializers.ModelSerializer):
+    """
+    Checkout job status serializer; order is set once the job is done.
+    """
+    order = OrderSerializer(read_only=True)
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+
+    class Meta:
+        model = CheckoutJob
+        fields = ['id', 'status', 'status_display', 'attempts', 'error', 'order', 'created_at', 'updated_at']
+        read_only_fields = fields
+
+
+class CheckoutJobStatsSerializer(serializers.Serializer):
+    """
+    Checkout queue depth serializer.
+    """
+    queued = serializers.IntegerField()
+    due = serializers.IntegerField()
+    retrying = serializers.IntegerField()
+    oldest_seconds = serializers.FloatField()
+
+
 class OrderStatusUpdateSerializer(serializers.ModelSerializer):
     """
     Order status update serializer (admin only).
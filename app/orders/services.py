@@ -6,7 +6,10 @@ from decimal import Decimal
 from django.db import transaction
 from django.contrib.auth import get_user_model
 from app.cart.models import CartItem
+from app.cart.services import CartService
 from app.products.models import Product
+from app.products.stock import decrease_stock
+from .cancellation import cancel_orders
 from .models import Order, OrderItem
 
 User = get_user_model()
@@ -19,108 +22,128 @@ class OrderService:
     """
     
     @staticmethod
-    def create_order_from_cart(user):
+    def create_order_from_cart(user, expected_prices=None, expected_quantities=None):
         """
         Create order from user's cart.
+
+        Works on the whole cart at once: cart lines and products are locked
+        (products in id order, so concurrent checkouts cannot deadlock), order
+        lines are written with one bulk INSERT and stock is decreased with one
+        conditional UPDATE. The number of queries does not depend on cart size.
+        expected_prices optionally maps product ids to the prices the customer
+        saw; they are compared with the locked rows, so a price changed after
+        validation refuses the order instead of charging the new price.
+        expected_quantities, if given, maps product ids to quantities the cart
+        must still hold exactly.
         """
-        cart_items = CartItem.objects.filter(user=user).select_related('product')
-        
-        if not cart_items.exists():
-            raise ValueError("Корзина пуста")
-        
-        # Проверяем доступность товаров и баланс
-        total_amount = Decimal('0.00')
-        order_items_data = []
-        
-        for cart_item in cart_items:
-            if not cart_item.can_be_ordered():
-                raise ValueError(f"Товар {cart_item.product.name} недоступен для заказа")
-            
-            item_total = cart_item.total_price
-            total_amount += item_total
-            
-            order_items_data.append({
-                'product': cart_item.product,
-                'quantity': cart_item.quantity,
-                'price': cart_item.product.price,
-                'total_price': item_total
-            })
-        
-        # Проверяем баланс пользователя
-        if not user.has_sufficient_balance(total_amount):
-            raise ValueError(f"Недостаточно средств на балансе. Требуется: {total_amount} руб.")
-        
+        expected_prices = expected_prices or {}
         try:
             with transaction.atomic():
-                # Создаем заказ
+                lines = list(
+                    CartItem.objects.select_for_update().filter(user=user)
+                    .order_by('product_id').values('id', 'product_id', 'quantity')
+                )
+                if not lines:
+                    raise ValueError("Корзина пуста")
+                if expected_quantities is not None and expected_quantities != {
+                    line['product_id']: line['quantity'] for line in lines
+                }:
+                    raise ValueError("Корзина изменилась после оформления заказа")
+
+                products = {
+                    product['id']: product for product in
+                    Product.objects.select_for_update().filter(pk__in=[line['product_id'] for line in lines])
+                    .order_by('id').values('id', 'name', 'price', 'is_active', 'stock_quantity')
+                }
+
+                # Проверяем доступность товаров по заблокированным строкам
+                total_amount = Decimal('0.00')
+                order_items = []
+                for line in lines:
+                    product = products[line['product_id']]
+                    problem = CartService.line_problem(
+                        {**product, 'quantity': line['quantity']}, expected_prices.get(product['id'])
+                    )
+                    if problem:
+                        raise ValueError(problem[1])
+                    item_total = product['price'] * line['quantity']
+                    total_amount += item_total
+                    order_items.append(OrderItem(
+                        product_id=product['id'],
+                        quantity=line['quantity'],
+                        price=product['price'],
+                        total_price=item_total,
+                    ))
+
+                # Создаем заказ и все его позиции
                 order = Order.objects.create(
                     user=user,
                     total_amount=total_amount,
                     status='pending'
                 )
-                
-                # Создаем элементы заказа
-                for item_data in order_items_data:
-                    OrderItem.objects.create(
-                        order=order,
-                        **item_data
-                    )
-                
-                # Списываем средства с баланса
-                user.subtract_balance(total_amount)
-                
-                # Уменьшаем количество товаров на складе
-                for cart_item in cart_items:
-                    cart_item.product.decrease_stock(cart_item.quantity)
-                
+                for item in order_items:
+                    item.order = order
+                OrderItem.objects.bulk_create(order_items)
+
+                # Уменьшаем остатки всех товаров одним запросом
+                decrease_stock({line['product_id']: line['quantity'] for line in lines})
+
+                # Списываем средства условным UPDATE: баланс в памяти мог устареть,
+                # поэтому проверка выполняется самим запросом
+                try:
+                    user.subtract_balance(total_amount)
+                except ValueError:
+                    raise ValueError(f"Недостаточно средств на балансе. Требуется: {total_amount} руб.")
+
                 # Очищаем корзину
-                cart_items.delete()
-                
+                CartItem.objects.filter(pk__in=[line['id'] for line in lines]).delete()
+
                 # Логируем успешный заказ
                 logger.info(
                     f"Заказ #{order.id} успешно создан для пользователя {user.username}. "
-                    f"Сумма: {total_amount} руб., товаров: {len(order_items_data)}"
+                    f"Сумма: {total_amount} руб., товаров: {len(order_items)}"
                 )
-                
+
                 return order
-                
+
+        except ValueError:
+            # Корзина не прошла проверки: это не сбой
+            raise
         except Exception as e:
             logger.error(f"Ошибка при создании заказа для пользователя {user.username}: {str(e)}")
             raise
-    
+
     @staticmethod
     def cancel_order(order):
         """
-        Cancel order and return items to stock.
+        Cancel order, return items to stock and refund the user.
+
+        Stock is returned with one grouped UPDATE and the refund is one
+        balance UPDATE, whatever the number of lines (see cancel_orders).
         """
         if not order.can_be_cancelled():
             raise ValueError("Заказ не может быть отменен")
-        
+
         try:
-            with transaction.atomic():
-                # Возвращаем товары на склад
-                for item in order.order_items.all():
-                    item.product.increase_stock(item.quantity)
-                
-                # Возвращаем деньги пользователю
-                order.user.add_balance(order.total_amount)
-                
-                # Меняем статус заказа
-                order.status = 'cancelled'
-                order.save()
-                
-                # Логируем отмену заказа
-                logger.info(
-                    f"Заказ #{order.id} отменен для пользователя {order.user.username}. "
-                    f"Возвращено: {order.total_amount} руб."
-                )
-                
-                return order
-                
+            # Статус проверяется еще раз под блокировкой: параллельная отмена не вернет деньги дважды
+            if not cancel_orders([order.pk]):
+                raise ValueError("Заказ не может быть отменен")
+            order.status = 'cancelled'
+
+            # Логируем отмену заказа
+            logger.info(
+                f"Заказ #{order.id} отменен для пользователя {order.user.username}. "
+                f"Возвращено: {order.total_amount} руб."
+            )
+
+            return order
+
+        except ValueError:
+            raise
         except Exception as e:
             logger.error(f"Ошибка при отмене заказа #{order.id}: {str(e)}")
             raise
-    
+
     @staticmethod
     def get_order_summary(user):
         """
@@ -143,18 +166,16 @@ class OrderService:
         """
         Validate if user can create order.
         """
-        cart_items = CartItem.objects.filter(user=user).select_related('product')
-        
-        if not cart_items.exists():
+        availability = CartService.check_availability(user)
+
+        if not availability['lines']:
             return False, "Корзина пуста"
-        
-        total_amount = sum(item.total_price for item in cart_items)
-        
+
+        total_amount = availability['total_amount']
         if not user.has_sufficient_balance(total_amount):
             return False, f"Недостаточно средств на балансе. Требуется: {total_amount} руб."
-        
-        for cart_item in cart_items:
-            if not cart_item.can_be_ordered():
-                return False, f"Товар {cart_item.product.name} недоступен для заказа"
-        
+
+        if availability['problems']:
+            return False, availability['problems'][0]['message']
+
         return True, "Заказ может быть создан" 
\ No newline at end of file
@@ -7,10 +7,14 @@ from .views import (
     OrderDetailView,
     OrderCreateView,
     OrderCancelView,
+    CheckoutJobDetailView,
     OrderStatusUpdateView,
     OrderSummaryView,
     OrderValidateView,
-    AdminOrderListView
+    AdminOrderListView,
+    AdminOrderExportView,
+    AdminOrderBulkCancelView,
+    AdminCheckoutJobStatsView
 )
 
 urlpatterns = [
@@ -18,10 +22,14 @@ urlpatterns = [
     path('create/', OrderCreateView.as_view(), name='order-create'),
     path('<int:pk>/', OrderDetailView.as_view(), name='order-detail'),
     path('<int:pk>/cancel/', OrderCancelView.as_view(), name='order-cancel'),
+    path('jobs/<int:pk>/', CheckoutJobDetailView.as_view(), name='checkout-job-detail'),
     path('<int:pk>/status/', OrderStatusUpdateView.as_view(), name='order-status-update'),
     path('summary/', OrderSummaryView.as_view(), name='order-summary'),
     path('validate/', OrderValidateView.as_view(), name='order-validate'),
 
     # Admin endpoints
     path('admin/list/', AdminOrderListView.as_view(), name='admin-order-list'),
+    path('admin/export/<str:file_format>/', AdminOrderExportView.as_view(), name='admin-order-export'),
+    path('admin/bulk-cancel/', AdminOrderBulkCancelView.as_view(), name='admin-order-bulk-cancel'),
+    path('admin/jobs/stats/', AdminCheckoutJobStatsView.as_view(), name='admin-checkout-job-stats'),
 ]
\ No newline at end of file
@@ -5,9 +5,22 @@ from rest_framework import generics, status
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from django.conf import settings
+from django.db.models import Max
 from django.shortcuts import get_object_or_404
-from .models import Order
+from django.urls import reverse
+from app.cart.storage import merge_anonymous_cart
+from app.core.conditional import conditional_get
+from app.core.export import EXPORT_CHUNK_SIZE, EXPORT_FORMATS, date_range_filter, export_response
+from app.core.idempotency import idempotent
+from app.core.views import SparseFieldsViewMixin
+from .filters import filter_orders
+from .cancellation import bulk_cancel_orders
+from .jobs import enqueue_checkout, queue_stats
+from .models import CheckoutJob, Order, OrderItem
 from .serializers import (
+    CheckoutJobSerializer,
+    CheckoutJobStatsSerializer,
     OrderSerializer,
     OrderCreateSerializer,
     OrderStatusUpdateSerializer,
@@ -16,7 +29,7 @@ from .serializers import (
 from .services import OrderService
 
 
-class OrderListView(generics.ListAPIView):
+class OrderListView(SparseFieldsViewMixin, generics.ListAPIView):
     """
     User orders list view.
     """
@@ -24,10 +37,25 @@ class OrderListView(generics.ListAPIView):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return Order.objects.filter(user=self.request.user).prefetch_related('order_items')
+        return Order.objects.filter(user=self.request.user).prefetch_related('order_items__product__category')
 
 
-class OrderDetailView(generics.RetrieveAPIView):
+def order_validators(view, request, pk):
+    row = (
+        Order.objects.filter(pk=pk, user=request.user)
+        .annotate(
+            products=Max('order_items__product__updated_at'),
+            categories=Max('order_items__product__category__updated_at'),
+        )
+        .values_list('updated_at', 'products', 'categories')
+        .first()
+    )
+    if row is None:
+        return None
+    return max(value for value in row if value is not None), ''
+
+
+class OrderDetailView(SparseFieldsViewMixin, generics.RetrieveAPIView):
     """
     Order detail view.
     """
@@ -35,7 +63,11 @@ class OrderDetailView(generics.RetrieveAPIView):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return Order.objects.filter(user=self.request.user).prefetch_related('order_items')
+        return Order.objects.filter(user=self.request.user).prefetch_related('order_items__product__category')
+
+    @conditional_get(order_validators)
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
 
 
 class OrderCreateView(APIView):
@@ -44,12 +76,24 @@ class OrderCreateView(APIView):
     """
     permission_classes = [IsAuthenticated]
 
+    @idempotent
     def post(self, request):
-        serializer = OrderCreateSerializer(data=request.data)
+        merge_anonymous_cart(request, request.user)
+        serializer = OrderCreateSerializer(data=request.data, context={'request': request})
         serializer.is_valid(raise_exception=True)
 
+        if settings.ORDER_CHECKOUT_ASYNC:
+            # Заказ создаст воркер, клиент опрашивает статус задания
+            job = enqueue_checkout(request.user, serializer.validated_data['lines'])
+            return Response({
+                'message': 'Заказ принят в обработку',
+                'job': CheckoutJobSerializer(job).data
+            }, status=status.HTTP_202_ACCEPTED, headers={'Location': reverse('checkout-job-detail', args=[job.id])})
+
         try:
-            order = OrderService.create_order_from_cart(request.user)
+            order = OrderService.create_order_from_cart(
+                request.user, expected_prices=serializer.validated_data.get('prices')
+            )
             return Response({
                 'message': 'Заказ успешно создан',
                 'order': OrderSerializer(order).data
@@ -60,12 +104,26 @@ class OrderCreateView(APIView):
             return Response({'error': 'Произошла ошибка при создании заказа'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+class CheckoutJobDetailView(generics.RetrieveAPIView):
+    """
+    Status of the user's queued checkout.
+    """
+    serializer_class = CheckoutJobSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return CheckoutJob.objects.filter(user=self.request.user).select_related('order').prefetch_related(
+            'order__order_items__product__category'
+        )
+
+
 class OrderCancelView(APIView):
     """
     Cancel order view.
     """
     permission_classes = [IsAuthenticated]
 
+    @idempotent
     def post(self, request, pk):
         order = get_object_or_404(Order, pk=pk, user=request.user)
 
@@ -116,22 +174,77 @@ class OrderValidateView(APIView):
             return Response({'can_create': False, 'message': 'Произошла ошибка при проверке'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-class AdminOrderListView(generics.ListAPIView):
+class AdminOrderListView(SparseFieldsViewMixin, generics.ListAPIView):
     """
     Admin order list view.
     """
-    queryset = Order.objects.all().prefetch_related('order_items', 'user')
+    queryset = Order.objects.all().prefetch_related('order_items__product__category', 'user')
     serializer_class = OrderSerializer
     permission_classes = [IsAdminUser]
 
     def get_queryset(self):
-        queryset = super().get_queryset()
-        status_filter = self.request.query_params.get('status')
-        if status_filter:
-            queryset = queryset.filter(status=status_filter)
+        return filter_orders(super().get_queryset(), self.request.query_params)
+
+
+class AdminOrderBulkCancelView(APIView):
+    """
+    Cancel many orders at once (admin only).
+    """
+    permission_classes = [IsAdminUser]
 
-        user_id = self.request.query_params.get('user')
-        if user_id:
-            queryset = queryset.filter(user_id=user_id)
+    def post(self, request):
+        ids = request.data.get('ids') if isinstance(request.data, dict) else request.data
+        if not isinstance(ids, list) or not ids:
+            return Response({'error': 'Ожидается непустой список ids'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(ids) > settings.ORDER_BULK_CANCEL_LIMIT:
+            return Response(
+                {'error': f'Не более {settings.ORDER_BULK_CANCEL_LIMIT} заказов за запрос'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if not all(isinstance(pk, int) and not isinstance(pk, bool) for pk in ids):
+            return Response({'error': 'ID заказов должны быть целыми числами'}, status=status.HTTP_400_BAD_REQUEST)
+        result = bulk_cancel_orders(ids, settings.ORDER_BULK_CANCEL_CHUNK)
+        return Response(result, status=status.HTTP_200_OK)
+
+
+class AdminCheckoutJobStatsView(APIView):
+    """
+    Checkout queue depth (admin only).
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(CheckoutJobStatsSerializer(queue_stats()).data)
+
+
+class AdminOrderExportView(APIView):
+    """
+    Stream order lines as CSV or NDJSON (admin only).
+    """
+    permission_classes = [IsAdminUser]
+    columns = [
+        'order_id', 'created_at', 'status', 'user_id', 'user_email', 'order_total',
+        'product_id', 'sku', 'product_name', 'quantity', 'price', 'total_price',
+    ]
+
+    def get(self, request, file_format):
+        if file_format not in EXPORT_FORMATS:
+            return Response({'error': 'Неизвестный формат выгрузки'}, status=status.HTTP_400_BAD_REQUEST)
+        # Ошибки в параметрах проверяются до начала потоковой передачи
+        try:
+            dates = date_range_filter(request.query_params, 'created_at')
+            orders = filter_orders(Order.objects.filter(**dates), request.query_params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-        return queryset
\ No newline at end of file
+        rows = (
+            OrderItem.objects.filter(order__in=orders)
+            .order_by('order_id', 'id')
+            .values_list(
+                'order_id', 'order__created_at', 'order__status', 'order__user_id',
+                'order__user__email', 'order__total_amount', 'product_id', 'product__sku',
+                'product__name', 'quantity', 'price', 'total_price',
+            )
+            .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+        )
+        return export_response(file_format, self.columns, rows, 'orders')
\ No newline at end of file
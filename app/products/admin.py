@@ -1,7 +1,8 @@
 """
 Admin configuration for products app.
 """
-from django.contrib import admin
+from django.contrib import admin, messages
+from .bulk import bulk_update_products
 from .models import Product, Category
 
 
@@ -10,7 +11,7 @@ class CategoryAdmin(admin.ModelAdmin):
     """
     Category admin.
     """
-    list_display = ['name', 'created_at']
+    list_display = ['name', 'product_count', 'min_price', 'max_price', 'created_at']
     search_fields = ['name']
     ordering = ['name']
 
@@ -21,16 +22,17 @@ class ProductAdmin(admin.ModelAdmin):
     Product admin.
     """
     list_display = [
-        'name', 'category', 'price', 'stock_quantity',
+        'name', 'sku', 'category', 'price', 'stock_quantity',
         'is_active', 'created_at'
     ]
     list_filter = ['category', 'is_active', 'created_at']
-    search_fields = ['name', 'description']
+    search_fields = ['name', 'sku', 'description']
     ordering = ['-created_at']
+    actions = ['activate_products', 'deactivate_products']
     
     fieldsets = (
         ('Основная информация', {
-            'fields': ('name', 'description', 'category', 'image')
+            'fields': ('name', 'sku', 'description', 'category', 'image')
         }),
         ('Цена и склад', {
             'fields': ('price', 'stock_quantity')
@@ -40,4 +42,22 @@ class ProductAdmin(admin.ModelAdmin):
         }),
     )
     
-    readonly_fields = ['created_at', 'updated_at'] 
\ No newline at end of file
+    readonly_fields = ['created_at', 'updated_at']
+
+    def _set_active(self, request, queryset, is_active):
+        result = bulk_update_products(
+            {'id': pk, 'is_active': is_active} for pk in queryset.values_list('id', flat=True)
+        )
+        self.message_user(
+            request,
+            f'Изменено товаров: {result["updated"]}, без изменений: {result["unchanged"]}',
+            messages.SUCCESS,
+        )
+
+    @admin.action(description='Активировать выбранные товары')
+    def activate_products(self, request, queryset):
+        self._set_active(request, queryset, True)
+
+    @admin.action(description='Снять выбранные товары с продажи')
+    def deactivate_products(self, request, queryset):
+        self._set_active(request, queryset, False)
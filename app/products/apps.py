@@ -0,0 +1,16 @@
+"""
+App configuration for products app.
+"""
+from django.apps import AppConfig
+
+
+class ProductsConfig(AppConfig):
+    """
+    Products app config.
+    """
+    name = 'app.products'
+    label = 'products'
+    verbose_name = 'Товары'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,355 @@
+"""
+In-memory prefix autocomplete for product and category names.
+"""
+import bisect
+import datetime
+import heapq
+import re
+import threading
+import time
+from django.conf import settings
+from django.db.models import Sum
+from django.utils import timezone
+from app.orders.models import OrderItem
+from .models import Category, Product
+
+MIN_QUERY_LENGTH = 2
+MAX_LIMIT = 20
+
+# Диапазоны длиннее этого не сканируются на запросе: их топ хранится заранее
+SCAN_LIMIT = 1000
+TOP_DEPTH = 500
+
+# Порог изменений за одно обновление, после которого индекс загружается заново
+REBUILD_MIN_CHANGES = 1000
+
+# Строки, закоммиченные позже своего updated_at, попадают в окно перекрытия
+WATERMARK_OVERLAP = datetime.timedelta(seconds=30)
+
+_word_re = re.compile(r'\w+')
+
+# Больше любого символа слова: prefix + _MAX_CHAR ограничивает диапазон сверху
+_MAX_CHAR = chr(0x10FFFF)
+
+
+def tokenize(text):
+    """
+    Lowercased words of text, with ё folded to е.
+    """
+    return _word_re.findall(text.lower().replace('ё', 'е'))
+
+
+class PrefixIndex:
+    """
+    Sorted (token, id) pairs with a popularity per id.
+
+    A prefix matches a contiguous range of pairs found with bisect. Ranges
+    longer than SCAN_LIMIT keep a precomputed list of their TOP_DEPTH most
+    popular ids, refreshed when one of their entries changes.
+
+    put() and remove() change the index in place and must not run while it
+    is searched: Autocomplete changes a copy() and then swaps it in.
+    """
+
+    def __init__(self):
+        self.pairs = []
+        # id -> (popularity, name, tokens, version)
+        self.entries = {}
+        self.top = {}
+
+    def load(self, rows):
+        """
+        Replace the index with (id, name, popularity, version) rows.
+        """
+        entries, pairs = {}, []
+        for pk, name, popularity, version in rows:
+            tokens = frozenset(tokenize(name))
+            entries[pk] = (popularity, name, tokens, version)
+            pairs.extend((token, pk) for token in tokens)
+        pairs.sort()
+        self.entries, self.pairs, self.top = entries, pairs, {}
+
+    def copy(self):
+        """
+        Independent copy that can be changed while this index is searched.
+        """
+        index = PrefixIndex()
+        # Значения entries и списки top не изменяются, а заменяются целиком
+        index.pairs = list(self.pairs)
+        index.entries = dict(self.entries)
+        index.top = dict(self.top)
+        return index
+
+    def version(self, pk):
+        entry = self.entries.get(pk)
+        return entry[3] if entry else None
+
+    def _range(self, prefix):
+        lo = bisect.bisect_left(self.pairs, (prefix,))
+        hi = bisect.bisect_left(self.pairs, (prefix + _MAX_CHAR,))
+        return lo, hi
+
+    def _rank(self, pk):
+        popularity, name = self.entries[pk][:2]
+        return popularity, -len(name), -pk
+
+    def _scan(self, lo, hi, limit, match=None):
+        ids = {pk for pk in self._ids(lo, hi) if pk in self.entries}
+        if match is not None:
+            ids = [pk for pk in ids if match(self.entries[pk][2])]
+        return heapq.nlargest(limit, ids, key=self._rank)
+
+    def put(self, pk, name, popularity, version=None):
+        """
+        Insert or update one entry; returns True if the index changed.
+        """
+        current = self.entries.get(pk)
+        if current is not None and current[:2] == (popularity, name):
+            self.entries[pk] = current[:3] + (version,)
+            return False
+        tokens = frozenset(tokenize(name))
+        old_tokens = current[2] if current else frozenset()
+        self.entries[pk] = (popularity, name, tokens, version)
+        for token in old_tokens - tokens:
+            self._remove_pair(token, pk)
+        for token in tokens - old_tokens:
+            bisect.insort(self.pairs, (token, pk))
+        self._invalidate(old_tokens | tokens)
+        return True
+
+    def remove(self, pk):
+        current = self.entries.pop(pk, None)
+        if current is None:
+            return False
+        for token in current[2]:
+            self._remove_pair(token, pk)
+        self._invalidate(current[2])
+        return True
+
+    def _remove_pair(self, token, pk):
+        i = bisect.bisect_left(self.pairs, (token, pk))
+        if i < len(self.pairs) and self.pairs[i] == (token, pk):
+            del self.pairs[i]
+
+    def _invalidate(self, tokens):
+        for token in tokens:
+            for end in range(1, len(token) + 1):
+                if token[:end] in self.top:
+                    self.top[token[:end]] = None
+
+    def _top(self, prefix, lo, hi):
+        ids = self.top.get(prefix)
+        if ids is None:
+            ids = self._scan(lo, hi, TOP_DEPTH)
+            self.top[prefix] = ids
+        return ids
+
+    def rebuild_top(self):
+        """
+        Recompute top lists invalidated by put()/remove().
+        """
+        for prefix, ids in list(self.top.items()):
+            if ids is None:
+                lo, hi = self._range(prefix)
+                if hi - lo > SCAN_LIMIT:
+                    self.top[prefix] = self._scan(lo, hi, TOP_DEPTH)
+                else:
+                    del self.top[prefix]
+
+    def search(self, tokens, limit):
+        """
+        Ids of the most popular entries having a word starting with each token.
+        """
+        # Кандидаты берутся из самого узкого диапазона, остальные слова проверяются
+        ranges = sorted((hi - lo, lo, hi, token) for token in set(tokens) for lo, hi in [self._range(token)])
+        size, lo, hi, primary = ranges[0]
+        others = [token for *_, token in ranges[1:]]
+
+        if size <= SCAN_LIMIT:
+            if not others:
+                return self._scan(lo, hi, limit)
+            return self._scan(lo, hi, limit, self._matcher(others))
+
+        top = self._top(primary, lo, hi)
+        if not others:
+            return top[:limit]
+        match = self._matcher(others)
+        found = [pk for pk in top if pk in self.entries and match(self.entries[pk][2])][:limit]
+        if len(found) < limit and len(top) == TOP_DEPTH:
+            # Среди популярных совпадений мало: пересечение id всех диапазонов
+            ids = self._ids(lo, hi)
+            for _, other_lo, other_hi, _ in ranges[1:]:
+                ids &= self._ids(other_lo, other_hi)
+            found = heapq.nlargest(limit, (pk for pk in ids if pk in self.entries), key=self._rank)
+        return found
+
+    def _ids(self, lo, hi):
+        return {pk for _, pk in self.pairs[lo:hi]}
+
+    @staticmethod
+    def _matcher(tokens):
+        def match(entry_tokens):
+            return all(any(word.startswith(token) for word in entry_tokens) for token in tokens)
+        return match
+
+
+class Autocomplete:
+    """
+    Product and category prefix indexes of this process.
+
+    The first lookup loads active products once; later lookups pick up
+    products changed since the updated_at watermark at most every
+    AUTOCOMPLETE_REFRESH_INTERVAL seconds. Hard-deleted products are
+    dropped by a cheap id check every AUTOCOMPLETE_RESYNC_INTERVAL seconds.
+
+    Refreshes never change the published indexes: they are applied to a copy
+    that replaces the index with one assignment, so lookups in other threads
+    need no lock. A refresh that finds nothing changed makes no copy. Lookups
+    only fill in memoized top lists.
+    """
+
+    def __init__(self):
+        self.products = PrefixIndex()
+        self.categories = PrefixIndex()
+        self.watermark = None
+        self.checked_at = 0.0
+        self.resynced_at = 0.0
+        self.loads = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def popularity(product_ids=None):
+        """
+        Units sold per product, excluding cancelled orders.
+        """
+        items = OrderItem.objects.exclude(order__status='cancelled')
+        if product_ids is not None:
+            items = items.filter(product_id__in=product_ids)
+        rows = items.values('product_id').annotate(sold=Sum('quantity')).order_by()
+        return {row['product_id']: row['sold'] for row in rows}
+
+    def load(self):
+        started = timezone.now()
+        sold = self.popularity()
+        products = PrefixIndex()
+        products.load(
+            (pk, name, sold.get(pk, 0), updated_at)
+            for pk, name, updated_at in Product.objects.filter(is_active=True)
+            .values_list('id', 'name', 'updated_at').iterator()
+        )
+        self.products = products
+        self.refresh_categories()
+        self.watermark = started
+        self.checked_at = self.resynced_at = time.monotonic()
+        self.loads += 1
+
+    def refresh_categories(self):
+        # Категорий немного, они перечитываются целиком
+        rows = list(Category.objects.filter(product_count__gt=0).values_list('id', 'name', 'product_count'))
+        current = self.categories.entries
+        if len(rows) == len(current) and all(
+            pk in current and current[pk][:2] == (count, name) for pk, name, count in rows
+        ):
+            return
+        categories = self.categories.copy()
+        seen = set()
+        for pk, name, count in rows:
+            seen.add(pk)
+            categories.put(pk, name, count)
+        for pk in set(categories.entries) - seen:
+            categories.remove(pk)
+        categories.rebuild_top()
+        self.categories = categories
+
+    def refresh(self):
+        """
+        Apply products changed since the watermark.
+        """
+        started = timezone.now()
+        rows = [
+            row for row in Product.objects.filter(updated_at__gt=self.watermark - WATERMARK_OVERLAP)
+            .values_list('id', 'name', 'is_active', 'updated_at')
+            # Строки из окна перекрытия, уже примененные ранее, пропускаются
+            if self.products.version(row[0]) != row[3]
+        ]
+        # Массовые изменения (импорт) дешевле применить новой загрузкой
+        if len(rows) > max(REBUILD_MIN_CHANGES, len(self.products.entries) // 10):
+            self.load()
+            return
+
+        deleted = set()
+        if time.monotonic() - self.resynced_at >= settings.AUTOCOMPLETE_RESYNC_INTERVAL:
+            existing = set(Product.objects.filter(is_active=True).values_list('id', flat=True))
+            deleted = set(self.products.entries) - existing
+            self.resynced_at = time.monotonic()
+
+        # Без изменений индекс не копируется
+        if rows or deleted:
+            active = [pk for pk, _, is_active, _ in rows if is_active]
+            sold = self.popularity(active) if active else {}
+            # Изменения применяются к копии: текущий индекс в это время читают другие потоки
+            products = self.products.copy()
+            for pk, name, is_active, updated_at in rows:
+                if is_active:
+                    products.put(pk, name, sold.get(pk, 0), updated_at)
+                else:
+                    products.remove(pk)
+            for pk in deleted:
+                products.remove(pk)
+            products.rebuild_top()
+            self.products = products
+
+        self.refresh_categories()
+        self.watermark = started
+
+    def ensure_fresh(self):
+        now = time.monotonic()
+        if self.watermark is not None and now - self.checked_at < settings.AUTOCOMPLETE_REFRESH_INTERVAL:
+            return
+        # Обновляет один поток, остальные отвечают по текущему индексу
+        blocking = self.watermark is None
+        if not self.lock.acquire(blocking=blocking):
+            return
+        try:
+            if self.watermark is None:
+                self.load()
+            elif now - self.checked_at >= settings.AUTOCOMPLETE_REFRESH_INTERVAL:
+                self.refresh()
+                self.checked_at = time.monotonic()
+        finally:
+            self.lock.release()
+
+    def suggest(self, query, limit):
+        """
+        Return (products, categories) matching query, most popular first.
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return [], []
+        self.ensure_fresh()
+        # Поиск и чтение записей идут по одному и тому же снимку индекса
+        product_index, category_index = self.products, self.categories
+        products = [
+            {'id': pk, 'name': product_index.entries[pk][1]}
+            for pk in product_index.search(tokens, limit) if pk in product_index.entries
+        ]
+        categories = [
+            {'id': pk, 'name': category_index.entries[pk][1], 'product_count': category_index.entries[pk][0]}
+            for pk in category_index.search(tokens, limit) if pk in category_index.entries
+        ]
+        return products, categories
+
+
+_autocomplete = Autocomplete()
+
+
+def get_autocomplete():
+    return _autocomplete
+
+
+def reset_autocomplete():
+    """
+    Drop the index of this process; the next lookup loads it again.
+    """
+    global _autocomplete
+    _autocomplete = Autocomplete()
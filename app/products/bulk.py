@@ -0,0 +1,105 @@
+"""
+Bulk updates of product price, stock and active flag.
+"""
+from django.db import connection, transaction
+from django.utils import timezone
+from .cache import invalidate_catalog
+from .models import Product
+from .serializers import ProductBulkUpdateSerializer
+
+BULK_FIELDS = ('price', 'stock_quantity', 'is_active')
+
+BATCH_SIZE = 1000
+
+UPDATE_SQL = """
+UPDATE products_product AS p SET
+    price = v.price,
+    stock_quantity = v.stock_quantity,
+    is_active = v.is_active,
+    updated_at = %s
+FROM (VALUES {values}) AS v (id, price, stock_quantity, is_active)
+WHERE p.id = v.id
+"""
+
+
+def bulk_update_products(rows):
+    """
+    Validate and apply {id, price?, stock_quantity?, is_active?} rows.
+
+    Valid rows are applied in one transaction and invalid ones are reported
+    with their index; rows that would not change anything are left untouched.
+    Returns counts and per-row errors.
+    """
+    result = {'updated': 0, 'unchanged': 0, 'failed': 0, 'errors': []}
+
+    def fail(index, row, errors):
+        result['failed'] += 1
+        result['errors'].append({
+            'index': index,
+            'id': row.get('id') if isinstance(row, dict) else None,
+            'errors': errors,
+        })
+
+    changes = {}
+    for index, row in enumerate(rows):
+        serializer = ProductBulkUpdateSerializer(data=row)
+        if not serializer.is_valid():
+            fail(index, row, serializer.errors)
+        elif serializer.validated_data['id'] in changes:
+            fail(index, row, {'id': ['Товар указан повторно']})
+        else:
+            data = serializer.validated_data
+            changes[data['id']] = (index, row, {field: data[field] for field in BULK_FIELDS if field in data})
+
+    with transaction.atomic():
+        # Строки блокируются в порядке id, чтобы параллельные пакеты и заказы
+        # не попадали в deadlock, а прочитанные значения не устарели до записи
+        current = {
+            pk: values for pk, *values in
+            Product.objects.select_for_update().filter(pk__in=changes).order_by('id')
+            .values_list('id', *BULK_FIELDS)
+        }
+
+        updated = []
+        for pk, (index, row, fields) in changes.items():
+            if pk not in current:
+                fail(index, row, {'id': ['Товар не найден']})
+                continue
+            old = dict(zip(BULK_FIELDS, current[pk]))
+            new = {**old, **fields}
+            if new == old:
+                result['unchanged'] += 1
+            else:
+                updated.append((pk, new))
+
+        now = timezone.now()
+        if connection.vendor == 'postgresql':
+            write = _update_values
+        else:
+            write = _bulk_update
+        for start in range(0, len(updated), BATCH_SIZE):
+            write(updated[start:start + BATCH_SIZE], now)
+        result['updated'] = len(updated)
+
+        # Массовое обновление не вызывает сигналы моделей: кэш сбрасывается один раз
+        if updated:
+            invalidate_catalog()
+
+    result['errors'].sort(key=lambda error: error['index'])
+    return result
+
+
+def _update_values(batch, now):
+    params = [now]
+    for pk, values in batch:
+        params.extend((pk, values['price'], values['stock_quantity'], values['is_active']))
+    values_sql = ', '.join(['(%s::bigint, %s::numeric, %s::integer, %s::boolean)'] * len(batch))
+    with connection.cursor() as cursor:
+        cursor.execute(UPDATE_SQL.format(values=values_sql), params)
+
+
+def _bulk_update(batch, now):
+    Product.objects.bulk_update(
+        [Product(pk=pk, updated_at=now, **values) for pk, values in batch],
+        [*BULK_FIELDS, 'updated_at'],
+    )
@@ -0,0 +1,201 @@
+"""
+Versioned response cache for the public catalog.
+"""
+import hashlib
+import threading
+import time
+from functools import wraps
+from urllib.parse import urlencode
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework.response import Response
+
+CATALOG_VERSION_KEY = 'catalog:version'
+PRODUCT_VERSION_KEY = 'catalog:product:{pk}:version'
+
+_stats = {'hits': 0, 'misses': 0, 'lock_waits': 0}
+_stats_lock = threading.Lock()
+
+
+def get_cache():
+    return caches[settings.CATALOG_CACHE_ALIAS]
+
+
+def _count(name, amount=1):
+    with _stats_lock:
+        _stats[name] += amount
+
+
+def get_stats():
+    """
+    Hit/miss counters of the current process.
+    """
+    with _stats_lock:
+        return dict(_stats)
+
+
+def _bump(key):
+    cache = get_cache()
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Ключ вытеснен или еще не создан: начинаем с текущего времени, чтобы
+        # новая версия была больше любой из уже использованных
+        if not cache.add(key, time.time_ns() // 1000, timeout=None):
+            cache.incr(key)
+
+
+def _bump_now_and_on_commit(key):
+    """
+    Bump immediately and once more after commit, so that a response rendered
+    from the pre-commit state is not cached under the final version.
+    """
+    _bump(key)
+    transaction.on_commit(lambda: _bump(key))
+
+
+def invalidate_catalog():
+    """
+    Invalidate every cached catalog response.
+    """
+    _bump_now_and_on_commit(CATALOG_VERSION_KEY)
+
+
+def invalidate_product_stock(product_id):
+    """
+    Invalidate cached detail and stock responses of one product.
+    """
+    _bump_now_and_on_commit(PRODUCT_VERSION_KEY.format(pk=product_id))
+
+
+def make_key(name, request, pk=None):
+    """
+    Build a cache key from the catalog version and normalized query parameters.
+    """
+    cache = get_cache()
+    version_keys = [CATALOG_VERSION_KEY]
+    if pk is not None:
+        version_keys.append(PRODUCT_VERSION_KEY.format(pk=pk))
+    versions = cache.get_many(version_keys)
+
+    params = sorted(
+        (key, value)
+        for key in request.query_params
+        for value in request.query_params.getlist(key)
+    )
+    # Ссылки пагинации абсолютные, поэтому хост входит в ключ
+    digest = hashlib.md5(
+        f'{request.get_host()}?{urlencode(params)}'.encode()
+    ).hexdigest()
+
+    parts = ['catalog', name, str(versions.get(CATALOG_VERSION_KEY, 0))]
+    if pk is not None:
+        parts += [str(pk), str(versions.get(version_keys[1], 0))]
+    parts.append(digest)
+    return ':'.join(parts)
+
+
+def get_or_render(key, render):
+    """
+    Return cached data for key, rendering it at most once across concurrent requests.
+
+    render() returns the data to cache, or None if the result must not be cached.
+    """
+    cache = get_cache()
+    data = cache.get(key)
+    if data is not None:
+        _count('hits')
+        return data
+
+    lock_key = f'{key}:lock'
+    locked = cache.add(lock_key, 1, timeout=settings.CATALOG_CACHE_LOCK_TIMEOUT)
+    if not locked:
+        # Ответ уже строит другой запрос: ждем его результат
+        _count('lock_waits')
+        deadline = time.monotonic() + settings.CATALOG_CACHE_LOCK_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            data = cache.get(key)
+            if data is not None:
+                _count('hits')
+                return data
+
+    _count('misses')
+    try:
+        data = render()
+        if data is not None:
+            cache.set(key, data, timeout=settings.CATALOG_CACHE_TIMEOUT)
+        return data
+    finally:
+        if locked:
+            cache.delete(lock_key)
+
+
+def get_or_render_many(name, ids, render):
+    """
+    Return {id: data} from per-product cache entries.
+
+    Missing entries are rendered with a single render(missing_ids) call, which
+    returns {id: data} for the products that exist. Each entry depends on the
+    catalog version and the product's stock version, like per_product views.
+    """
+    if not settings.CATALOG_CACHE_ENABLED:
+        return render(list(ids))
+
+    cache = get_cache()
+    version_keys = {pk: PRODUCT_VERSION_KEY.format(pk=pk) for pk in ids}
+    versions = cache.get_many([CATALOG_VERSION_KEY, *version_keys.values()])
+    catalog_version = versions.get(CATALOG_VERSION_KEY, 0)
+    keys = {
+        pk: f'catalog:{name}:{catalog_version}:{pk}:{versions.get(version_keys[pk], 0)}'
+        for pk in ids
+    }
+
+    cached = cache.get_many(list(keys.values()))
+    result, missing = {}, []
+    for pk, key in keys.items():
+        if key in cached:
+            result[pk] = cached[key]
+        else:
+            missing.append(pk)
+    _count('hits', len(result))
+
+    if missing:
+        _count('misses', len(missing))
+        rendered = render(missing)
+        cache.set_many(
+            {keys[pk]: data for pk, data in rendered.items()},
+            timeout=settings.CATALOG_CACHE_TIMEOUT,
+        )
+        result.update(rendered)
+    return result
+
+
+def catalog_cached(name, per_product=False):
+    """
+    Cache successful GET responses of a catalog view.
+
+    With per_product=True the entry also depends on the product's stock
+    version, so stock changes invalidate it without touching the catalog.
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            if not settings.CATALOG_CACHE_ENABLED:
+                return method(self, request, *args, **kwargs)
+
+            key = make_key(name, request, pk=kwargs.get('pk') if per_product else None)
+            response = None
+
+            def render():
+                nonlocal response
+                response = method(self, request, *args, **kwargs)
+                return response.data if response.status_code == 200 else None
+
+            data = get_or_render(key, render)
+            if response is not None:
+                return response
+            return Response(data)
+        return wrapper
+    return decorator
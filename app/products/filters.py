@@ -0,0 +1,117 @@
+"""
+Product list filters and facets for the shop.
+"""
+from decimal import Decimal, InvalidOperation
+from django.db.models import BooleanField, Case, Count, IntegerField, Q, Value, When
+from .search import search_products
+
+# Границы ценовых диапазонов фасетов, руб.
+PRICE_BUCKETS = [0, 500, 1000, 2000, 5000, 10000, 20000, 50000, 100000]
+
+
+def filter_products(queryset, params, exclude=(), rank=True):
+    """
+    Apply the catalog filters from query params to a product queryset.
+
+    exclude lists filters to skip (used by facets); rank=False keeps the search
+    condition but drops relevance ordering.
+    """
+    category_id = params.get('category')
+    if category_id and 'category' not in exclude:
+        queryset = queryset.filter(category_id=category_id)
+    min_price = params.get('min_price')
+    if min_price and 'min_price' not in exclude:
+        queryset = queryset.filter(price__gte=min_price)
+    max_price = params.get('max_price')
+    if max_price and 'max_price' not in exclude:
+        queryset = queryset.filter(price__lte=max_price)
+    search = params.get('search')
+    if search and 'search' not in exclude:
+        queryset = search_products(queryset, search, rank=rank)
+    return queryset
+
+
+def _price_bucket():
+    whens = [
+        When(price__lt=upper, then=Value(index))
+        for index, upper in enumerate(PRICE_BUCKETS[1:])
+    ]
+    return Case(*whens, default=Value(len(PRICE_BUCKETS) - 1), output_field=IntegerField())
+
+
+def price_condition(params):
+    """
+    Q for the min_price/max_price params; raises ValueError for invalid values.
+    """
+    condition = Q()
+    for param, lookup in (('min_price', 'price__gte'), ('max_price', 'price__lte')):
+        value = params.get(param)
+        if value:
+            try:
+                condition &= Q(**{lookup: Decimal(value)})
+            except InvalidOperation:
+                raise ValueError(f'Некорректное значение {param}')
+    return condition
+
+
+def product_facets(queryset, params):
+    """
+    Category counts and price histogram for the current filter state.
+
+    Each facet ignores its own filter (category counts respect the price
+    range, price buckets respect the category), so the sidebar can show the
+    alternatives. Everything comes from one grouped query over
+    (category, price bucket, in price range).
+    """
+    category_id = params.get('category')
+    try:
+        category_id = int(category_id) if category_id else None
+    except ValueError:
+        raise ValueError('Некорректное значение category')
+
+    in_range = price_condition(params)
+    if in_range:
+        in_price = Case(
+            When(in_range, then=Value(True)),
+            default=Value(False),
+            output_field=BooleanField(),
+        )
+    else:
+        in_price = Value(True, output_field=BooleanField())
+
+    rows = (
+        filter_products(queryset, params, exclude=('category', 'min_price', 'max_price'), rank=False)
+        .order_by()
+        .annotate(bucket=_price_bucket(), in_price=in_price)
+        .values('category_id', 'category__name', 'bucket', 'in_price')
+        .annotate(count=Count('id'))
+    )
+
+    categories = {}
+    buckets = [0] * len(PRICE_BUCKETS)
+    total = 0
+    for row in rows:
+        in_category = category_id is None or row['category_id'] == category_id
+        if row['in_price']:
+            entry = categories.setdefault(
+                row['category_id'],
+                {'id': row['category_id'], 'name': row['category__name'], 'count': 0},
+            )
+            entry['count'] += row['count']
+            if in_category:
+                total += row['count']
+        if in_category:
+            buckets[row['bucket']] += row['count']
+
+    return {
+        'total': total,
+        'categories': sorted(categories.values(), key=lambda entry: entry['name']),
+        'price_buckets': [
+            {
+                'min': lower,
+                'max': PRICE_BUCKETS[index + 1] if index + 1 < len(PRICE_BUCKETS) else None,
+                'count': buckets[index],
+            }
+            for index, lower in enumerate(PRICE_BUCKETS)
+        ],
+    }
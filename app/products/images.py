@@ -0,0 +1,156 @@
+"""
+Resized WebP/JPEG variants of product images.
+"""
+import hashlib
+import io
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections
+from django.utils import timezone
+from PIL import Image, ImageOps
+from .cache import invalidate_catalog
+from .models import Product
+
+logger = logging.getLogger(__name__)
+
+# Максимальные размеры вариантов (ширина, высота), от большего к меньшему
+VARIANTS = {
+    'zoom': (1600, 1600),
+    'card': (600, 600),
+    'thumb': (200, 200),
+}
+
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 85, 'optimize': True, 'progressive': True}),
+}
+
+VARIANTS_DIR = 'products/variants'
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def render_variants(data):
+    """
+    Build every variant of an image in every format.
+
+    Takes the original file bytes and returns {variant: {format: bytes}}.
+    Pure CPU work without Django access, so it can run in another process.
+    """
+    image = Image.open(io.BytesIO(data))
+    # JPEG декодируется сразу в уменьшенном масштабе, если оригинал намного больше
+    image.draft('RGB', max(VARIANTS.values()))
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'PA') else 'RGB')
+
+    rendered = {}
+    # Каждый следующий вариант уменьшается из предыдущего, а не из оригинала
+    for name, size in VARIANTS.items():
+        image = image.copy()
+        image.thumbnail(size, Image.LANCZOS)
+        rendered[name] = {}
+        for fmt, (pil_format, options) in FORMATS.items():
+            output = image
+            if pil_format == 'JPEG' and image.mode == 'RGBA':
+                output = Image.new('RGB', image.size, (255, 255, 255))
+                output.paste(image, mask=image.getchannel('A'))
+            buffer = io.BytesIO()
+            output.save(buffer, pil_format, **options)
+            rendered[name][fmt] = buffer.getvalue()
+    return rendered
+
+
+def store_variants(rendered):
+    """
+    Save rendered variants under content-addressed names and return their paths.
+
+    Identical files map to the same name, so they are written only once.
+    """
+    paths = {}
+    for name, formats in rendered.items():
+        paths[name] = {}
+        for fmt, content in formats.items():
+            digest = hashlib.sha256(content).hexdigest()
+            path = f'{VARIANTS_DIR}/{digest[:2]}/{digest}.{"jpg" if fmt == "jpeg" else fmt}'
+            if not default_storage.exists(path):
+                path = default_storage.save(path, ContentFile(content))
+            paths[name][fmt] = path
+    return paths
+
+
+def needs_variants(product):
+    """
+    True if the product has an image whose variants are missing or stale.
+    """
+    return bool(product.image) and product.image_variants.get('source') != product.image.name
+
+
+def save_variants(product_id, source, paths):
+    """
+    Record variant paths if the product still has the same image.
+    """
+    updated = Product.objects.filter(pk=product_id, image=source).update(
+        image_variants={'source': source, **paths},
+        updated_at=timezone.now(),
+    )
+    return bool(updated)
+
+
+def process_product_image(product_id, invalidate=True):
+    """
+    Build, store and record variants of one product image.
+    """
+    product = Product.objects.filter(pk=product_id).only('id', 'image', 'image_variants').first()
+    if product is None or not needs_variants(product):
+        return False
+
+    source = product.image.name
+    try:
+        with product.image.open('rb') as f:
+            rendered = render_variants(f.read())
+    except (OSError, ValueError, Image.DecompressionBombError):
+        logger.exception('Не удалось обработать изображение товара %s', product_id)
+        return False
+
+    saved = save_variants(product_id, source, store_variants(rendered))
+    # update() не вызывает сигналы, поэтому кэш каталога сбрасывается явно
+    if saved and invalidate:
+        invalidate_catalog()
+    return saved
+
+
+def _run_in_worker(product_id):
+    close_old_connections()
+    try:
+        process_product_image(product_id)
+    except Exception:
+        logger.exception('Ошибка фоновой обработки изображения товара %s', product_id)
+    finally:
+        close_old_connections()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.PRODUCT_IMAGE_WORKERS,
+                thread_name_prefix='product-images',
+            )
+        return _executor
+
+
+def schedule_product_image(product_id):
+    """
+    Build variants in the background worker pool, or inline if disabled.
+    """
+    if settings.PRODUCT_IMAGE_ASYNC:
+        get_executor().submit(_run_in_worker, product_id)
+    else:
+        process_product_image(product_id)
@@ -0,0 +1,275 @@
+"""
+Bulk catalog import for the shop.
+"""
+import csv
+import io
+import json
+import resource
+import time
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from django.db import connection, transaction
+from django.utils import timezone
+from .cache import invalidate_catalog
+from .models import Category, Product
+
+# Поля товара, обновляемые при повторном импорте того же артикула
+UPDATE_FIELDS = ['name', 'description', 'price', 'stock_quantity', 'category', 'is_active', 'updated_at']
+
+STAGING_TABLE = 'import_product_staging'
+
+CREATE_STAGING_SQL = f"""
+CREATE TEMP TABLE IF NOT EXISTS {STAGING_TABLE} (
+    line_no integer NOT NULL,
+    sku varchar(64) NOT NULL,
+    name varchar(200) NOT NULL,
+    description text NOT NULL,
+    price numeric(10, 2) NOT NULL,
+    stock_quantity integer NOT NULL,
+    category_id bigint NOT NULL,
+    is_active boolean NOT NULL
+)
+"""
+
+# Для повторяющихся артикулов в одной пачке берется последняя строка
+MERGE_SQL = f"""
+INSERT INTO products_product (
+    sku, name, description, price, stock_quantity, category_id, is_active,
+    image_variants, created_at, updated_at
+)
+SELECT DISTINCT ON (sku)
+    sku, name, description, price, stock_quantity, category_id, is_active,
+    '{{}}'::jsonb, %s, %s
+FROM {STAGING_TABLE}
+ORDER BY sku, line_no DESC
+ON CONFLICT (sku) DO UPDATE SET
+    name = EXCLUDED.name,
+    description = EXCLUDED.description,
+    price = EXCLUDED.price,
+    stock_quantity = EXCLUDED.stock_quantity,
+    category_id = EXCLUDED.category_id,
+    is_active = EXCLUDED.is_active,
+    updated_at = EXCLUDED.updated_at
+"""
+
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 'да'}
+FALSE_VALUES = {'0', 'false', 'no', 'n', 'нет'}
+
+
+class ImportRowError(ValueError):
+    """
+    Invalid row in the imported file.
+    """
+
+
+def read_rows(stream, file_format):
+    """
+    Yield (line_no, dict) pairs from a CSV or JSONL stream.
+    """
+    if file_format == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+    elif file_format == 'jsonl':
+        for line_no, line in enumerate(stream, start=1):
+            line = line.strip()
+            if line:
+                try:
+                    yield line_no, json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield line_no, ImportRowError(f'Некорректный JSON: {e}')
+    else:
+        raise ValueError(f'Неизвестный формат: {file_format}')
+
+
+def parse_row(row):
+    """
+    Validate a raw row and return normalized product values.
+    """
+    if isinstance(row, ImportRowError):
+        raise row
+    if not isinstance(row, dict):
+        raise ImportRowError('Строка должна быть объектом JSON')
+
+    def text(name, required=True):
+        value = row.get(name)
+        value = '' if value is None else str(value).strip()
+        if required and not value:
+            raise ImportRowError(f'Не заполнено поле {name}')
+        return value
+
+    sku = text('sku')
+    if len(sku) > 64:
+        raise ImportRowError('Артикул длиннее 64 символов')
+    name = text('name')
+    if len(name) > 200:
+        raise ImportRowError('Название длиннее 200 символов')
+
+    try:
+        price = Decimal(text('price')).quantize(Decimal('0.01'))
+    except InvalidOperation:
+        raise ImportRowError('Некорректная цена')
+    if price <= 0:
+        raise ImportRowError('Цена должна быть положительной')
+    if price >= Decimal('100000000'):
+        raise ImportRowError('Цена должна быть меньше 100000000')
+
+    try:
+        stock_quantity = int(text('stock_quantity', required=False) or 0)
+    except ValueError:
+        raise ImportRowError('Некорректное количество на складе')
+    if stock_quantity < 0:
+        raise ImportRowError('Количество на складе не может быть отрицательным')
+
+    is_active = text('is_active', required=False).lower()
+    if is_active in ('', *TRUE_VALUES):
+        is_active = True
+    elif is_active in FALSE_VALUES:
+        is_active = False
+    else:
+        raise ImportRowError('Некорректное значение is_active')
+
+    category = text('category')
+    if len(category) > 100:
+        raise ImportRowError('Название категории длиннее 100 символов')
+
+    return {
+        'sku': sku,
+        'name': name,
+        'description': text('description', required=False),
+        'price': price,
+        'stock_quantity': stock_quantity,
+        'category': category,
+        'is_active': is_active,
+    }
+
+
+class CatalogImporter:
+    """
+    Upsert categories and products from a stream in batches.
+
+    On PostgreSQL each batch is loaded with COPY into a temporary staging table
+    and merged with INSERT ... ON CONFLICT (sku) DO UPDATE; other backends use
+    bulk_create(update_conflicts=True).
+    """
+    max_errors = 100
+
+    def __init__(self, batch_size=5000, use_copy=None, progress=None):
+        self.batch_size = batch_size
+        if use_copy is None:
+            use_copy = connection.vendor == 'postgresql'
+        self.use_copy = use_copy
+        self.progress = progress
+        self.categories = {}
+        self.stats = {
+            'rows': 0,
+            'imported': 0,
+            'failed': 0,
+            'categories_created': 0,
+            'seconds': 0.0,
+            'rows_per_second': 0.0,
+            'max_rss_kb': 0,
+        }
+        self.errors = []
+
+    def run(self, stream, file_format):
+        started = time.monotonic()
+        self.categories = dict(Category.objects.values_list('name', 'id'))
+        if self.use_copy:
+            with connection.cursor() as cursor:
+                cursor.execute(CREATE_STAGING_SQL)
+
+        try:
+            rows = read_rows(stream, file_format)
+            while True:
+                batch = list(islice(rows, self.batch_size))
+                if not batch:
+                    break
+                self.import_batch(batch)
+                if self.progress:
+                    self.progress(self.stats)
+        finally:
+            if self.use_copy:
+                with connection.cursor() as cursor:
+                    cursor.execute(f'DROP TABLE IF EXISTS {STAGING_TABLE}')
+
+        # Массовые операции не вызывают сигналы моделей
+        invalidate_catalog()
+
+        elapsed = time.monotonic() - started
+        self.stats['seconds'] = round(elapsed, 2)
+        self.stats['rows_per_second'] = round(self.stats['imported'] / elapsed, 1) if elapsed else 0.0
+        self.stats['max_rss_kb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return self.stats
+
+    def import_batch(self, batch):
+        values = []
+        for line_no, row in batch:
+            self.stats['rows'] += 1
+            try:
+                values.append((line_no, parse_row(row)))
+            except ImportRowError as e:
+                self.stats['failed'] += 1
+                if len(self.errors) < self.max_errors:
+                    self.errors.append((line_no, str(e)))
+        if not values:
+            return
+
+        with transaction.atomic():
+            self.create_categories({item['category'] for _, item in values})
+            if self.use_copy:
+                self.merge_with_copy(values)
+            else:
+                self.merge_with_bulk_create(values)
+        self.stats['imported'] += len(values)
+
+    def create_categories(self, names):
+        missing = [Category(name=name) for name in names if name not in self.categories]
+        if not missing:
+            return
+        for category in Category.objects.bulk_create(missing):
+            self.categories[category.name] = category.id
+        self.stats['categories_created'] += len(missing)
+
+    def merge_with_copy(self, values):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for line_no, item in values:
+            writer.writerow([
+                line_no, item['sku'], item['name'], item['description'], item['price'],
+                item['stock_quantity'], self.categories[item['category']],
+                't' if item['is_active'] else 'f',
+            ])
+        buffer.seek(0)
+
+        now = timezone.now()
+        with connection.cursor() as cursor:
+            cursor.execute(f'TRUNCATE {STAGING_TABLE}')
+            # Пустое описание в CSV без кавычек COPY читает как NULL
+            cursor.copy_expert(
+                f'COPY {STAGING_TABLE} FROM STDIN WITH (FORMAT csv, FORCE_NOT_NULL (description))',
+                buffer,
+            )
+            cursor.execute(MERGE_SQL, [now, now])
+
+    def merge_with_bulk_create(self, values):
+        now = timezone.now()
+        products = {}
+        for _, item in values:
+            products[item['sku']] = Product(
+                sku=item['sku'],
+                name=item['name'],
+                description=item['description'],
+                price=item['price'],
+                stock_quantity=item['stock_quantity'],
+                category_id=self.categories[item['category']],
+                is_active=item['is_active'],
+                created_at=now,
+                updated_at=now,
+            )
+        Product.objects.bulk_create(
+            products.values(),
+            update_conflicts=True,
+            unique_fields=['sku'],
+            update_fields=UPDATE_FIELDS,
+        )
@@ -0,0 +1,101 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:20
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+SEARCH_TRIGGERS_SQL = """
+CREATE OR REPLACE FUNCTION products_product_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('russian', coalesce(NEW.name, '')), 'A') ||
+        setweight(to_tsvector('russian', coalesce(
+            (SELECT name FROM products_category WHERE id = NEW.category_id), '')), 'B') ||
+        setweight(to_tsvector('russian', coalesce(NEW.description, '')), 'C');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER products_product_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF name, description, category_id ON products_product
+    FOR EACH ROW EXECUTE FUNCTION products_product_search_vector_update();
+
+CREATE OR REPLACE FUNCTION products_category_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    IF NEW.name IS DISTINCT FROM OLD.name THEN
+        UPDATE products_product SET name = name WHERE category_id = NEW.id;
+    END IF;
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER products_category_search_vector_trigger
+    AFTER UPDATE OF name ON products_category
+    FOR EACH ROW EXECUTE FUNCTION products_category_search_vector_update();
+
+UPDATE products_product SET name = name;
+"""
+
+DROP_SEARCH_TRIGGERS_SQL = """
+DROP TRIGGER IF EXISTS products_category_search_vector_trigger ON products_category;
+DROP FUNCTION IF EXISTS products_category_search_vector_update();
+DROP TRIGGER IF EXISTS products_product_search_vector_trigger ON products_product;
+DROP FUNCTION IF EXISTS products_product_search_vector_update();
+"""
+
+
+def create_search_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(SEARCH_TRIGGERS_SQL)
+
+
+def drop_search_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(DROP_SEARCH_TRIGGERS_SQL)
+
+
+def create_trigram_index(apps, schema_editor):
+    """
+    pg_trgm ships with PostgreSQL contrib; skip the index if it is not available.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        if cursor.fetchone() is None:
+            return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS product_name_trgm_idx '
+        'ON products_product USING gin (name gin_trgm_ops)'
+    )
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS product_name_trgm_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='product_search_vector_idx'),
+        ),
+        migrations.RunPython(create_search_triggers, drop_search_triggers),
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
@@ -0,0 +1,148 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:48
+
+from django.db import migrations, models
+
+
+# Изменения активных товаров: +1 с новой ценой, -1 со старой
+CHANGES_SQL = {
+    'INSERT': 'SELECT category_id, 1 AS delta, price AS new_price, NULL::numeric AS old_price '
+              'FROM new_rows WHERE is_active',
+    'DELETE': 'SELECT category_id, -1 AS delta, NULL::numeric AS new_price, price AS old_price '
+              'FROM old_rows WHERE is_active',
+}
+# При UPDATE учитываются только строки, где изменились активность, цена или категория,
+# поэтому изменение остатков не трогает категории
+CHANGED_SQL = (
+    'FROM new_rows n JOIN old_rows o ON o.id = n.id '
+    'WHERE (o.is_active, o.price, o.category_id) IS DISTINCT FROM (n.is_active, n.price, n.category_id)'
+)
+CHANGES_SQL['UPDATE'] = (
+    f'SELECT n.category_id, 1 AS delta, n.price AS new_price, NULL::numeric AS old_price '
+    f'{CHANGED_SQL} AND n.is_active '
+    f'UNION ALL '
+    f'SELECT o.category_id, -1 AS delta, NULL::numeric AS new_price, o.price AS old_price '
+    f'{CHANGED_SQL} AND o.is_active'
+)
+
+# Количество меняется на разницу. Границы цен расширяются новыми ценами и
+# пересчитываются по индексу (category, price) WHERE is_active, только если
+# ушедшая цена была границей. Строки категорий блокируются в порядке id,
+# чтобы параллельные пакетные изменения не попадали в deadlock.
+APPLY_SQL = """
+        PERFORM 1 FROM products_category
+        WHERE id IN (SELECT category_id FROM ({changes}) AS changes)
+        ORDER BY id FOR NO KEY UPDATE;
+
+        UPDATE products_category AS c SET
+            product_count = c.product_count + d.delta,
+            min_price = CASE
+                WHEN d.old_min <= c.min_price THEN (
+                    SELECT min(p.price) FROM products_product p
+                    WHERE p.category_id = c.id AND p.is_active)
+                ELSE LEAST(c.min_price, d.new_min) END,
+            max_price = CASE
+                WHEN d.old_max >= c.max_price THEN (
+                    SELECT max(p.price) FROM products_product p
+                    WHERE p.category_id = c.id AND p.is_active)
+                ELSE GREATEST(c.max_price, d.new_max) END
+        FROM (
+            SELECT category_id, sum(delta) AS delta,
+                min(new_price) AS new_min, max(new_price) AS new_max,
+                min(old_price) AS old_min, max(old_price) AS old_max
+            FROM ({changes}) AS changes
+            GROUP BY category_id
+        ) AS d
+        WHERE c.id = d.category_id
+            AND (d.delta <> 0 OR c.min_price IS NULL
+                OR d.old_min <= c.min_price OR d.old_max >= c.max_price
+                OR d.new_min < c.min_price OR d.new_max > c.max_price);"""
+
+STATS_TRIGGERS_SQL = f"""
+CREATE OR REPLACE FUNCTION products_category_stats_update() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN{APPLY_SQL.format(changes=CHANGES_SQL['INSERT'])}
+    ELSIF TG_OP = 'DELETE' THEN{APPLY_SQL.format(changes=CHANGES_SQL['DELETE'])}
+    ELSE{APPLY_SQL.format(changes=CHANGES_SQL['UPDATE'])}
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER products_category_stats_insert_trigger
+    AFTER INSERT ON products_product
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION products_category_stats_update();
+
+CREATE TRIGGER products_category_stats_update_trigger
+    AFTER UPDATE ON products_product
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION products_category_stats_update();
+
+CREATE TRIGGER products_category_stats_delete_trigger
+    AFTER DELETE ON products_product
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION products_category_stats_update();
+"""
+
+DROP_STATS_TRIGGERS_SQL = """
+DROP TRIGGER IF EXISTS products_category_stats_delete_trigger ON products_product;
+DROP TRIGGER IF EXISTS products_category_stats_update_trigger ON products_product;
+DROP TRIGGER IF EXISTS products_category_stats_insert_trigger ON products_product;
+DROP FUNCTION IF EXISTS products_category_stats_update();
+"""
+
+
+def create_stats_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(STATS_TRIGGERS_SQL)
+
+
+def drop_stats_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(DROP_STATS_TRIGGERS_SQL)
+
+
+def fill_stats(apps, schema_editor):
+    Category = apps.get_model('products', 'Category')
+    Product = apps.get_model('products', 'Product')
+    stats = (
+        Product.objects.filter(is_active=True).values('category_id')
+        .annotate(count=models.Count('id'), low=models.Min('price'), high=models.Max('price'))
+        .order_by()
+    )
+    categories = []
+    for row in stats:
+        categories.append(Category(
+            id=row['category_id'], product_count=row['count'],
+            min_price=row['low'], max_price=row['high'],
+        ))
+    Category.objects.bulk_update(categories, ['product_count', 'min_price', 'max_price'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0006_product_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='max_price',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, max_digits=10, null=True, verbose_name='Максимальная цена'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='min_price',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, max_digits=10, null=True, verbose_name='Минимальная цена'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='product_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Активных товаров'),
+        ),
+        migrations.RunPython(fill_stats, migrations.RunPython.noop),
+        migrations.RunPython(create_stats_triggers, drop_stats_triggers),
+    ]
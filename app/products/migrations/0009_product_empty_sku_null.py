@@ -0,0 +1,17 @@
+from django.db import migrations
+
+
+def empty_sku_to_null(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    Product.objects.filter(sku='').update(sku=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0008_product_updated_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(empty_sku_to_null, migrations.RunPython.noop),
+    ]
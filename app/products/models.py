@@ -2,6 +2,8 @@
 Product models for the shop.
 """
 from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator
 from decimal import Decimal
 
@@ -13,6 +15,17 @@ class Category(models.Model):
     name = models.CharField(max_length=100, verbose_name='Название')
     description = models.TextField(blank=True, verbose_name='Описание')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата обновления')
+    # Поддерживаются триггерами БД по активным товарам (см. stats.py)
+    product_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='Активных товаров')
+    min_price = models.DecimalField(
+        max_digits=10, decimal_places=2, null=True, blank=True, editable=False, verbose_name='Минимальная цена'
+    )
+    max_price = models.DecimalField(
+        max_digits=10, decimal_places=2, null=True, blank=True, editable=False, verbose_name='Максимальная цена'
+    )
+
+    STATS_FIELDS = ('product_count', 'min_price', 'max_price')
 
     class Meta:
         verbose_name = 'Категория'
@@ -22,11 +35,29 @@ class Category(models.Model):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        """
+        Save category without overwriting the trigger-maintained statistics.
+        """
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.STATS_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
 
 class Product(models.Model):
     """
     Product model.
     """
+    sku = models.CharField(
+        max_length=64,
+        unique=True,
+        null=True,
+        blank=True,
+        verbose_name='Артикул'
+    )
     name = models.CharField(max_length=200, verbose_name='Название')
     description = models.TextField(verbose_name='Описание')
     price = models.DecimalField(
@@ -51,14 +82,44 @@ class Product(models.Model):
         null=True,
         verbose_name='Изображение'
     )
+    # Уменьшенные копии изображения, строятся в фоне (см. images.py)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False, verbose_name='Варианты изображения')
     is_active = models.BooleanField(default=True, verbose_name='Активен')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата обновления')
+    # Заполняется триггером БД из названия, категории и описания
+    search_vector = SearchVectorField(null=True, editable=False)
 
     class Meta:
         verbose_name = 'Товар'
         verbose_name_plural = 'Товары'
         ordering = ['-created_at']
+        indexes = [
+            GinIndex(fields=['search_vector'], name='product_search_vector_idx'),
+            # Инкрементальное обновление индекса автодополнения
+            models.Index(fields=['updated_at'], name='product_updated_idx'),
+            # Пути фильтрации каталога: только активные товары
+            models.Index(
+                fields=['-created_at', 'id'],
+                condition=models.Q(is_active=True),
+                name='product_active_created_idx',
+            ),
+            models.Index(
+                fields=['category', '-created_at'],
+                condition=models.Q(is_active=True),
+                name='product_active_cat_created_idx',
+            ),
+            models.Index(
+                fields=['category', 'price'],
+                condition=models.Q(is_active=True),
+                name='product_active_cat_price_idx',
+            ),
+            models.Index(
+                fields=['price'],
+                condition=models.Q(is_active=True),
+                name='product_active_price_idx',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.name} - {self.price} руб."
@@ -83,7 +144,7 @@ class Product(models.Model):
             raise ValueError(f"Недостаточно товара на складе. Доступно: {self.stock_quantity}")
         
         self.stock_quantity -= quantity
-        self.save()
+        self.save(update_fields=['stock_quantity', 'updated_at'])
 
     def increase_stock(self, quantity):
         """
@@ -93,4 +154,4 @@ class Product(models.Model):
             raise ValueError("Количество должно быть положительным")
         
         self.stock_quantity += quantity
-        self.save() 
\ No newline at end of file
+        self.save(update_fields=['stock_quantity', 'updated_at']) 
\ No newline at end of file
@@ -0,0 +1,74 @@
+"""
+Full-text product search for the shop.
+"""
+import re
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramWordSimilarity
+from django.db import connection
+from django.db.models import F, Q
+
+# Конфигурация текстового поиска; должна совпадать с триггером из миграции 0002
+SEARCH_CONFIG = 'russian'
+
+_trigram_available = None
+
+
+def trigram_available():
+    """
+    Check if the pg_trgm extension is installed in the database.
+    """
+    global _trigram_available
+    if _trigram_available is None:
+        if connection.vendor != 'postgresql':
+            _trigram_available = False
+        else:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+                _trigram_available = cursor.fetchone() is not None
+    return _trigram_available
+
+
+def build_search_query(term):
+    """
+    Build a prefix tsquery from user input, e.g. 'умн час' -> 'умн:* & час:*'.
+    """
+    words = re.findall(r'\w+', term)
+    if not words:
+        return None
+    return SearchQuery(
+        ' & '.join(f'{word}:*' for word in words),
+        search_type='raw',
+        config=SEARCH_CONFIG,
+    )
+
+
+def search_products(queryset, term, rank=True):
+    """
+    Filter products by search term and order them by relevance.
+
+    On PostgreSQL the query uses the maintained search_vector (name, category
+    name and description) and, if pg_trgm is installed, a trigram match on the
+    name for typo tolerance. Other backends fall back to name__icontains.
+    With rank=False only the filter is applied.
+    """
+    term = term.strip()
+    if not term:
+        return queryset
+
+    if connection.vendor != 'postgresql':
+        return queryset.filter(name__icontains=term)
+
+    query = build_search_query(term)
+    if query is None:
+        return queryset.none()
+
+    condition = Q(search_vector=query)
+    if trigram_available():
+        condition |= Q(name__trigram_word_similar=term)
+    queryset = queryset.filter(condition)
+    if not rank:
+        return queryset
+
+    search_rank = SearchRank(F('search_vector'), query)
+    if trigram_available():
+        search_rank = search_rank + TrigramWordSimilarity(term, 'name')
+    return queryset.annotate(search_rank=search_rank).order_by('-search_rank', '-created_at')
@@ -1,11 +1,13 @@
 """
 Product serializers for the shop.
 """
+from django.core.files.storage import default_storage
 from rest_framework import serializers
+from app.core.serializers import MAX_ID, SparseFieldsMixin
 from .models import Product, Category
 
 
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """
     Category serializer.
     """
@@ -14,21 +16,56 @@ class CategorySerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'description']
 
 
-class ProductSerializer(serializers.ModelSerializer):
+class CategoryListSerializer(CategorySerializer):
+    """
+    Category serializer with active product count and price bounds.
+    """
+    class Meta(CategorySerializer.Meta):
+        fields = CategorySerializer.Meta.fields + ['product_count', 'min_price', 'max_price']
+
+
+class ProductSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """
     Product serializer for read operations.
     """
     category = CategorySerializer(read_only=True)
     category_name = serializers.CharField(source='category.name', read_only=True)
     is_in_stock = serializers.BooleanField(read_only=True)
+    image_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = Product
         fields = [
-            'id', 'name', 'description', 'price', 'stock_quantity',
-            'category', 'category_name', 'image', 'is_active',
+            'id', 'sku', 'name', 'description', 'price', 'stock_quantity',
+            'category', 'category_name', 'image', 'image_variants', 'is_active',
             'created_at', 'updated_at', 'is_in_stock'
         ]
+        expandable_fields = ['category']
+        only_requires = {
+            'is_in_stock': ['stock_quantity'],
+            'image_variants': ['image', 'image_variants'],
+        }
+
+    def get_image_variants(self, obj):
+        """
+        URLs of resized copies: {"thumb": {"webp": ..., "jpeg": ...}, ...}.
+
+        None until the variants of the current image are built; clients then
+        fall back to the original image.
+        """
+        variants = obj.image_variants
+        if not obj.image or variants.get('source') != obj.image.name:
+            return None
+        request = self.context.get('request')
+        urls = {}
+        for name, formats in variants.items():
+            if name == 'source':
+                continue
+            urls[name] = {}
+            for fmt, path in formats.items():
+                url = default_storage.url(path)
+                urls[name][fmt] = request.build_absolute_uri(url) if request else url
+        return urls
 
 
 class ProductCreateUpdateSerializer(serializers.ModelSerializer):
@@ -38,10 +75,14 @@ class ProductCreateUpdateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Product
         fields = [
-            'name', 'description', 'price', 'stock_quantity',
+            'sku', 'name', 'description', 'price', 'stock_quantity',
             'category', 'image', 'is_active'
         ]
 
+    def validate_sku(self, value):
+        # Пустой артикул хранится как NULL: уникальность не мешает товарам без артикула
+        return value or None
+
     def validate_price(self, value):
         if value <= 0:
             raise serializers.ValidationError("Цена должна быть положительной")
@@ -50,4 +91,25 @@ class ProductCreateUpdateSerializer(serializers.ModelSerializer):
     def validate_stock_quantity(self, value):
         if value < 0:
             raise serializers.ValidationError("Количество на складе не может быть отрицательным")
-        return value 
\ No newline at end of file
+        return value
+
+
+class ProductBulkUpdateSerializer(serializers.Serializer):
+    """
+    One row of a bulk product update: id and the fields to change.
+    """
+    id = serializers.IntegerField(min_value=1, max_value=MAX_ID)
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
+    # Границы столбца PositiveIntegerField, как их выводит ModelSerializer
+    stock_quantity = serializers.IntegerField(min_value=0, max_value=2147483647, required=False)
+    is_active = serializers.BooleanField(required=False)
+
+    def validate_price(self, value):
+        if value <= 0:
+            raise serializers.ValidationError("Цена должна быть положительной")
+        return value
+
+    def validate(self, attrs):
+        if len(attrs) == 1:
+            raise serializers.ValidationError("Не указано ни одного изменяемого поля")
+        return attrs
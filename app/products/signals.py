@@ -0,0 +1,37 @@
+"""
+Signal handlers for products app.
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from .cache import invalidate_catalog, invalidate_product_stock
+from .images import needs_variants, schedule_product_image
+from .models import Category, Product
+
+# Изменения только этих полей не затрагивают списки каталога
+STOCK_FIELDS = {'stock_quantity', 'updated_at'}
+
+
+@receiver(pre_save, sender=Product)
+def product_image_cleared(sender, instance, **kwargs):
+    if not instance.image and instance.image_variants:
+        instance.image_variants = {}
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) <= STOCK_FIELDS:
+        invalidate_product_stock(instance.pk)
+        return
+
+    invalidate_catalog()
+    if needs_variants(instance):
+        # Варианты строятся после коммита, когда файл и строка уже видны воркеру
+        transaction.on_commit(lambda: schedule_product_image(instance.pk))
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def catalog_changed(sender, **kwargs):
+    invalidate_catalog()
@@ -0,0 +1,43 @@
+"""
+Denormalized per-category product statistics.
+
+Category.product_count, min_price and max_price cover active products. On
+PostgreSQL they are kept up to date by statement-level triggers on
+products_product (migration 0007), so bulk imports and queryset updates are
+counted too; reconcile_category_stats() rebuilds them from scratch.
+"""
+from django.db import transaction
+from django.db.models import Count, Max, Min
+from .cache import invalidate_catalog
+from .models import Category, Product
+
+
+def reconcile_category_stats():
+    """
+    Recompute statistics of every category with one grouped query.
+
+    Returns the number of categories whose stored values were wrong.
+    """
+    with transaction.atomic():
+        # Блокировка до подсчета: триггеры параллельных записей дождутся конца пересчета
+        categories = list(
+            Category.objects.select_for_update().order_by('id').only('id', *Category.STATS_FIELDS)
+        )
+        stats = {
+            row['category_id']: (row['count'], row['low'], row['high'])
+            for row in Product.objects.filter(is_active=True).values('category_id')
+            .annotate(count=Count('id'), low=Min('price'), high=Max('price'))
+            .order_by()
+        }
+
+        changed = []
+        for category in categories:
+            values = stats.get(category.id, (0, None, None))
+            if values != (category.product_count, category.min_price, category.max_price):
+                category.product_count, category.min_price, category.max_price = values
+                changed.append(category)
+        Category.objects.bulk_update(changed, Category.STATS_FIELDS, batch_size=500)
+
+    if changed:
+        invalidate_catalog()
+    return len(changed)
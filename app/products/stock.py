@@ -0,0 +1,81 @@
+"""
+Set-based stock changes for many products at once.
+"""
+from django.db import connection
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+from .cache import invalidate_product_stock
+from .models import Product
+
+# Изменение остатков по списку (id, количество) одним запросом. Условие на
+# остаток задает вызывающая функция; RETURNING не нужен, достаточно rowcount.
+STOCK_SQL = """
+UPDATE products_product AS p SET
+    stock_quantity = p.stock_quantity {sign} v.quantity,
+    updated_at = %s
+FROM (VALUES {values}) AS v (id, quantity)
+WHERE p.id = v.id{condition}
+"""
+
+
+def _amount(quantities):
+    return Case(
+        *[When(pk=pk, then=Value(quantity)) for pk, quantity in quantities.items()],
+        output_field=IntegerField(),
+    )
+
+
+def _update_values(quantities, sign, condition=''):
+    params = [timezone.now()]
+    for pk, quantity in quantities.items():
+        params.extend((pk, quantity))
+    values_sql = ', '.join(['(%s::bigint, %s::integer)'] * len(quantities))
+    with connection.cursor() as cursor:
+        cursor.execute(STOCK_SQL.format(sign=sign, values=values_sql, condition=condition), params)
+        return cursor.rowcount
+
+
+def decrease_stock(quantities):
+    """
+    Subtract {product_id: quantity} from stock with one conditional UPDATE.
+
+    Only rows with enough stock are changed; if any product falls short,
+    ValueError is raised, so the call must run inside the caller's
+    transaction to roll the other rows back.
+    """
+    if not quantities:
+        return
+    if connection.vendor == 'postgresql':
+        updated = _update_values(quantities, '-', ' AND p.stock_quantity >= v.quantity')
+    else:
+        amount = _amount(quantities)
+        updated = Product.objects.filter(pk__in=quantities, stock_quantity__gte=amount).update(
+            stock_quantity=F('stock_quantity') - amount,
+            updated_at=timezone.now(),
+        )
+    if updated != len(quantities):
+        raise ValueError('Недостаточно товара на складе')
+    _invalidate(quantities)
+
+
+def increase_stock(quantities):
+    """
+    Add {product_id: quantity} back to stock with one UPDATE.
+    """
+    if not quantities:
+        return
+    if connection.vendor == 'postgresql':
+        _update_values(quantities, '+')
+    else:
+        amount = _amount(quantities)
+        Product.objects.filter(pk__in=quantities).update(
+            stock_quantity=F('stock_quantity') + amount,
+            updated_at=timezone.now(),
+        )
+    _invalidate(quantities)
+
+
+def _invalidate(quantities):
+    # update() не вызывает сигналы: кэш остатков сбрасывается по каждому товару
+    for pk in quantities:
+        invalidate_product_stock(pk)
@@ -4,20 +4,32 @@ URL configuration for products app.
 from django.urls import path
 from .views import (
     ProductListView,
+    ProductFacetsView,
+    ProductExportView,
+    ProductAutocompleteView,
     ProductDetailView,
     ProductCreateView,
     ProductUpdateView,
+    ProductBulkUpdateView,
     ProductDeleteView,
     CategoryListView,
-    ProductStockInfoView
+    ProductStockInfoView,
+    ProductStockBatchView,
+    CatalogCacheStatsView
 )
 
 urlpatterns = [
     path('', ProductListView.as_view(), name='product-list'),
+    path('facets/', ProductFacetsView.as_view(), name='product-facets'),
+    path('autocomplete/', ProductAutocompleteView.as_view(), name='product-autocomplete'),
+    path('export/<str:file_format>/', ProductExportView.as_view(), name='product-export'),
     path('<int:pk>/', ProductDetailView.as_view(), name='product-detail'),
     path('create/', ProductCreateView.as_view(), name='product-create'),
     path('<int:pk>/update/', ProductUpdateView.as_view(), name='product-update'),
+    path('bulk-update/', ProductBulkUpdateView.as_view(), name='product-bulk-update'),
     path('<int:pk>/delete/', ProductDeleteView.as_view(), name='product-delete'),
     path('categories/', CategoryListView.as_view(), name='category-list'),
     path('<int:pk>/stock/', ProductStockInfoView.as_view(), name='product-stock'),
+    path('stock/', ProductStockBatchView.as_view(), name='product-stock-batch'),
+    path('cache/stats/', CatalogCacheStatsView.as_view(), name='catalog-cache-stats'),
 ]
\ No newline at end of file
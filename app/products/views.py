@@ -1,20 +1,30 @@
 """
 Product views for the shop.
 """
-from rest_framework import generics, status
+from rest_framework import generics, serializers, status
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import AllowAny, IsAdminUser
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from django.conf import settings
 from django.shortcuts import get_object_or_404
+from app.core.conditional import conditional_get
+from app.core.export import EXPORT_CHUNK_SIZE, EXPORT_FORMATS, date_range_filter, export_response
+from app.core.serializers import MAX_ID
+from app.core.views import SparseFieldsViewMixin
+from .autocomplete import MAX_LIMIT, MIN_QUERY_LENGTH, get_autocomplete
+from .bulk import bulk_update_products
+from .cache import catalog_cached, get_or_render_many, get_stats
 from .models import Product, Category
+from .filters import filter_products, price_condition, product_facets
 from .serializers import (
     ProductSerializer,
     ProductCreateUpdateSerializer,
-    CategorySerializer
+    CategoryListSerializer
 )
 
 
-class ProductListView(generics.ListAPIView):
+class ProductListView(SparseFieldsViewMixin, generics.ListAPIView):
     """
     Product list view - accessible to all users.
     """
@@ -23,22 +33,98 @@ class ProductListView(generics.ListAPIView):
 
     def get_queryset(self):
         queryset = Product.objects.filter(is_active=True).select_related('category')
-        category_id = self.request.query_params.get('category')
-        if category_id:
-            queryset = queryset.filter(category_id=category_id)
-        min_price = self.request.query_params.get('min_price')
-        if min_price:
-            queryset = queryset.filter(price__gte=min_price)
-        max_price = self.request.query_params.get('max_price')
-        if max_price:
-            queryset = queryset.filter(price__lte=max_price)
-        search = self.request.query_params.get('search')
-        if search:
-            queryset = queryset.filter(name__icontains=search)
-        return queryset
-
-
-class ProductDetailView(generics.RetrieveAPIView):
+        return filter_products(queryset, self.request.query_params)
+
+    @catalog_cached('product-list')
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+
+class ProductFacetsView(APIView):
+    """
+    Category counts and price buckets for the product list filters.
+    """
+    permission_classes = [AllowAny]
+
+    @catalog_cached('product-facets')
+    def get(self, request):
+        queryset = Product.objects.filter(is_active=True)
+        try:
+            facets = product_facets(queryset, request.query_params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(facets, status=status.HTTP_200_OK)
+
+
+class ProductExportView(APIView):
+    """
+    Stream products as CSV or NDJSON (admin only).
+
+    Columns match the import_catalog command, so an export can be imported back.
+    """
+    permission_classes = [IsAdminUser]
+    columns = [
+        'id', 'sku', 'name', 'description', 'price', 'stock_quantity', 'category',
+        'category_id', 'is_active', 'created_at', 'updated_at',
+    ]
+
+    def get(self, request, file_format):
+        if file_format not in EXPORT_FORMATS:
+            return Response({'error': 'Неизвестный формат выгрузки'}, status=status.HTTP_400_BAD_REQUEST)
+        # Ошибки в параметрах проверяются до начала потоковой передачи
+        try:
+            dates = date_range_filter(request.query_params, 'created_at')
+            price_condition(request.query_params)
+            # Выгрузка включает и неактивные товары
+            queryset = filter_products(Product.objects.filter(**dates), request.query_params, rank=False)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        rows = (
+            queryset.order_by('id')
+            .values_list(
+                'id', 'sku', 'name', 'description', 'price', 'stock_quantity', 'category__name',
+                'category_id', 'is_active', 'created_at', 'updated_at',
+            )
+            .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+        )
+        return export_response(file_format, self.columns, rows, 'products')
+
+
+class ProductAutocompleteView(APIView):
+    """
+    Product and category name suggestions for search-as-you-type: ?q=смар.
+    """
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        query = request.query_params.get('q', '').strip()
+        if len(query) < MIN_QUERY_LENGTH:
+            return Response(
+                {'error': f'Запрос должен содержать не менее {MIN_QUERY_LENGTH} символов'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            limit = min(int(request.query_params.get('limit', 10)), MAX_LIMIT)
+        except ValueError:
+            return Response({'error': 'Некорректное значение limit'}, status=status.HTTP_400_BAD_REQUEST)
+
+        products, categories = get_autocomplete().suggest(query, max(limit, 1))
+        return Response({'products': products, 'categories': categories}, status=status.HTTP_200_OK)
+
+
+def product_validators(view, request, pk):
+    row = (
+        Product.objects.filter(pk=pk, is_active=True)
+        .values_list('updated_at', 'category__updated_at')
+        .first()
+    )
+    if row is None:
+        return None
+    return max(row), ''
+
+
+class ProductDetailView(SparseFieldsViewMixin, generics.RetrieveAPIView):
     """
     Product detail view - accessible to all users.
     """
@@ -46,6 +132,11 @@ class ProductDetailView(generics.RetrieveAPIView):
     serializer_class = ProductSerializer
     permission_classes = [AllowAny]
 
+    @conditional_get(product_validators)
+    @catalog_cached('product-detail', per_product=True)
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
 
 class ProductCreateView(generics.CreateAPIView):
     """
@@ -65,6 +156,27 @@ class ProductUpdateView(generics.UpdateAPIView):
     permission_classes = [IsAdminUser]
 
 
+class ProductBulkUpdateView(APIView):
+    """
+    Change price, stock or active flag of many products at once (admin only).
+    """
+    permission_classes = [IsAdminUser]
+
+    def post(self, request):
+        rows = request.data.get('products') if isinstance(request.data, dict) else request.data
+        if not isinstance(rows, list) or not rows:
+            return Response({'error': 'Ожидается непустой список products'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(rows) > settings.PRODUCT_BULK_UPDATE_LIMIT:
+            return Response(
+                {'error': f'Не более {settings.PRODUCT_BULK_UPDATE_LIMIT} товаров за запрос'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        result = bulk_update_products(rows)
+        if result['failed'] == len(rows):
+            return Response(result, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result, status=status.HTTP_200_OK)
+
+
 class ProductDeleteView(generics.DestroyAPIView):
     """
     Product delete view - admin only.
@@ -84,9 +196,13 @@ class CategoryListView(generics.ListAPIView):
     Category list view - accessible to all users.
     """
     queryset = Category.objects.all()
-    serializer_class = CategorySerializer
+    serializer_class = CategoryListSerializer
     permission_classes = [AllowAny]
 
+    @catalog_cached('category-list')
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
 
 class ProductStockInfoView(APIView):
     """
@@ -94,12 +210,65 @@ class ProductStockInfoView(APIView):
     """
     permission_classes = [AllowAny]
 
+    @catalog_cached('product-stock', per_product=True)
     def get(self, request, pk):
         product = get_object_or_404(Product, pk=pk, is_active=True)
+        return Response(stock_info(product), status=status.HTTP_200_OK)
+
+
+def stock_info(product):
+    return {
+        'id': product.id,
+        'name': product.name,
+        'stock_quantity': product.stock_quantity,
+        'is_in_stock': product.is_in_stock(),
+        'price': product.price,
+        'is_active': product.is_active,
+    }
+
+
+class ProductStockBatchView(APIView):
+    """
+    Stock information for many products in one request: ?ids=1,2,3.
+    """
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        values = [value for value in request.query_params.get('ids', '').split(',') if value.strip()]
+        try:
+            ids = serializers.ListField(
+                child=serializers.IntegerField(min_value=1, max_value=MAX_ID)
+            ).run_validation(values)
+        except ValidationError:
+            return Response({'error': 'Некорректный список ids'}, status=status.HTTP_400_BAD_REQUEST)
+        # Повторы убираются с сохранением порядка
+        ids = list(dict.fromkeys(ids))
+        if not ids:
+            return Response({'error': 'Не указаны ids'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(ids) > settings.PRODUCT_STOCK_BATCH_LIMIT:
+            return Response(
+                {'error': f'Не более {settings.PRODUCT_STOCK_BATCH_LIMIT} товаров за запрос'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        def render(missing):
+            products = Product.objects.filter(pk__in=missing).only(
+                'id', 'name', 'stock_quantity', 'price', 'is_active'
+            )
+            return {product.id: stock_info(product) for product in products}
+
+        found = get_or_render_many('product-stock-batch', ids, render)
         return Response({
-            'id': product.id,
-            'name': product.name,
-            'stock_quantity': product.stock_quantity,
-            'is_in_stock': product.is_in_stock(),
-            'price': product.price
-        }, status=status.HTTP_200_OK)
\ No newline at end of file
+            'results': [found[pk] for pk in ids if pk in found],
+            'not_found': [pk for pk in ids if pk not in found],
+        }, status=status.HTTP_200_OK)
+
+
+class CatalogCacheStatsView(APIView):
+    """
+    Catalog cache hit/miss counters of this process (admin only).
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(get_stats(), status=status.HTTP_200_OK)
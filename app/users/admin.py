@@ -1,4 +1,4 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from .models import User
 
@@ -14,4 +14,18 @@ class UserAdmin(BaseUserAdmin):
         ('Баланс', {'fields': ('balance',)}),
     )
     
-    readonly_fields = ['created_at', 'updated_at']
\ No newline at end of file
+    readonly_fields = ['created_at', 'updated_at']
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if change and 'balance' in form.changed_data:
+            # save() баланс не пишет: правка применяется как разница к значению,
+            # прочитанному в этом запросе, одним UPDATE
+            delta = obj.balance - form.initial['balance']
+            try:
+                if delta > 0:
+                    obj.add_balance(delta)
+                else:
+                    obj.subtract_balance(-delta)
+            except ValueError as e:
+                self.message_user(request, f'Баланс не изменен: {e}', messages.ERROR)
@@ -0,0 +1,37 @@
+"""
+Set-based balance credits for many users at once.
+"""
+from django.db import connection
+from django.db.models import Case, DecimalField, F, Value, When
+from django.utils import timezone
+from .models import User
+
+CREDIT_SQL = """
+UPDATE users_user AS u SET
+    balance = u.balance + v.amount,
+    updated_at = %s
+FROM (VALUES {values}) AS v (id, amount)
+WHERE u.id = v.id
+"""
+
+
+def credit_balances(amounts):
+    """
+    Add {user_id: amount} to balances with one UPDATE.
+    """
+    if not amounts:
+        return
+    now = timezone.now()
+    if connection.vendor == 'postgresql':
+        params = [now]
+        for pk, amount in amounts.items():
+            params.extend((pk, amount))
+        values_sql = ', '.join(['(%s::bigint, %s::numeric)'] * len(amounts))
+        with connection.cursor() as cursor:
+            cursor.execute(CREDIT_SQL.format(values=values_sql), params)
+        return
+    amount = Case(
+        *[When(pk=pk, then=Value(value)) for pk, value in amounts.items()],
+        output_field=DecimalField(max_digits=10, decimal_places=2),
+    )
+    User.objects.filter(pk__in=amounts).update(balance=F('balance') + amount, updated_at=now)
@@ -2,10 +2,20 @@
 User models for the shop.
 """
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import connection, models, transaction
+from django.db.models import F
+from django.utils import timezone
 from django.core.validators import MinValueValidator
 from decimal import Decimal
 
+# Списание выполняется, только если средств хватает; для пополнения условие
+# всегда истинно. Новый баланс возвращается тем же запросом.
+BALANCE_SQL = """
+UPDATE users_user SET balance = balance + %s, updated_at = %s
+WHERE id = %s AND balance >= %s
+RETURNING balance
+"""
+
 
 class User(AbstractUser):
     """
@@ -32,14 +42,24 @@ class User(AbstractUser):
     def __str__(self):
         return f"{self.username} ({self.email})"
 
+    def save(self, *args, **kwargs):
+        """
+        Save user without overwriting the balance, which only the balance methods change.
+        """
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'balance'
+            ]
+        super().save(*args, **kwargs)
+
     def add_balance(self, amount):
         """
         Add amount to user balance.
         """
         if amount <= 0:
             raise ValueError("Сумма должна быть положительной")
-        self.balance += amount
-        self.save()
+        self.balance = self._change_balance(amount)
 
     def subtract_balance(self, amount):
         """
@@ -47,10 +67,27 @@ class User(AbstractUser):
         """
         if amount <= 0:
             raise ValueError("Сумма должна быть положительной")
-        if self.balance < amount:
+        balance = self._change_balance(-amount)
+        if balance is None:
             raise ValueError("Недостаточно средств на балансе")
-        self.balance -= amount
-        self.save()
+        self.balance = balance
+
+    def _change_balance(self, delta):
+        # Баланс меняется одним условным UPDATE без save(): остальные поля
+        # строки не перезаписываются, параллельные изменения не теряются
+        now = timezone.now()
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(BALANCE_SQL, [delta, now, self.pk, -delta])
+                row = cursor.fetchone()
+            return row[0] if row else None
+        with transaction.atomic():
+            users = User.objects.filter(pk=self.pk)
+            if delta < 0:
+                users = users.filter(balance__gte=-delta)
+            if not users.update(balance=F('balance') + delta, updated_at=now):
+                return None
+            return User.objects.filter(pk=self.pk).values_list('balance', flat=True).get()
 
     def has_sufficient_balance(self, amount):
         """
@@ -58,7 +58,8 @@ class UserProfileSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'username', 'email', 'first_name', 'last_name', 'balance', 'created_at']
-        read_only_fields = ['id', 'created_at']
+        # Баланс меняется только пополнением и заказами
+        read_only_fields = ['id', 'balance', 'created_at']
 
 
 class UserBalanceSerializer(serializers.Serializer):
@@ -6,6 +6,8 @@ from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import get_user_model
+from app.cart.storage import merge_anonymous_cart
+from app.core.idempotency import idempotent
 from .serializers import (
     UserRegistrationSerializer,
     UserLoginSerializer,
@@ -29,6 +31,7 @@ class UserRegistrationView(generics.CreateAPIView):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         user = serializer.save()
+        merge_anonymous_cart(request, user)
 
         refresh = RefreshToken.for_user(user)
 
@@ -54,6 +57,7 @@ class UserLoginView(generics.GenericAPIView):
         serializer.is_valid(raise_exception=True)
 
         user = serializer.validated_data['user']
+        merge_anonymous_cart(request, user)
         refresh = RefreshToken.for_user(user)
 
         return Response({
@@ -83,6 +87,7 @@ class UserBalanceView(views.APIView):
     """
     permission_classes = [IsAuthenticated]
 
+    @idempotent
     def post(self, request, *args, **kwargs):
         serializer = UserBalanceSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -4,6 +4,7 @@ Django settings for internet_shop project.
 
 import os
 from pathlib import Path
+from corsheaders.defaults import default_headers
 from decouple import config
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -25,6 +26,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     # Third-party apps
     'rest_framework',
@@ -83,6 +85,77 @@ DATABASES = {
     }
 }   
 
+# Cache
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Кэш ответов каталога; для нескольких процессов укажите общий бэкенд,
+    # например django.core.cache.backends.redis.RedisCache
+    'catalog': {
+        'BACKEND': config(
+            'CATALOG_CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache',
+        ),
+        'LOCATION': config('CATALOG_CACHE_LOCATION', default='catalog'),
+    },
+    # Корзины анонимных пользователей; для нескольких процессов нужен общий бэкенд
+    'cart': {
+        'BACKEND': config(
+            'CART_CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache',
+        ),
+        'LOCATION': config('CART_CACHE_LOCATION', default='cart'),
+    },
+}
+
+CATALOG_CACHE_ALIAS = 'catalog'
+CATALOG_CACHE_ENABLED = config('CATALOG_CACHE_ENABLED', default=True, cast=bool)
+CATALOG_CACHE_TIMEOUT = config('CATALOG_CACHE_TIMEOUT', default=300, cast=int)
+# Защита от одновременного пересчета одного ответа
+CATALOG_CACHE_LOCK_TIMEOUT = 10
+CATALOG_CACHE_LOCK_WAIT = 2
+
+# Фоновая обработка изображений товаров (False - сразу после сохранения, в том же потоке)
+PRODUCT_IMAGE_ASYNC = config('PRODUCT_IMAGE_ASYNC', default=True, cast=bool)
+PRODUCT_IMAGE_WORKERS = config('PRODUCT_IMAGE_WORKERS', default=2, cast=int)
+
+# Автодополнение: как часто подхватывать изменения товаров и сверять удаленные (сек.)
+AUTOCOMPLETE_REFRESH_INTERVAL = config('AUTOCOMPLETE_REFRESH_INTERVAL', default=5, cast=int)
+AUTOCOMPLETE_RESYNC_INTERVAL = config('AUTOCOMPLETE_RESYNC_INTERVAL', default=600, cast=int)
+
+# Максимум товаров в одном запросе пакетной проверки остатков
+PRODUCT_STOCK_BATCH_LIMIT = config('PRODUCT_STOCK_BATCH_LIMIT', default=200, cast=int)
+
+# Хранилище анонимных корзин и срок их жизни с последнего изменения (сек.)
+CART_CACHE_ALIAS = 'cart'
+CART_ANONYMOUS_TTL = config('CART_ANONYMOUS_TTL', default=14 * 24 * 3600, cast=int)
+# Изменения одной анонимной корзины выполняются по очереди (сек.)
+CART_LOCK_TIMEOUT = 5
+
+# Позиции корзины без изменений дольше этого срока удаляет expire_carts (дни)
+CART_EXPIRY_DAYS = config('CART_EXPIRY_DAYS', default=30, cast=int)
+
+# Максимум операций в одном пакетном изменении корзины
+CART_BATCH_LIMIT = config('CART_BATCH_LIMIT', default=500, cast=int)
+
+# Оформление заказа через очередь: ответ 202 с заданием, заказ создает run_order_workers
+ORDER_CHECKOUT_ASYNC = config('ORDER_CHECKOUT_ASYNC', default=False, cast=bool)
+# Повторы заданий после сбоев: задержка удваивается от ORDER_JOB_RETRY_DELAY до ORDER_JOB_RETRY_MAX_DELAY (сек.)
+ORDER_JOB_MAX_ATTEMPTS = config('ORDER_JOB_MAX_ATTEMPTS', default=5, cast=int)
+ORDER_JOB_RETRY_DELAY = config('ORDER_JOB_RETRY_DELAY', default=2, cast=int)
+ORDER_JOB_RETRY_MAX_DELAY = config('ORDER_JOB_RETRY_MAX_DELAY', default=300, cast=int)
+
+# Массовая отмена заказов: максимум за запрос и размер одной транзакции
+ORDER_BULK_CANCEL_LIMIT = config('ORDER_BULK_CANCEL_LIMIT', default=10000, cast=int)
+ORDER_BULK_CANCEL_CHUNK = config('ORDER_BULK_CANCEL_CHUNK', default=500, cast=int)
+
+# Срок хранения ключей идемпотентности и ответов на них (секунды)
+IDEMPOTENCY_KEY_TTL = config('IDEMPOTENCY_KEY_TTL', default=24 * 3600, cast=int)
+
+# Максимум строк в одном запросе пакетного изменения товаров
+PRODUCT_BULK_UPDATE_LIMIT = config('PRODUCT_BULK_UPDATE_LIMIT', default=5000, cast=int)
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -131,7 +204,7 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',
     ),
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'app.core.pagination.ShopPagination',
     'PAGE_SIZE': 20,
 }
 
@@ -164,6 +237,9 @@ CORS_ALLOWED_ORIGINS = config(
     'CORS_ALLOWED_ORIGINS',
     default='http://localhost:3000,http://127.0.0.1:3000',
 ).split(',')
+# Токен анонимной корзины возвращается в заголовке ответа
+CORS_EXPOSE_HEADERS = ['X-Cart-Token', 'Idempotent-Replayed']
+CORS_ALLOW_HEADERS = [*default_headers, 'x-cart-token', 'idempotency-key']
 
 # Logging configuration
 LOGGING = {
@@ -0,0 +1,457 @@
+"""
+Tests for cart app.
+"""
+import datetime
+import io
+import threading
+import unittest
+import uuid
+from decimal import Decimal
+from unittest import mock
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from rest_framework import status
+from app.cart.models import CartItem
+from app.cart.cleanup import expire_cart_items
+from app.cart.services import CartService
+from app.cart.storage import CacheCartStorage
+from app.products.models import Category, Product
+from app.users.models import User
+
+
+class CartAPITest(APITestCase):
+    """Test cart API endpoints."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.category = Category.objects.create(name='Electronics')
+        self.product = Product.objects.create(
+            name='Test Product',
+            description='Test Description',
+            price=Decimal('99.99'),
+            stock_quantity=10,
+            category=self.category
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def test_cart_sparse_fields(self):
+        """Test cart lines with sparse product fields."""
+        CartItem.objects.create(user=self.user, product=self.product, quantity=2)
+
+        response = self.client.get('/api/cart/', {'fields': 'id,product,quantity,total_price'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        item = response.data['results'][0]
+        self.assertEqual(item['product'], self.product.id)
+        self.assertEqual(item['total_price'], '199.98')
+
+        response = self.client.get('/api/cart/', {'fields': 'quantity,product.name,product.price'})
+        self.assertEqual(
+            response.data['results'][0],
+            {'quantity': 2, 'product': {'name': 'Test Product', 'price': '99.99'}}
+        )
+
+    def test_cart_summary_conditional_get(self):
+        """Test cart summary answers 304 until the cart changes."""
+        CartItem.objects.create(user=self.user, product=self.product, quantity=2)
+        etag = self.client.get('/api/cart/summary/')['ETag']
+
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/cart/summary/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        CartItem.objects.filter(user=self.user).delete()
+        response = self.client.get('/api/cart/summary/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total_items'], 0)
+
+    def test_cart_summary_totals_and_query_ceiling(self):
+        """Test summary totals come from one aggregate for a 500-line cart."""
+        products = Product.objects.bulk_create(
+            Product(
+                name=f'Product {i}', description='', price=Decimal('1.50'),
+                stock_quantity=10, category=self.category
+            )
+            for i in range(500)
+        )
+        CartItem.objects.bulk_create(
+            CartItem(user=self.user, product=product, quantity=2) for product in products
+        )
+
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/cart/summary/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total_items'], 1000)
+        self.assertEqual(response.data['total_price'], '1500.00')
+        self.assertEqual(len(response.data['items']), 500)
+        self.assertEqual(
+            set(response.data['items'][0]),
+            {'id', 'product_id', 'name', 'price', 'quantity', 'total_price'}
+        )
+        self.assertEqual(response.data['items'][0]['total_price'], '3.00')
+
+    def test_add_to_cart_accumulates_and_checks_stock(self):
+        """Test repeated adds sum up and the total is checked against stock."""
+        for quantity in (3, 4):
+            response = self.client.post(
+                '/api/cart/add/', {'product': self.product.id, 'quantity': quantity}, format='json'
+            )
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(CartItem.objects.get(user=self.user, product=self.product).quantity, 7)
+
+        response = self.client.post('/api/cart/add/', {'product': self.product.id, 'quantity': 4}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('уже в корзине: 7', response.data['non_field_errors'][0])
+        self.assertEqual(CartItem.objects.get(user=self.user, product=self.product).quantity, 7)
+
+    def test_add_to_cart_rejects_missing_and_inactive_products(self):
+        """Test adding unknown or inactive products fails without a cart line."""
+        inactive = Product.objects.create(
+            name='Hidden', description='', price=Decimal('1.00'), stock_quantity=5,
+            category=self.category, is_active=False
+        )
+        for product_id, message in ((999999, 'Товар не найден'), (inactive.id, 'Товар не активен')):
+            response = self.client.post('/api/cart/add/', {'product': product_id, 'quantity': 1}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(response.data['non_field_errors'], [message])
+        self.assertFalse(CartItem.objects.exists())
+
+    def test_add_to_cart_rejects_out_of_range_id(self):
+        """Test a product id beyond bigint is a validation error, not a server error."""
+        response = self.client.post('/api/cart/add/', {'product': 2 ** 63, 'quantity': 1}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('product', response.data)
+
+    def test_batch_operations_applied_together(self):
+        """Test a batch adds, sets and removes lines and returns the summary."""
+        other = Product.objects.create(
+            name='Other Product', description='', price=Decimal('10.00'), stock_quantity=3, category=self.category
+        )
+        third = Product.objects.create(
+            name='Third Product', description='', price=Decimal('5.00'), stock_quantity=3, category=self.category
+        )
+        CartItem.objects.create(user=self.user, product=self.product, quantity=2)
+        CartItem.objects.create(user=self.user, product=third, quantity=1)
+
+        # Блокировка строк корзины, чтение товаров, DELETE, два INSERT ... ON CONFLICT
+        # (измененные и новые строки), две точки сохранения и итоги корзины
+        expected = 9 if connection.vendor == 'postgresql' else 8
+        with self.assertNumQueries(expected):
+            response = self.client.post('/api/cart/batch/', {'operations': [
+                {'op': 'add', 'product': self.product.id, 'quantity': 3},
+                {'op': 'add', 'product': other.id, 'quantity': 1},
+                {'op': 'set', 'product': other.id, 'quantity': 3},
+                {'op': 'remove', 'product': third.id},
+            ]}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total_items'], 8)
+        self.assertEqual(response.data['total_price'], '529.95')
+        self.assertEqual(
+            dict(CartItem.objects.filter(user=self.user).values_list('product_id', 'quantity')),
+            {self.product.id: 5, other.id: 3}
+        )
+
+    def test_batch_rejected_as_a_whole(self):
+        """Test one invalid operation leaves the cart unchanged."""
+        CartItem.objects.create(user=self.user, product=self.product, quantity=2)
+        response = self.client.post('/api/cart/batch/', {'operations': [
+            {'op': 'remove', 'product': self.product.id},
+            {'op': 'add', 'product': 999999, 'quantity': 1},
+            {'op': 'set', 'product': self.product.id, 'quantity': 11},
+        ]}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([error['index'] for error in response.data['errors']], [1, 2])
+        self.assertEqual(CartItem.objects.get(user=self.user).quantity, 2)
+
+        response = self.client.post('/api/cart/batch/', {'operations': [
+            {'op': 'add', 'product': self.product.id},
+            {'op': 'remove', 'product': 2 ** 63},
+        ]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([error['index'] for error in response.data['errors']], [0, 1])
+
+
+
+class AnonymousCartTest(APITestCase):
+    """Test anonymous carts kept in the cart cache."""
+
+    def setUp(self):
+        caches['cart'].clear()
+        self.category = Category.objects.create(name='Electronics')
+        self.product = Product.objects.create(
+            name='Test Product', description='', price=Decimal('99.99'), stock_quantity=10, category=self.category
+        )
+        self.other = Product.objects.create(
+            name='Other Product', description='', price=Decimal('10.00'), stock_quantity=4, category=self.category
+        )
+
+    def test_anonymous_cart_lives_in_cache(self):
+        """Test anonymous adds get a token and write no cart rows."""
+        response = self.client.post('/api/cart/add/', {'product': self.product.id, 'quantity': 2}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        token = response['X-Cart-Token']
+
+        response = self.client.post(
+            '/api/cart/add/', {'product': self.product.id, 'quantity': 9}, format='json', HTTP_X_CART_TOKEN=token
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post('/api/cart/batch/', {'operations': [
+            {'op': 'add', 'product': self.other.id, 'quantity': 3},
+        ]}, format='json', HTTP_X_CART_TOKEN=token)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/cart/summary/', HTTP_X_CART_TOKEN=token)
+        self.assertEqual(response.data['total_items'], 5)
+        self.assertEqual(response.data['total_price'], '229.98')
+        self.assertEqual([line['product_id'] for line in response.data['items']], [self.other.id, self.product.id])
+        self.assertFalse(CartItem.objects.exists())
+
+        response = self.client.get('/api/cart/summary/')
+        self.assertEqual(response.data['total_items'], 0)
+
+    def test_anonymous_cart_merged_on_login(self):
+        """Test login merges the anonymous cart with one upsert, capped by stock."""
+        user = User.objects.create_user(username='buyer', email='buyer@example.com', password='testpass123')
+        CartItem.objects.create(user=user, product=self.other, quantity=2)
+        response = self.client.post('/api/cart/batch/', {'operations': [
+            {'op': 'add', 'product': self.product.id, 'quantity': 1},
+            {'op': 'add', 'product': self.other.id, 'quantity': 4},
+        ]}, format='json')
+        token = response['X-Cart-Token']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                '/api/auth/login/', {'email': 'buyer@example.com', 'password': 'testpass123'},
+                format='json', HTTP_X_CART_TOKEN=token
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            dict(CartItem.objects.filter(user=user).values_list('product_id', 'quantity')),
+            {self.product.id: 1, self.other.id: 4}
+        )
+        response = self.client.get('/api/cart/summary/', HTTP_X_CART_TOKEN=token)
+        self.assertEqual(response.data['total_items'], 0)
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'INSERT ... ON CONFLICT path requires PostgreSQL')
+class CartConcurrentAddTest(TransactionTestCase):
+    """Test concurrent adds of the same product."""
+
+    def test_concurrent_adds_are_not_lost(self):
+        """Test parallel adds neither lose increments nor exceed stock."""
+        user = User.objects.create_user(username='buyer', email='buyer@example.com', password='testpass123')
+        category = Category.objects.create(name='Books')
+        product = Product.objects.create(
+            name='Book', description='', price=Decimal('10.00'), stock_quantity=15, category=category
+        )
+        barrier = threading.Barrier(20)
+        errors = []
+
+        def add():
+            barrier.wait()
+            try:
+                CartService.add_item(user, product.id, 1)
+            except ValueError as e:
+                errors.append(str(e))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=add) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(CartItem.objects.get(user=user, product=product).quantity, 15)
+        self.assertEqual(len(errors), 5)
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'row locks and ON CONFLICT require PostgreSQL')
+class CartBatchConcurrentAddTest(TransactionTestCase):
+    """Test a batch change racing single adds."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='buyer', email='buyer@example.com', password='testpass123')
+        category = Category.objects.create(name='Books')
+        self.existing, self.new = [
+            Product.objects.create(
+                name=f'Book {i}', description='', price=Decimal('10.00'), stock_quantity=20, category=category
+            )
+            for i in range(2)
+        ]
+        CartItem.objects.create(user=self.user, product=self.existing, quantity=2)
+
+    def test_adds_between_plan_and_write_are_kept(self):
+        """Test adds landing after the batch read its lines are summed, not overwritten."""
+        planned, resume = threading.Event(), threading.Event()
+        plan_operations = CartService.plan_operations
+
+        def paused_plan(*args):
+            result = plan_operations(*args)
+            planned.set()
+            resume.wait(5)
+            return result
+
+        def run_batch():
+            try:
+                with mock.patch.object(CartService, 'plan_operations', side_effect=paused_plan):
+                    errors.extend(CartService.apply_operations(self.user, [
+                        {'op': 'add', 'product': self.existing.id, 'quantity': 3},
+                        {'op': 'add', 'product': self.new.id, 'quantity': 4},
+                    ]))
+            finally:
+                connection.close()
+
+        def add_existing():
+            try:
+                CartService.add_item(self.user, self.existing.id, 1)
+            finally:
+                connection.close()
+
+        errors = []
+        batch = threading.Thread(target=run_batch)
+        batch.start()
+        self.assertTrue(planned.wait(5))
+
+        # Новая строка вставляется до пакета, существующая ждет блокировки пакета
+        CartService.add_item(self.user, self.new.id, 5)
+        adder = threading.Thread(target=add_existing)
+        adder.start()
+        adder.join(0.3)
+        self.assertTrue(adder.is_alive())
+
+        resume.set()
+        batch.join()
+        adder.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(
+            dict(CartItem.objects.filter(user=self.user).values_list('product_id', 'quantity')),
+            {self.existing.id: 6, self.new.id: 9}
+        )
+
+
+class AnonymousCartConcurrentAddTest(TransactionTestCase):
+    """Test concurrent changes of one anonymous cart."""
+
+    def setUp(self):
+        caches['cart'].clear()
+        category = Category.objects.create(name='Books')
+        self.first, self.second = [
+            Product.objects.create(
+                name=f'Book {i}', description='', price=Decimal('10.00'), stock_quantity=20, category=category
+            )
+            for i in range(2)
+        ]
+
+    def test_adds_with_the_same_token_are_not_lost(self):
+        """Test an add waits for a batch that is between reading and writing the cart."""
+        storage = CacheCartStorage(uuid.uuid4().hex)
+        storage.add(self.first.id, 1)
+        planned, resume = threading.Event(), threading.Event()
+        plan_operations = CartService.plan_operations
+
+        def paused_plan(*args):
+            result = plan_operations(*args)
+            planned.set()
+            resume.wait(5)
+            return result
+
+        def run_batch():
+            try:
+                with mock.patch.object(CartService, 'plan_operations', side_effect=paused_plan):
+                    storage.apply_operations([{'op': 'add', 'product': self.first.id, 'quantity': 2}])
+            finally:
+                connection.close()
+
+        def add_second():
+            try:
+                CacheCartStorage(storage.token).add(self.second.id, 3)
+            finally:
+                connection.close()
+
+        batch = threading.Thread(target=run_batch)
+        batch.start()
+        self.assertTrue(planned.wait(5))
+        adder = threading.Thread(target=add_second)
+        adder.start()
+        adder.join(0.3)
+        self.assertTrue(adder.is_alive())
+
+        resume.set()
+        batch.join()
+        adder.join()
+        self.assertEqual(storage.items(), {self.first.id: 3, self.second.id: 3})
+
+
+class CartExpiryTest(TestCase):
+    """Test removal of abandoned cart lines."""
+
+    def setUp(self):
+        self.category = Category.objects.create(name='Books')
+        self.products = Product.objects.bulk_create(
+            Product(name=f'Book {i}', description='', price=Decimal('1.00'), category=self.category)
+            for i in range(5)
+        )
+        self.user = User.objects.create_user(username='buyer', email='buyer@example.com', password='testpass123')
+        CartItem.objects.bulk_create(CartItem(user=self.user, product=product) for product in self.products)
+        CartItem.objects.filter(product__in=self.products[:4]).update(
+            updated_at=timezone.now() - datetime.timedelta(days=40)
+        )
+
+    def test_expire_carts_command_deletes_old_lines_in_batches(self):
+        """Test only lines older than the period are deleted, batch by batch."""
+        out = io.StringIO()
+        call_command('expire_carts', days=30, batch_size=3, stdout=out)
+        self.assertEqual(list(CartItem.objects.values_list('product_id', flat=True)), [self.products[4].id])
+        self.assertIn('Deleted 4 cart items in 2 batches', out.getvalue())
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'SKIP LOCKED requires PostgreSQL')
+class CartExpirySkipLockedTest(TransactionTestCase):
+    """Test the sweeper does not wait for carts in use."""
+
+    def test_locked_lines_are_skipped(self):
+        """Test a line locked by a live request is left for the next run."""
+        category = Category.objects.create(name='Books')
+        user = User.objects.create_user(username='buyer', email='buyer@example.com', password='testpass123')
+        products = Product.objects.bulk_create(
+            Product(name=f'Book {i}', description='', price=Decimal('1.00'), category=category)
+            for i in range(3)
+        )
+        CartItem.objects.bulk_create(CartItem(user=user, product=product) for product in products)
+        CartItem.objects.update(updated_at=timezone.now() - datetime.timedelta(days=40))
+        locked_id = CartItem.objects.get(product=products[0]).id
+
+        locked, release = threading.Event(), threading.Event()
+
+        def hold_lock():
+            try:
+                with transaction.atomic():
+                    CartItem.objects.select_for_update().get(pk=locked_id)
+                    locked.set()
+                    release.wait(10)
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=hold_lock)
+        thread.start()
+        locked.wait(10)
+        try:
+            stats = expire_cart_items(datetime.timedelta(days=30), batch_size=10)
+        finally:
+            release.set()
+            thread.join()
+
+        self.assertEqual(stats['deleted'], 2)
+        self.assertEqual(list(CartItem.objects.values_list('id', flat=True)), [locked_id])
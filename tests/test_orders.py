@@ -0,0 +1,527 @@
+"""
+Tests for orders app.
+"""
+import csv
+import datetime
+import io
+import json
+import threading
+import unittest
+from decimal import Decimal
+from unittest import mock
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.http import StreamingHttpResponse
+from django.test import TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from rest_framework import status
+from app.cart.models import CartItem
+from app.cart.services import CartService
+from app.core.idempotency import purge_idempotency_keys
+from app.core.models import IdempotencyKey
+from app.orders.jobs import run_next_job
+from app.orders.models import CheckoutJob, Order, OrderItem
+from app.orders.services import OrderService
+from app.products.models import Category, Product
+from app.users.models import User
+
+
+class OrderAPITest(APITestCase):
+    """Test order API endpoints."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.category = Category.objects.create(name='Electronics')
+        self.product = Product.objects.create(
+            name='Test Product',
+            description='Test Description',
+            price=Decimal('100.00'),
+            stock_quantity=10,
+            category=self.category
+        )
+        self.order = Order.objects.create(user=self.user, total_amount=Decimal('200.00'))
+        OrderItem.objects.create(order=self.order, product=self.product, quantity=2, price=Decimal('100.00'))
+        self.client.force_authenticate(user=self.user)
+
+    def test_order_detail_conditional_get(self):
+        """Test order detail answers 304 until the order changes."""
+        url = f'/api/orders/{self.order.id}/'
+        etag = self.client.get(url)['ETag']
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.order.status = 'paid'
+        self.order.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], 'paid')
+
+
+class OrderCheckoutValidationTest(APITestCase):
+    """Test checkout validation of the whole cart."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='buyer', email='buyer@example.com', password='testpass123', balance=Decimal('100000.00')
+        )
+        self.category = Category.objects.create(name='Books')
+        self.products = Product.objects.bulk_create(
+            Product(
+                name=f'Book {i}', description='', price=Decimal('10.00'),
+                stock_quantity=5, category=self.category
+            )
+            for i in range(50)
+        )
+        CartItem.objects.bulk_create(
+            CartItem(user=self.user, product=product, quantity=2) for product in self.products
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def test_availability_reports_every_problem_line(self):
+        """Test inactive, short and repriced lines are reported with one query."""
+        inactive, short, repriced = self.products[:3]
+        Product.objects.filter(pk=inactive.pk).update(is_active=False)
+        Product.objects.filter(pk=short.pk).update(stock_quantity=1)
+
+        with self.assertNumQueries(1):
+            availability = CartService.check_availability(self.user, {repriced.id: Decimal('9.00')})
+        self.assertEqual(
+            {problem['product_id']: problem['reason'] for problem in availability['problems']},
+            {inactive.id: 'inactive', short.id: 'insufficient_stock', repriced.id: 'price_changed'}
+        )
+        self.assertEqual(availability['total_amount'], Decimal('1000.00'))
+
+        response = self.client.post('/api/orders/validate/')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(response.data['can_create'])
+
+    def test_order_create_validation_queries_do_not_grow(self):
+        """Test order creation rejects problem lines with a constant number of queries."""
+        Product.objects.filter(pk=self.products[10].pk).update(stock_quantity=0)
+        with self.assertNumQueries(1):
+            response = self.client.post('/api/orders/create/', {
+                'prices': {str(self.products[20].id): '11.00'},
+            }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            sorted(problem['reason'] for problem in response.data['problems']),
+            ['insufficient_stock', 'price_changed']
+        )
+
+    def test_order_create_succeeds(self):
+        """Test a valid cart becomes an order."""
+        response = self.client.post('/api/orders/create/', {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Order.objects.get(user=self.user).total_amount, Decimal('1000.00'))
+        self.assertFalse(CartItem.objects.filter(user=self.user).exists())
+
+    def test_checkout_queries_do_not_grow(self):
+        """Test checkout writes the whole cart with a constant number of queries."""
+        with self.assertNumQueries(9):
+            order = OrderService.create_order_from_cart(self.user)
+        self.assertEqual(order.order_items.count(), 50)
+        self.assertEqual(
+            set(Product.objects.filter(category=self.category).values_list('stock_quantity', flat=True)), {3}
+        )
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.balance, Decimal('99000.00'))
+
+    def test_checkout_stock_shortfall_rolls_back(self):
+        """Test a product sold out after the check leaves nothing changed."""
+        # Остаток уменьшился уже после проверки заблокированных строк
+        sold_out = self.products[-1]
+        with mock.patch('app.orders.services.CartService.line_problem', return_value=None):
+            Product.objects.filter(pk=sold_out.pk).update(stock_quantity=1)
+            with self.assertRaises(ValueError):
+                OrderService.create_order_from_cart(self.user)
+        self.assertFalse(Order.objects.filter(user=self.user).exists())
+        self.assertEqual(CartItem.objects.filter(user=self.user).count(), 50)
+        self.assertEqual(Product.objects.get(pk=self.products[0].pk).stock_quantity, 5)
+
+    def test_price_changed_after_validation_refuses_order(self):
+        """Test a price committed between validation and checkout is caught on the locked rows."""
+        repriced = self.products[0]
+        check_availability = CartService.check_availability
+
+        def check_then_reprice(*args, **kwargs):
+            availability = check_availability(*args, **kwargs)
+            Product.objects.filter(pk=repriced.pk).update(price=Decimal('12.00'))
+            return availability
+
+        with mock.patch('app.orders.serializers.CartService.check_availability', side_effect=check_then_reprice):
+            response = self.client.post('/api/orders/create/', {
+                'prices': {str(repriced.id): '10.00'},
+            }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('изменилась', response.data['error'])
+        self.assertFalse(Order.objects.filter(user=self.user).exists())
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.balance, Decimal('100000.00'))
+
+
+
+class OrderIdempotencyTest(APITestCase):
+    """Test Idempotency-Key handling of order creation and cancellation."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='buyer', email='buyer@example.com', password='testpass123', balance=Decimal('1000.00')
+        )
+        category = Category.objects.create(name='Books')
+        self.product = Product.objects.create(
+            name='Book', description='', price=Decimal('10.00'), stock_quantity=10, category=category
+        )
+        CartItem.objects.create(user=self.user, product=self.product, quantity=2)
+        self.client.force_authenticate(user=self.user)
+
+    def test_create_retry_replays_response(self):
+        """Test a retried create returns the stored order without a second checkout."""
+        first = self.client.post('/api/orders/create/', {}, format='json', HTTP_IDEMPOTENCY_KEY='order-1')
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+
+        # Повтор не должен оформлять новую корзину
+        CartItem.objects.create(user=self.user, product=self.product, quantity=1)
+        with self.assertNumQueries(4):
+            retry = self.client.post('/api/orders/create/', {}, format='json', HTTP_IDEMPOTENCY_KEY='order-1')
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.json(), first.json())
+
+        self.assertEqual(Order.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(CartItem.objects.get(user=self.user).quantity, 1)
+        self.assertEqual(Product.objects.get(pk=self.product.pk).stock_quantity, 8)
+
+    def test_key_reused_for_other_request(self):
+        """Test a key sent with a different request is rejected."""
+        self.client.post('/api/orders/create/', {}, format='json', HTTP_IDEMPOTENCY_KEY='order-1')
+        order = Order.objects.get(user=self.user)
+        response = self.client.post(f'/api/orders/{order.id}/cancel/', HTTP_IDEMPOTENCY_KEY='order-1')
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(Order.objects.get(pk=order.pk).status, 'pending')
+
+    def test_cancel_retry_does_not_refund_twice(self):
+        """Test a retried cancel replays the first result."""
+        self.client.post('/api/orders/create/', {}, format='json')
+        order = Order.objects.get(user=self.user)
+        url = f'/api/orders/{order.id}/cancel/'
+        first = self.client.post(url, HTTP_IDEMPOTENCY_KEY='cancel-1')
+        retry = self.client.post(url, HTTP_IDEMPOTENCY_KEY='cancel-1')
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(retry.status_code, status.HTTP_200_OK)
+        self.assertEqual(retry.json(), first.json())
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.balance, Decimal('1000.00'))
+        self.assertEqual(Product.objects.get(pk=self.product.pk).stock_quantity, 10)
+
+    def test_expired_keys_are_purged(self):
+        """Test expired keys are deleted and may be used again."""
+        self.client.post('/api/orders/create/', {}, format='json', HTTP_IDEMPOTENCY_KEY='order-1')
+        IdempotencyKey.objects.update(expires_at=timezone.now() - datetime.timedelta(seconds=1))
+
+        stats = purge_idempotency_keys(batch_size=1)
+        self.assertEqual(stats['deleted'], 1)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+
+
+class OrderCancellationTest(APITestCase):
+    """Test set-based order cancellation."""
+
+    def setUp(self):
+        self.users = [
+            User.objects.create_user(
+                username=f'buyer{i}', email=f'buyer{i}@example.com', password='testpass123',
+                balance=Decimal('1000.00')
+            )
+            for i in range(2)
+        ]
+        category = Category.objects.create(name='Books')
+        self.products = Product.objects.bulk_create(
+            Product(name=f'Book {i}', description='', price=Decimal('10.00'), stock_quantity=100, category=category)
+            for i in range(30)
+        )
+        self.client.force_authenticate(user=self.users[0])
+
+    def checkout(self, user, products, quantity=1):
+        CartItem.objects.bulk_create(CartItem(user=user, product=product, quantity=quantity) for product in products)
+        return OrderService.create_order_from_cart(user)
+
+    def test_cancel_queries_do_not_grow(self):
+        """Test cancelling an order costs the same number of queries for any number of lines."""
+        small = self.checkout(self.users[0], self.products[:2])
+        large = self.checkout(self.users[1], self.products, quantity=2)
+        small.refresh_from_db()
+        large.refresh_from_db()
+
+        with self.assertNumQueries(9):
+            OrderService.cancel_order(small)
+        with self.assertNumQueries(9):
+            OrderService.cancel_order(large)
+
+        self.assertEqual(set(Product.objects.values_list('stock_quantity', flat=True)), {100})
+        for user in self.users:
+            user.refresh_from_db()
+            self.assertEqual(user.balance, Decimal('1000.00'))
+        self.assertEqual(Order.objects.get(pk=large.pk).status, 'cancelled')
+
+    def test_cancel_twice_refunds_once(self):
+        """Test a stale order object cannot be cancelled a second time."""
+        order = self.checkout(self.users[0], self.products[:3])
+        stale = Order.objects.get(pk=order.pk)
+        response = self.client.post(f'/api/orders/{order.id}/cancel/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        with self.assertRaises(ValueError):
+            stale.cancel_order()
+        self.users[0].refresh_from_db()
+        self.assertEqual(self.users[0].balance, Decimal('1000.00'))
+        self.assertEqual(Product.objects.get(pk=self.products[0].pk).stock_quantity, 100)
+
+    @override_settings(ORDER_BULK_CANCEL_CHUNK=2)
+    def test_admin_bulk_cancel(self):
+        """Test bulk cancel skips finished orders and restocks across chunks."""
+        orders = [self.checkout(self.users[i % 2], self.products[:5], quantity=3) for i in range(5)]
+        Order.objects.filter(pk=orders[4].pk).update(status='shipped')
+        admin = User.objects.create_superuser(username='admin', email='admin@example.com', password='adminpass123')
+
+        url = '/api/orders/admin/bulk-cancel/'
+        response = self.client.post(url, {'ids': [order.id for order in orders]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(user=admin)
+        response = self.client.post(url, {'ids': [order.id for order in orders] + [0]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'cancelled': 4, 'skipped': [0, orders[4].id]})
+
+        self.assertEqual(Product.objects.get(pk=self.products[0].pk).stock_quantity, 97)
+        self.assertEqual(Product.objects.get(pk=self.products[10].pk).stock_quantity, 100)
+        self.users[0].refresh_from_db()
+        self.users[1].refresh_from_db()
+        self.assertEqual(self.users[0].balance, Decimal('850.00'))
+        self.assertEqual(self.users[1].balance, Decimal('1000.00'))
+
+        response = self.client.post(url, {'ids': ['1']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+@override_settings(ORDER_CHECKOUT_ASYNC=True)
+class CheckoutJobTest(APITestCase):
+    """Test asynchronous checkout through the job queue."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='buyer', email='buyer@example.com', password='testpass123', balance=Decimal('1000.00')
+        )
+        category = Category.objects.create(name='Books')
+        self.product = Product.objects.create(
+            name='Book', description='', price=Decimal('10.00'), stock_quantity=10, category=category
+        )
+        CartItem.objects.create(user=self.user, product=self.product, quantity=2)
+        self.client.force_authenticate(user=self.user)
+
+    def test_create_enqueues_and_worker_completes(self):
+        """Test create answers 202 and the worker turns the job into an order."""
+        response = self.client.post('/api/orders/create/', {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        job_id = response.data['job']['id']
+        self.assertEqual(response['Location'], f'/api/orders/jobs/{job_id}/')
+        self.assertEqual(response.data['job']['status'], 'queued')
+        self.assertFalse(Order.objects.exists())
+
+        self.assertEqual(run_next_job().id, job_id)
+        self.assertIsNone(run_next_job())
+
+        response = self.client.get(f'/api/orders/jobs/{job_id}/')
+        self.assertEqual(response.data['status'], 'done')
+        self.assertEqual(response.data['order']['total_amount'], '20.00')
+        self.assertFalse(CartItem.objects.filter(user=self.user).exists())
+
+    def test_refused_checkout_fails_without_retry(self):
+        """Test a cart emptied before the worker runs fails the job at once."""
+        self.client.post('/api/orders/create/', {}, format='json')
+        CartItem.objects.filter(user=self.user).delete()
+        job = run_next_job()
+        self.assertEqual((job.status, job.attempts, job.error), ('failed', 1, 'Корзина пуста'))
+
+    def test_cart_changed_after_enqueue_fails_job(self):
+        """Test the worker refuses a cart edited or repriced after it was validated."""
+        self.client.post('/api/orders/create/', {}, format='json')
+        CartItem.objects.filter(user=self.user).update(quantity=5)
+        job = run_next_job()
+        self.assertEqual((job.status, job.error), ('failed', 'Корзина изменилась после оформления заказа'))
+
+        CartItem.objects.filter(user=self.user).update(quantity=2)
+        self.client.post('/api/orders/create/', {}, format='json')
+        Product.objects.filter(pk=self.product.pk).update(price=Decimal('12.00'))
+        job = run_next_job()
+        self.assertEqual(job.status, 'failed')
+        self.assertIn('изменилась', job.error)
+        self.assertFalse(Order.objects.exists())
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.balance, Decimal('1000.00'))
+
+    @override_settings(ORDER_JOB_MAX_ATTEMPTS=2, ORDER_JOB_RETRY_DELAY=60)
+    def test_errors_are_retried_with_backoff(self):
+        """Test unexpected errors reschedule the job until attempts run out."""
+        self.client.post('/api/orders/create/', {}, format='json')
+        with mock.patch(
+            'app.orders.jobs.OrderService.create_order_from_cart', side_effect=OperationalError('deadlock detected')
+        ):
+            job = run_next_job()
+            self.assertEqual((job.status, job.attempts), ('queued', 1))
+            self.assertGreater(job.run_after, timezone.now() + datetime.timedelta(seconds=50))
+            self.assertIsNone(run_next_job())
+
+            CheckoutJob.objects.update(run_after=timezone.now())
+            job = run_next_job()
+        self.assertEqual((job.status, job.attempts, job.error), ('failed', 2, 'deadlock detected'))
+
+    @override_settings(ORDER_JOB_MAX_ATTEMPTS=2)
+    def test_broken_transaction_still_counts_attempts(self):
+        """Test an error that aborts the job's transaction is counted and ends the retries."""
+        self.client.post('/api/orders/create/', {}, format='json')
+
+        def break_transaction(user, **kwargs):
+            # На PostgreSQL ошибка вне точки сохранения прерывает всю транзакцию
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT * FROM missing_table')
+
+        with mock.patch('app.orders.jobs.OrderService.create_order_from_cart', side_effect=break_transaction):
+            job = run_next_job()
+            self.assertEqual((job.status, job.attempts), ('queued', 1))
+            CheckoutJob.objects.update(run_after=timezone.now())
+            run_next_job()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('failed', 2))
+        self.assertIn('missing_table', job.error)
+
+    def test_job_of_other_user_is_hidden(self):
+        """Test users only see their own jobs."""
+        other = User.objects.create_user(username='other', email='other@example.com', password='testpass123')
+        job = CheckoutJob.objects.create(user=other)
+        response = self.client.get(f'/api/orders/jobs/{job.id}/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_queue_stats(self):
+        """Test admins see the queue depth."""
+        CheckoutJob.objects.create(user=self.user)
+        CheckoutJob.objects.create(user=self.user, attempts=1, run_after=timezone.now() + datetime.timedelta(hours=1))
+        CheckoutJob.objects.create(user=self.user, status='done')
+        admin = User.objects.create_superuser(username='admin', email='admin@example.com', password='adminpass123')
+        self.client.force_authenticate(user=admin)
+        response = self.client.get('/api/orders/admin/jobs/stats/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            {key: response.data[key] for key in ('queued', 'due', 'retrying')},
+            {'queued': 2, 'due': 1, 'retrying': 1}
+        )
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'SKIP LOCKED requires PostgreSQL')
+class CheckoutWorkerConcurrencyTest(TransactionTestCase):
+    """Test parallel workers draining one queue."""
+
+    def test_parallel_workers_run_each_job_once(self):
+        """Test every job is claimed by exactly one worker."""
+        category = Category.objects.create(name='Books')
+        product = Product.objects.create(
+            name='Book', description='', price=Decimal('10.00'), stock_quantity=100, category=category
+        )
+        for i in range(20):
+            user = User.objects.create_user(
+                username=f'buyer{i}', email=f'buyer{i}@example.com', password='testpass123',
+                balance=Decimal('100.00')
+            )
+            CartItem.objects.create(user=user, product=product, quantity=3)
+            CheckoutJob.objects.create(user=user)
+
+        def worker():
+            try:
+                call_command('run_order_workers', once=True, stdout=io.StringIO())
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(CheckoutJob.objects.filter(status='done').count(), 20)
+        self.assertEqual(Order.objects.count(), 20)
+        self.assertEqual(Product.objects.get(pk=product.pk).stock_quantity, 40)
+
+class OrderExportTest(APITestCase):
+    """Test streaming order export."""
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='adminpass123'
+        )
+        self.user = User.objects.create_user(
+            username='testuser', email='test@example.com', password='testpass123'
+        )
+        category = Category.objects.create(name='Electronics')
+        self.products = [
+            Product.objects.create(
+                sku=f'SKU-{i}', name=f'Product {i}', price=Decimal('100.00'),
+                stock_quantity=10, category=category
+            )
+            for i in range(2)
+        ]
+        self.paid = Order.objects.create(user=self.user, status='paid', total_amount=Decimal('300.00'))
+        OrderItem.objects.create(order=self.paid, product=self.products[0], quantity=1, price=Decimal('100.00'))
+        OrderItem.objects.create(order=self.paid, product=self.products[1], quantity=2, price=Decimal('100.00'))
+        self.old = Order.objects.create(user=self.user, total_amount=Decimal('100.00'))
+        OrderItem.objects.create(order=self.old, product=self.products[0], quantity=1, price=Decimal('100.00'))
+        Order.objects.filter(pk=self.old.pk).update(
+            created_at=timezone.now() - datetime.timedelta(days=30)
+        )
+        self.client.force_authenticate(user=self.admin)
+
+    def get_content(self, response):
+        self.assertIsInstance(response, StreamingHttpResponse)
+        return b''.join(response.streaming_content).decode()
+
+    def test_export_csv(self):
+        """Test CSV export has one row per order line."""
+        response = self.client.get('/api/orders/admin/export/csv/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('orders.csv', response['Content-Disposition'])
+
+        rows = list(csv.DictReader(io.StringIO(self.get_content(response))))
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[0]['order_id'], str(self.paid.id))
+        self.assertEqual(rows[1]['sku'], 'SKU-1')
+        self.assertEqual(rows[1]['total_price'], '200.00')
+        self.assertEqual(rows[1]['user_email'], 'test@example.com')
+
+    def test_export_ndjson_filters(self):
+        """Test NDJSON export applies status and date range filters."""
+        since = (timezone.localdate() - datetime.timedelta(days=1)).isoformat()
+        response = self.client.get('/api/orders/admin/export/ndjson/', {'date_from': since})
+        lines = [json.loads(line) for line in self.get_content(response).splitlines()]
+        self.assertEqual({line['order_id'] for line in lines}, {self.paid.id})
+
+        response = self.client.get('/api/orders/admin/export/ndjson/', {'status': 'pending'})
+        lines = [json.loads(line) for line in self.get_content(response).splitlines()]
+        self.assertEqual([line['order_id'] for line in lines], [self.old.id])
+
+    def test_export_invalid_params(self):
+        """Test export rejects unknown formats and bad dates."""
+        response = self.client.get('/api/orders/admin/export/xml/')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get('/api/orders/admin/export/csv/', {'date_to': '31.01.2024'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_export_admin_only(self):
+        """Test export is not available to regular users."""
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get('/api/orders/admin/export/csv/')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
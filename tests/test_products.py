@@ -1,11 +1,28 @@
 """
 Tests for products app.
 """
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from PIL import Image
 from rest_framework.test import APITestCase
 from rest_framework import status
 from decimal import Decimal
+from app.orders.models import Order, OrderItem
+from app.products.autocomplete import PrefixIndex, get_autocomplete, reset_autocomplete
+from app.products.bulk import bulk_update_products
+from app.products.importer import CatalogImporter
 from app.products.models import Category, Product
+from app.products.search import search_products
 from app.users.models import User
 
 
@@ -108,6 +125,17 @@ class ProductAPITest(APITestCase):
         response = self.client.post('/api/products/create/', product_data)
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
 
+    def test_products_without_sku(self):
+        """Test several products may be created with an empty SKU."""
+        self.client.force_authenticate(user=self.admin_user)
+        for sku in ('', ''):
+            response = self.client.post('/api/products/create/', {
+                'sku': sku, 'name': 'No SKU', 'description': 'No SKU', 'price': '10.00',
+                'stock_quantity': 1, 'category': self.category.id,
+            })
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Product.objects.filter(name='No SKU', sku__isnull=True).count(), 2)
+
     def test_product_filtering(self):
         """Test product filtering."""
         # Create another product
@@ -130,4 +158,924 @@ class ProductAPITest(APITestCase):
         """Test category list endpoint."""
         response = self.client.get('/api/products/categories/')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1) 
\ No newline at end of file
+        self.assertEqual(len(response.data), 1)
+
+
+class ProductSearchTest(APITestCase):
+    """Test full-text product search."""
+
+    def setUp(self):
+        self.phones = Category.objects.create(name='Смартфоны')
+        self.books = Category.objects.create(name='Книги')
+
+        self.phone = Product.objects.create(
+            name='Galaxy S24',
+            description='Флагманский телефон с отличной камерой',
+            price=Decimal('79999.00'),
+            stock_quantity=5,
+            category=self.phones
+        )
+        self.book = Product.objects.create(
+            name='Мастер и Маргарита',
+            description='Роман Михаила Булгакова',
+            price=Decimal('599.00'),
+            stock_quantity=20,
+            category=self.books
+        )
+
+    def search(self, query):
+        response = self.client.get('/api/products/', {'search': query})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [item['id'] for item in response.data['results']]
+
+    def test_search_by_name_prefix(self):
+        """Test search matches name prefixes."""
+        self.assertEqual(self.search('Gala'), [self.phone.id])
+
+    def test_search_by_description_and_category(self):
+        """Test search covers description and category name."""
+        self.assertEqual(self.search('камерой'), [self.phone.id])
+        self.assertEqual(self.search('смартфоны'), [self.phone.id])
+
+    def test_search_follows_category_rename(self):
+        """Test search vector is refreshed when category is renamed."""
+        self.books.name = 'Литература'
+        self.books.save()
+        self.assertEqual(self.search('литература'), [self.book.id])
+
+    def test_search_combined_with_filters(self):
+        """Test search combined with price filter."""
+        response = self.client.get('/api/products/', {'search': 'роман', 'max_price': '100'})
+        self.assertEqual(len(response.data['results']), 0)
+        response = self.client.get('/api/products/', {'search': 'роман', 'max_price': '1000'})
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_search_ranking(self):
+        """Test name matches rank above description matches."""
+        novel = Product.objects.create(
+            name='Роман-эпопея',
+            description='Собрание сочинений',
+            price=Decimal('999.00'),
+            stock_quantity=3,
+            category=self.books
+        )
+        self.assertEqual(self.search('роман'), [novel.id, self.book.id])
+
+    def test_search_typo_tolerance(self):
+        """Test trigram match tolerates typos in product name."""
+        from app.products.search import trigram_available
+        if not trigram_available():
+            self.skipTest('pg_trgm is not installed')
+        self.assertEqual(self.search('Galaxi'), [self.phone.id])
+
+
+
+class ProductCursorPaginationTest(APITestCase):
+    """Test opt-in cursor pagination on product list."""
+
+    def setUp(self):
+        self.category = Category.objects.create(name='Electronics')
+        for i in range(25):
+            Product.objects.create(
+                name=f'Product {i}',
+                description='Description',
+                price=Decimal('10.00'),
+                stock_quantity=1,
+                category=self.category
+            )
+
+    def test_cursor_pages_are_stable(self):
+        """Test cursor pages do not shift when new products are inserted."""
+        response = self.client.get('/api/products/', {'pagination': 'cursor'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('count', response.data)
+        first_page = [item['id'] for item in response.data['results']]
+        self.assertEqual(len(first_page), 20)
+
+        Product.objects.create(
+            name='Newest Product',
+            description='Description',
+            price=Decimal('10.00'),
+            stock_quantity=1,
+            category=self.category
+        )
+
+        response = self.client.get(response.data['next'])
+        second_page = [item['id'] for item in response.data['results']]
+        self.assertEqual(len(second_page), 5)
+        self.assertFalse(set(first_page) & set(second_page))
+        self.assertIsNone(response.data['next'])
+
+    def test_page_number_is_default(self):
+        """Test page number pagination stays the default."""
+        response = self.client.get('/api/products/')
+        self.assertEqual(response.data['count'], 25)
+
+
+class ProductSparseFieldsTest(APITestCase):
+    """Test ?fields= and ?expand= on product endpoints."""
+
+    def setUp(self):
+        self.category = Category.objects.create(name='Electronics')
+        self.product = Product.objects.create(
+            name='Test Product',
+            description='Long description',
+            price=Decimal('99.99'),
+            stock_quantity=10,
+            category=self.category
+        )
+
+    def test_default_representation_unchanged(self):
+        """Test full representation without sparse parameters."""
+        response = self.client.get(f'/api/products/{self.product.id}/')
+        self.assertEqual(response.data['category']['name'], 'Electronics')
+        self.assertIn('description', response.data)
+
+    def test_fields(self):
+        """Test only requested fields are returned."""
+        response = self.client.get('/api/products/', {'fields': 'id,name,price,is_in_stock'})
+        self.assertEqual(
+            response.data['results'][0],
+            {'id': self.product.id, 'name': 'Test Product', 'price': '99.99', 'is_in_stock': True}
+        )
+
+    def test_nested_collapsed_to_id_unless_expanded(self):
+        """Test category is an ID unless expanded."""
+        response = self.client.get('/api/products/', {'fields': 'id,category'})
+        self.assertEqual(response.data['results'][0]['category'], self.category.id)
+
+        response = self.client.get('/api/products/', {'fields': 'id,category', 'expand': 'category'})
+        self.assertEqual(response.data['results'][0]['category']['name'], 'Electronics')
+
+        response = self.client.get('/api/products/', {'fields': 'id,category.name'})
+        self.assertEqual(response.data['results'][0]['category'], {'name': 'Electronics'})
+
+    def test_only_requested_columns_loaded(self):
+        """Test queryset defers columns that are not rendered."""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/api/products/', {'fields': 'id,name'})
+        select = queries.captured_queries[-1]['sql']
+        self.assertIn('"products_product"."name"', select)
+        self.assertNotIn('"products_product"."description"', select)
+        self.assertNotIn('products_category', select)
+
+
+class CatalogCacheTest(APITestCase):
+    """Test catalog response cache."""
+
+    def setUp(self):
+        self.category = Category.objects.create(name='Electronics')
+        self.product = Product.objects.create(
+            name='Test Product',
+            description='Test Description',
+            price=Decimal('99.99'),
+            stock_quantity=10,
+            category=self.category
+        )
+
+    def test_repeated_request_served_from_cache(self):
+        """Test second identical request does not hit the database."""
+        self.client.get(f'/api/products/?category={self.category.id}&max_price=1000')
+        with self.assertNumQueries(0):
+            response = self.client.get(f'/api/products/?max_price=1000&category={self.category.id}')
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_product_write_invalidates_catalog(self):
+        """Test product update bumps the catalog version."""
+        self.client.get('/api/products/')
+        self.product.name = 'Renamed Product'
+        self.product.save()
+        response = self.client.get('/api/products/')
+        self.assertEqual(response.data['results'][0]['name'], 'Renamed Product')
+
+    def test_stock_change_invalidates_product_entries_only(self):
+        """Test stock change refreshes detail and stock but keeps list entries."""
+        self.client.get('/api/products/')
+        self.client.get(f'/api/products/{self.product.id}/stock/')
+
+        self.product.decrease_stock(4)
+
+        response = self.client.get(f'/api/products/{self.product.id}/stock/')
+        self.assertEqual(response.data['stock_quantity'], 6)
+        with self.assertNumQueries(0):
+            self.client.get('/api/products/')
+
+
+class ProductConditionalGetTest(APITestCase):
+    """Test ETag / Last-Modified on product detail."""
+
+    def setUp(self):
+        self.category = Category.objects.create(name='Electronics')
+        self.product = Product.objects.create(
+            name='Test Product',
+            description='Test Description',
+            price=Decimal('99.99'),
+            stock_quantity=10,
+            category=self.category
+        )
+        self.url = f'/api/products/{self.product.id}/'
+
+    def test_not_modified(self):
+        """Test matching If-None-Match returns 304."""
+        response = self.client.get(self.url)
+        self.assertIn('Last-Modified', response)
+        etag = response['ETag']
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        response = self.client.get(self.url, {'fields': 'id'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_category_change_updates_etag(self):
+        """Test category rename changes product ETag."""
+        etag = self.client.get(self.url)['ETag']
+        self.category.name = 'Gadgets'
+        self.category.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['category']['name'], 'Gadgets')
+
+
+class ProductFacetsTest(APITestCase):
+    """Test product facets endpoint."""
+
+    def setUp(self):
+        self.phones = Category.objects.create(name='Смартфоны')
+        self.books = Category.objects.create(name='Книги')
+        for name, price, category in [
+            ('Phone A', '30000.00', self.phones),
+            ('Phone B', '60000.00', self.phones),
+            ('Book A', '450.00', self.books),
+            ('Book B', '700.00', self.books),
+            ('Book C', '750.00', self.books),
+        ]:
+            Product.objects.create(
+                name=name,
+                description='Description',
+                price=Decimal(price),
+                stock_quantity=1,
+                category=category
+            )
+
+    def bucket_counts(self, response):
+        return {bucket['min']: bucket['count'] for bucket in response.data['price_buckets'] if bucket['count']}
+
+    def test_facets_single_query(self):
+        """Test facets come from one query."""
+        from app.products.search import trigram_available
+        trigram_available()
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/products/facets/', {'search': 'книги'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total'], 3)
+        self.assertEqual(response.data['categories'], [{'id': self.books.id, 'name': 'Книги', 'count': 3}])
+
+    def test_facets_ignore_own_filter(self):
+        """Test each facet is computed without its own filter."""
+        response = self.client.get('/api/products/facets/', {
+            'category': self.books.id,
+            'max_price': '720',
+        })
+        self.assertEqual(response.data['total'], 2)
+        counts = {entry['name']: entry['count'] for entry in response.data['categories']}
+        self.assertEqual(counts, {'Книги': 2})
+        self.assertEqual(self.bucket_counts(response), {0: 1, 500: 2})
+
+        response = self.client.get('/api/products/facets/', {'min_price': '500'})
+        counts = {entry['name']: entry['count'] for entry in response.data['categories']}
+        self.assertEqual(counts, {'Книги': 2, 'Смартфоны': 2})
+        self.assertEqual(self.bucket_counts(response), {0: 1, 500: 2, 20000: 1, 50000: 1})
+
+    def test_facets_invalid_params(self):
+        """Test invalid filter values return 400."""
+        response = self.client.get('/api/products/facets/', {'min_price': 'abc'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ProductBulkUpdateTest(APITestCase):
+    """Test bulk product updates."""
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='adminpass123'
+        )
+        self.category = Category.objects.create(name='Книги')
+        self.products = [
+            Product.objects.create(
+                name=f'Книга {i}', description='', price=Decimal('100.00'),
+                stock_quantity=10, category=self.category
+            )
+            for i in range(3)
+        ]
+        self.client.force_authenticate(user=self.admin)
+
+    def test_bulk_update_reports_counts_and_row_errors(self):
+        """Test valid rows are applied and invalid ones reported by index."""
+        first, second, third = self.products
+        self.client.get('/api/products/')
+        response = self.client.post('/api/products/bulk-update/', {'products': [
+            {'id': first.id, 'price': '150.00'},
+            {'id': second.id, 'stock_quantity': 0, 'is_active': False},
+            {'id': third.id, 'price': '100.00'},
+            {'id': 999999, 'price': '1.00'},
+            {'id': third.id, 'price': '-5'},
+            {'id': first.id, 'stock_quantity': 1},
+            {'id': third.id},
+        ]}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['updated'], 2)
+        self.assertEqual(response.data['unchanged'], 1)
+        self.assertEqual(response.data['failed'], 4)
+        self.assertEqual([error['index'] for error in response.data['errors']], [3, 4, 5, 6])
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.price, Decimal('150.00'))
+        self.assertEqual(first.stock_quantity, 10)
+        self.assertEqual((second.stock_quantity, second.is_active), (0, False))
+        # Кэш списка сброшен одним изменением версии каталога
+        response = self.client.get('/api/products/')
+        self.assertEqual(len(response.data['results']), 2)
+
+    def test_bulk_update_rejects_out_of_range_stock(self):
+        """Test stock outside the column range is a row error, not a server error."""
+        first, second, _ = self.products
+        response = self.client.post('/api/products/bulk-update/', {'products': [
+            {'id': first.id, 'stock_quantity': 2147483648},
+            {'id': second.id, 'stock_quantity': -1},
+            {'id': second.id, 'stock_quantity': 2147483647},
+            {'id': 2 ** 63, 'stock_quantity': 1},
+        ]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['updated'], 1)
+        self.assertEqual(
+            [(error['index'], list(error['errors'])) for error in response.data['errors']],
+            [(0, ['stock_quantity']), (1, ['stock_quantity']), (3, ['id'])]
+        )
+        first.refresh_from_db()
+        self.assertEqual(first.stock_quantity, 10)
+
+    def test_bulk_update_query_count_does_not_grow(self):
+        """Test the number of queries does not depend on the number of rows."""
+        products = Product.objects.bulk_create(
+            Product(name=f'Товар {i}', description='', price=Decimal('10.00'), category=self.category)
+            for i in range(300)
+        )
+        rows = [{'id': product.id, 'price': '20.00', 'stock_quantity': 5} for product in products]
+        with self.assertNumQueries(4):
+            result = bulk_update_products(rows)
+        self.assertEqual(result['updated'], 300)
+        self.assertEqual(Product.objects.filter(price=Decimal('20.00'), stock_quantity=5).count(), 300)
+
+    def test_bulk_update_rejects_invalid_requests(self):
+        """Test non-admin users, empty and all-invalid payloads are rejected."""
+        response = self.client.post('/api/products/bulk-update/', {'products': []}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(
+            '/api/products/bulk-update/', [{'id': self.products[0].id, 'price': '0'}], format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.client.force_authenticate(user=User.objects.create_user(
+            username='user', email='user@example.com', password='userpass123'
+        ))
+        response = self.client.post(
+            '/api/products/bulk-update/', [{'id': self.products[0].id, 'price': '1'}], format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_admin_deactivate_action(self):
+        """Test the admin action deactivates selected products in bulk."""
+        self.client.force_login(self.admin)
+        response = self.client.post('/admin/products/product/', {
+            'action': 'deactivate_products',
+            '_selected_action': [product.id for product in self.products[:2]],
+        })
+        self.assertEqual(response.status_code, status.HTTP_302_FOUND)
+        self.assertEqual(Product.objects.filter(is_active=True).count(), 1)
+
+
+class CatalogImportTest(TestCase):
+    """Test bulk catalog import."""
+
+    CSV = (
+        'sku,name,description,price,stock_quantity,category,is_active\n'
+        'A-1,Смартфон,"Экран 6"", 128 ГБ",19999.90,5,Электроника,true\n'
+        'A-2,Ноутбук,,59999,0,Электроника,false\n'
+        'B-1,Роман,Твердая обложка,499.5,12,Книги,\n'
+        'B-2,Без цены,,,3,Книги,true\n'
+        'A-1,Смартфон Pro,Новая версия,24999,7,Электроника,true\n'
+    )
+
+    def setUp(self):
+        self.category = Category.objects.create(name='Книги')
+        Product.objects.create(
+            sku='B-1', name='Old name', description='', price=Decimal('1.00'),
+            stock_quantity=1, category=self.category
+        )
+
+    def run_import(self, use_copy, batch_size=2):
+        importer = CatalogImporter(batch_size=batch_size, use_copy=use_copy)
+        stats = importer.run(io.StringIO(self.CSV), 'csv')
+        return importer, stats
+
+    def assertImported(self, importer, stats):
+        self.assertEqual(stats['rows'], 5)
+        self.assertEqual(stats['imported'], 4)
+        self.assertEqual(importer.errors, [(5, 'Не заполнено поле price')])
+        self.assertEqual(stats['categories_created'], 1)
+        self.assertEqual(Product.objects.count(), 3)
+
+        phone = Product.objects.get(sku='A-1')
+        self.assertEqual(phone.name, 'Смартфон Pro')
+        self.assertEqual(phone.price, Decimal('24999.00'))
+        self.assertEqual(phone.category.name, 'Электроника')
+        self.assertFalse(Product.objects.get(sku='A-2').is_active)
+
+        book = Product.objects.get(sku='B-1')
+        self.assertEqual(book.name, 'Роман')
+        self.assertEqual(book.price, Decimal('499.50'))
+        self.assertEqual(book.category, self.category)
+
+    def test_import_bulk_create(self):
+        """Test import with bulk_create upserts."""
+        importer, stats = self.run_import(use_copy=False)
+        self.assertImported(importer, stats)
+
+    @unittest.skipUnless(connection.vendor == 'postgresql', 'COPY requires PostgreSQL')
+    def test_import_copy(self):
+        """Test import through COPY into a staging table."""
+        importer, stats = self.run_import(use_copy=True)
+        self.assertImported(importer, stats)
+        # Триггер поискового вектора срабатывает и для массовой загрузки
+        found = search_products(Product.objects.all(), 'роман', rank=False)
+        self.assertEqual(list(found.values_list('sku', flat=True)), ['B-1'])
+
+    def test_import_duplicate_sku_in_batch(self):
+        """Test last row wins for a sku repeated in one batch."""
+        importer, stats = self.run_import(use_copy=None, batch_size=10)
+        self.assertImported(importer, stats)
+
+    def test_import_command_jsonl(self):
+        """Test import_catalog command with JSONL input."""
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False, encoding='utf-8') as f:
+            f.write('{"sku": "C-1", "name": "Чайник", "price": "1500", "category": "Дом"}\n')
+            f.write('{"sku": "C-2", "name": "Пылесос", "price": "-1", "category": "Дом"}\n')
+        self.addCleanup(os.remove, f.name)
+
+        out, err = io.StringIO(), io.StringIO()
+        call_command('import_catalog', f.name, stdout=out, stderr=err)
+
+        self.assertIn('Imported 1 of 2 rows', out.getvalue())
+        self.assertIn('Строка 2', err.getvalue())
+        self.assertEqual(Product.objects.get(sku='C-1').category.name, 'Дом')
+
+    def test_import_rejects_non_object_and_too_high_price(self):
+        """Test JSONL lines that are not objects and too high prices are row errors."""
+        stream = io.StringIO(
+            '[1, 2]\n'
+            '42\n'
+            '{"sku": "D-1", "name": "Яхта", "price": "100000000", "category": "Дом"}\n'
+            '{"sku": "D-2", "name": "Лодка", "price": "99999999.99", "category": "Дом"}\n'
+        )
+        importer = CatalogImporter(use_copy=False)
+        stats = importer.run(stream, 'jsonl')
+
+        self.assertEqual(stats['imported'], 1)
+        self.assertEqual(importer.errors, [
+            (1, 'Строка должна быть объектом JSON'),
+            (2, 'Строка должна быть объектом JSON'),
+            (3, 'Цена должна быть меньше 100000000'),
+        ])
+        self.assertTrue(Product.objects.filter(sku='D-2').exists())
+
+
+class ProductExportTest(APITestCase):
+    """Test streaming product export."""
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='adminpass123'
+        )
+        self.category = Category.objects.create(name='Книги')
+        other = Category.objects.create(name='Электроника')
+        Product.objects.create(
+            sku='B-1', name='Роман', description='Твердая обложка', price=Decimal('499.50'),
+            stock_quantity=12, category=self.category
+        )
+        Product.objects.create(
+            sku='B-2', name='Учебник', price=Decimal('900.00'),
+            stock_quantity=0, category=self.category, is_active=False
+        )
+        Product.objects.create(
+            sku='E-1', name='Смартфон', price=Decimal('19999.90'), stock_quantity=5, category=other
+        )
+        self.client.force_authenticate(user=self.admin)
+
+    def get_content(self, response):
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return b''.join(response.streaming_content).decode()
+
+    def test_export_csv_round_trip(self):
+        """Test exported CSV can be imported back."""
+        response = self.client.get('/api/products/export/csv/', {'category': self.category.id})
+        content = self.get_content(response)
+        rows = list(csv.DictReader(io.StringIO(content)))
+        self.assertEqual([row['sku'] for row in rows], ['B-1', 'B-2'])
+        self.assertEqual(rows[1]['is_active'], 'False')
+
+        Product.objects.filter(sku='B-1').update(name='Changed')
+        importer = CatalogImporter(use_copy=False)
+        stats = importer.run(io.StringIO(content), 'csv')
+        self.assertEqual(stats['imported'], 2)
+        self.assertEqual(Product.objects.get(sku='B-1').name, 'Роман')
+        self.assertFalse(Product.objects.get(sku='B-2').is_active)
+
+    def test_export_ndjson_filters(self):
+        """Test NDJSON export applies price and search filters."""
+        response = self.client.get('/api/products/export/ndjson/', {'min_price': '1000'})
+        lines = [json.loads(line) for line in self.get_content(response).splitlines()]
+        self.assertEqual([line['sku'] for line in lines], ['E-1'])
+        self.assertEqual(lines[0]['price'], '19999.90')
+        self.assertEqual(lines[0]['category'], 'Электроника')
+
+        response = self.client.get('/api/products/export/ndjson/', {'search': 'роман'})
+        lines = [json.loads(line) for line in self.get_content(response).splitlines()]
+        self.assertEqual([line['sku'] for line in lines], ['B-1'])
+
+    def test_export_invalid_filter(self):
+        """Test invalid filters are rejected before streaming starts."""
+        for params in ({'min_price': 'abc'}, {'category': 'abc'}, {'date_from': 'вчера'}):
+            with self.subTest(params=params):
+                response = self.client.get('/api/products/export/csv/', params)
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ProductStockBatchTest(APITestCase):
+    """Test batch stock lookup."""
+
+    def setUp(self):
+        category = Category.objects.create(name='Electronics')
+        self.products = [
+            Product.objects.create(
+                name=f'Product {i}', price=Decimal('10.00') + i,
+                stock_quantity=i, category=category, is_active=i != 2
+            )
+            for i in range(4)
+        ]
+        self.ids = ','.join(str(product.id) for product in self.products)
+
+    def test_batch_lookup(self):
+        """Test lookup returns products in request order with one query."""
+        missing = max(product.id for product in self.products) + 100
+        ids = f'{self.products[3].id},{missing},{self.products[0].id},{self.products[2].id},{self.products[3].id}'
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/products/stock/', {'ids': ids})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        results = response.data['results']
+        self.assertEqual([item['id'] for item in results], [
+            self.products[3].id, self.products[0].id, self.products[2].id
+        ])
+        self.assertEqual(results[0]['stock_quantity'], 3)
+        self.assertFalse(results[1]['is_in_stock'])
+        self.assertFalse(results[2]['is_active'])
+        self.assertEqual(response.data['not_found'], [missing])
+
+    def test_batch_lookup_cached_per_product(self):
+        """Test repeated lookups are served from cache until stock changes."""
+        self.client.get('/api/products/stock/', {'ids': self.ids})
+        with self.assertNumQueries(0):
+            self.client.get('/api/products/stock/', {'ids': self.ids})
+
+        self.products[1].decrease_stock(1)
+        with self.assertNumQueries(1) as queries:
+            response = self.client.get('/api/products/stock/', {'ids': self.ids})
+        # Из базы дочитывается только измененный товар
+        self.assertIn(f'IN ({self.products[1].id})', queries.captured_queries[0]['sql'])
+        self.assertEqual(response.data['results'][1]['stock_quantity'], 0)
+
+    @override_settings(PRODUCT_STOCK_BATCH_LIMIT=3)
+    def test_batch_lookup_limits(self):
+        """Test invalid and oversized requests are rejected."""
+        for ids in (self.ids, '1,abc', '', '0', str(2 ** 63)):
+            with self.subTest(ids=ids):
+                response = self.client.get('/api/products/stock/', {'ids': ids})
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+def make_image(size=(2000, 1000), mode='RGBA', color=(200, 30, 30, 128), name='photo.png'):
+    buffer = io.BytesIO()
+    Image.new(mode, size, color).save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+
+class ProductImageVariantsTest(TestCase):
+    """Test product image variant pipeline."""
+
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media, PRODUCT_IMAGE_ASYNC=False)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.category = Category.objects.create(name='Electronics')
+
+    def create_product(self, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Product.objects.create(
+                name='Test Product', price=Decimal('99.99'), category=self.category, **kwargs
+            )
+
+    def test_variants_built_after_save(self):
+        """Test saving an image builds every size in WebP and JPEG."""
+        product = self.create_product(image=make_image())
+        product.refresh_from_db()
+        variants = product.image_variants
+        self.assertEqual(variants['source'], product.image.name)
+
+        expected = {'zoom': (1600, 800), 'card': (600, 300), 'thumb': (200, 100)}
+        for name, size in expected.items():
+            for fmt, pil_format in (('webp', 'WEBP'), ('jpeg', 'JPEG')):
+                with default_storage.open(variants[name][fmt]) as f:
+                    image = Image.open(f)
+                    self.assertEqual((name, image.format, image.size), (name, pil_format, size))
+
+        response = self.client.get(f'/api/products/{product.id}/')
+        self.assertTrue(response.data['image_variants']['thumb']['webp'].startswith('http://testserver/media/'))
+
+    def test_variants_are_content_addressed(self):
+        """Test identical images share stored variant files."""
+        first = self.create_product(image=make_image(name='a.png'))
+        second = self.create_product(image=make_image(name='b.png'))
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertNotEqual(first.image.name, second.image.name)
+        self.assertEqual(first.image_variants['card'], second.image_variants['card'])
+
+    def test_image_change_and_removal(self):
+        """Test variants follow image replacement and removal."""
+        product = self.create_product(image=make_image())
+        product.refresh_from_db()
+        old_thumb = product.image_variants['thumb']['jpeg']
+
+        product.image = make_image(size=(300, 300), mode='RGB', color=(0, 0, 255))
+        with self.captureOnCommitCallbacks(execute=True):
+            product.save()
+        product.refresh_from_db()
+        self.assertEqual(product.image_variants['source'], product.image.name)
+        self.assertNotEqual(product.image_variants['thumb']['jpeg'], old_thumb)
+        # Изображение меньше варианта не увеличивается
+        with default_storage.open(product.image_variants['card']['webp']) as f:
+            self.assertEqual(Image.open(f).size, (300, 300))
+
+        product.image = None
+        product.save()
+        product.refresh_from_db()
+        self.assertEqual(product.image_variants, {})
+        response = self.client.get(f'/api/products/{product.id}/')
+        self.assertIsNone(response.data['image_variants'])
+
+    def test_stock_change_does_not_reprocess(self):
+        """Test stock-only saves do not schedule image processing."""
+        product = self.create_product(image=make_image(), stock_quantity=5)
+        # Экземпляр в памяти не знает о готовых вариантах, но сохранение остатка их не проверяет
+        with self.captureOnCommitCallbacks() as callbacks:
+            product.decrease_stock(1)
+        # Только повторный сброс версии остатка
+        self.assertEqual(len(callbacks), 1)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            product.save()
+        self.assertEqual(len(callbacks), 2)
+
+
+class BuildImageVariantsCommandTest(TransactionTestCase):
+    """Test build_image_variants backfill command."""
+
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media, PRODUCT_IMAGE_ASYNC=False)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_backfill(self):
+        """Test command builds variants for products without them."""
+        category = Category.objects.create(name='Electronics')
+        products = [
+            Product.objects.create(
+                name=f'Product {i}', price=Decimal('10.00'), category=category,
+                image=make_image(size=(800, 600), color=(i * 40, 0, 0, 255))
+            )
+            for i in range(5)
+        ]
+        Product.objects.create(name='No image', price=Decimal('10.00'), category=category)
+        Product.objects.update(image_variants={})
+
+        out = io.StringIO()
+        call_command('build_image_variants', workers=2, stdout=out)
+
+        self.assertIn('Built variants for 5 products (0 failed)', out.getvalue())
+        for product in products:
+            product.refresh_from_db()
+            self.assertEqual(product.image_variants['source'], product.image.name)
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'Category statistics triggers require PostgreSQL')
+class CategoryStatsTest(APITestCase):
+    """Test denormalized category statistics."""
+
+    def setUp(self):
+        self.phones = Category.objects.create(name='Смартфоны')
+        self.books = Category.objects.create(name='Книги')
+        self.products = [
+            Product.objects.create(name=f'Phone {price}', price=Decimal(price), category=self.phones)
+            for price in ('990.00', '15000.00', '45000.00')
+        ]
+
+    def assertStats(self, category, count, min_price, max_price):
+        category.refresh_from_db()
+        self.assertEqual(
+            (category.product_count, category.min_price, category.max_price),
+            (count, min_price and Decimal(min_price), max_price and Decimal(max_price)),
+        )
+
+    def test_create_update_deactivate(self):
+        """Test statistics follow product writes."""
+        self.assertStats(self.phones, 3, '990.00', '45000.00')
+        self.assertStats(self.books, 0, None, None)
+
+        cheapest = self.products[0]
+        cheapest.is_active = False
+        cheapest.save()
+        self.assertStats(self.phones, 2, '15000.00', '45000.00')
+
+        priciest = self.products[2]
+        priciest.price = Decimal('30000.00')
+        priciest.save()
+        self.assertStats(self.phones, 2, '15000.00', '30000.00')
+
+        priciest.category = self.books
+        priciest.save()
+        self.assertStats(self.phones, 1, '15000.00', '15000.00')
+        self.assertStats(self.books, 1, '30000.00', '30000.00')
+
+        self.products[1].delete()
+        self.assertStats(self.phones, 0, None, None)
+
+    def test_bulk_writes(self):
+        """Test queryset updates and bulk inserts are counted."""
+        Product.objects.filter(category=self.phones, price__lt=20000).update(is_active=False)
+        self.assertStats(self.phones, 1, '45000.00', '45000.00')
+
+        Product.objects.bulk_create([
+            Product(name=f'Book {i}', price=Decimal(100 + i), category=self.books) for i in range(50)
+        ])
+        self.assertStats(self.books, 50, '100.00', '149.00')
+
+    def test_stock_change_keeps_category_row(self):
+        """Test stock changes do not rewrite the category row."""
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT xmin::text FROM products_category WHERE id = %s', [self.phones.id])
+            before = cursor.fetchone()[0]
+            self.products[0].stock_quantity = 5
+            self.products[0].save(update_fields=['stock_quantity', 'updated_at'])
+            cursor.execute('SELECT xmin::text FROM products_category WHERE id = %s', [self.phones.id])
+            self.assertEqual(cursor.fetchone()[0], before)
+
+    def test_category_save_keeps_stats(self):
+        """Test saving a stale category instance does not overwrite statistics."""
+        stale = Category.objects.get(pk=self.books.pk)
+        Product.objects.create(name='Book', price=Decimal('500.00'), category=self.books)
+        stale.description = 'Бумажные книги'
+        stale.save()
+        self.assertStats(self.books, 1, '500.00', '500.00')
+
+    def test_reconcile(self):
+        """Test reconcile command repairs drifted statistics."""
+        Category.objects.filter(pk=self.phones.pk).update(product_count=7, min_price=None)
+        out = io.StringIO()
+        call_command('reconcile_category_stats', stdout=out)
+        self.assertIn('Categories corrected: 1', out.getvalue())
+        self.assertStats(self.phones, 3, '990.00', '45000.00')
+
+    def test_category_list_serves_stats(self):
+        """Test category list returns statistics without per-category queries."""
+        # Количество для пагинации и сама страница
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/products/categories/')
+        phones = next(item for item in response.data['results'] if item['id'] == self.phones.id)
+        self.assertEqual(phones['product_count'], 3)
+        self.assertEqual(phones['min_price'], '990.00')
+        self.assertEqual(phones['max_price'], '45000.00')
+
+
+@override_settings(AUTOCOMPLETE_REFRESH_INTERVAL=0)
+class ProductAutocompleteTest(APITestCase):
+    """Test prefix autocomplete."""
+
+    def setUp(self):
+        reset_autocomplete()
+        self.addCleanup(reset_autocomplete)
+        self.phones = Category.objects.create(name='Смартфоны')
+        self.audio = Category.objects.create(name='Наушники и колонки')
+        self.phone = Product.objects.create(name='Смартфон Galaxy', price=Decimal('100.00'), category=self.phones)
+        self.popular = Product.objects.create(name='Смарт-часы', price=Decimal('100.00'), category=self.phones)
+        self.headphones = Product.objects.create(
+            name='Беспроводные наушники', price=Decimal('100.00'), category=self.audio
+        )
+        user = User.objects.create_user(username='buyer', email='buyer@example.com', password='testpass123')
+        order = Order.objects.create(user=user, total_amount=Decimal('500.00'))
+        OrderItem.objects.create(order=order, product=self.popular, quantity=5, price=Decimal('100.00'))
+
+    def suggest(self, query, **params):
+        response = self.client.get('/api/products/autocomplete/', {'q': query, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_prefix_ranked_by_popularity(self):
+        """Test word prefixes match products and categories, best sellers first."""
+        data = self.suggest('СМАР')
+        self.assertEqual([item['id'] for item in data['products']], [self.popular.id, self.phone.id])
+        self.assertEqual(data['categories'], [{'id': self.phones.id, 'name': 'Смартфоны', 'product_count': 2}])
+
+        data = self.suggest('нау')
+        self.assertEqual([item['id'] for item in data['products']], [self.headphones.id])
+        self.assertEqual([item['id'] for item in data['categories']], [self.audio.id])
+
+        data = self.suggest('беспр нау', limit=1)
+        self.assertEqual([item['id'] for item in data['products']], [self.headphones.id])
+        self.assertEqual(data['categories'], [])
+
+    def test_incremental_refresh(self):
+        """Test changed products are applied without reloading the index."""
+        self.suggest('смар')
+        self.phone.name = 'Планшет Galaxy'
+        self.phone.save()
+        self.popular.is_active = False
+        self.popular.save()
+        Product.objects.create(name='Смартфон Pixel', price=Decimal('100.00'), category=self.phones)
+
+        data = self.suggest('смар')
+        self.assertEqual([item['name'] for item in data['products']], ['Смартфон Pixel'])
+        self.assertEqual([item['id'] for item in self.suggest('план')['products']], [self.phone.id])
+        self.assertEqual(get_autocomplete().loads, 1)
+
+    def test_refresh_does_not_change_published_index(self):
+        """Test a refresh swaps in a new index and leaves the one being read intact."""
+        self.suggest('смар')
+        published = get_autocomplete().products
+        self.popular.is_active = False
+        self.popular.save()
+
+        self.suggest('смар')
+        self.assertIsNot(get_autocomplete().products, published)
+        self.assertEqual(published.search(['смар'], 10), [self.popular.id, self.phone.id])
+        self.assertEqual(get_autocomplete().products.search(['смар'], 10), [self.phone.id])
+
+    def test_refresh_without_changes_keeps_index(self):
+        """Test a refresh that finds no changes does not copy the indexes."""
+        self.suggest('смар')
+        autocomplete = get_autocomplete()
+        products, categories = autocomplete.products, autocomplete.categories
+        autocomplete.refresh()
+        self.assertIs(autocomplete.products, products)
+        self.assertIs(autocomplete.categories, categories)
+
+        Category.objects.filter(pk=self.audio.pk).update(name='Аудио')
+        autocomplete.refresh()
+        self.assertIs(autocomplete.products, products)
+        self.assertIsNot(autocomplete.categories, categories)
+
+    def test_lookup_queries(self):
+        """Test lookups between refreshes do not touch the database."""
+        self.suggest('смар')
+        with override_settings(AUTOCOMPLETE_REFRESH_INTERVAL=3600), self.assertNumQueries(0):
+            self.suggest('нау')
+
+    def test_short_query(self):
+        """Test one-letter queries are rejected."""
+        response = self.client.get('/api/products/autocomplete/', {'q': 'с'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class PrefixIndexTest(TestCase):
+    """Test prefix index top lists."""
+
+    def test_large_range_top_list(self):
+        """Test precomputed top lists follow updates."""
+        index = PrefixIndex()
+        index.load((pk, f'товар {pk}', pk % 100, None) for pk in range(1, 3001))
+        self.assertEqual(index.search(['тов'], 3), [99, 199, 299])
+        self.assertIn('тов', index.top)
+
+        index.put(5, 'товар 5', 1000)
+        index.remove(2999)
+        index.rebuild_top()
+        self.assertEqual(index.search(['тов'], 3), [5, 99, 199])
+        self.assertEqual(index.search(['тов', '28'], 2), [2899, 2898])
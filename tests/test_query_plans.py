@@ -0,0 +1,136 @@
+"""
+Query plan regression tests for list endpoints (PostgreSQL only).
+"""
+import json
+import unittest
+from decimal import Decimal
+from django.db import connection
+from django.test import TestCase
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from app.cart.models import CartItem
+from app.cart.views import CartListView
+from app.orders.models import Order
+from app.orders.views import AdminOrderListView, OrderListView
+from app.products.models import Category, Product
+from app.products.views import ProductDetailView, ProductListView
+from app.users.models import User
+
+PRODUCTS = 30000
+ORDERS = 30000
+DESCRIPTION = 'Подробное описание товара с характеристиками и условиями доставки. ' * 5
+
+# Справочники (категории) маленькие, seq scan по ним допустим
+CHECKED_TABLES = {'products_product', 'orders_order', 'orders_orderitem', 'cart_cartitem'}
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'EXPLAIN checks require PostgreSQL')
+class QueryPlanTest(TestCase):
+    """Fail if an endpoint query falls back to a sequential scan."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.categories = [
+            Category.objects.create(name=f'Category {i}') for i in range(10)
+        ]
+        Product.objects.bulk_create([
+            Product(
+                name=f'Product {i}' if i % 500 else f'Rare item {i}',
+                description=DESCRIPTION,
+                price=Decimal(100 + i % 5000),
+                stock_quantity=i % 50,
+                category=cls.categories[i % 10],
+                is_active=i % 7 != 0
+            )
+            for i in range(PRODUCTS)
+        ], batch_size=5000)
+        cls.users = User.objects.bulk_create([
+            User(username=f'user{i}', email=f'user{i}@example.com') for i in range(200)
+        ])
+        Order.objects.bulk_create([
+            Order(
+                user=cls.users[i % 200],
+                total_amount=Decimal('100.00'),
+                status=('pending', 'paid', 'delivered', 'delivered', 'cancelled')[i % 5]
+            )
+            for i in range(ORDERS)
+        ], batch_size=5000)
+        products = list(Product.objects.all()[:20])
+        CartItem.objects.bulk_create([
+            CartItem(user=user, product=product)
+            for user in cls.users for product in products
+        ])
+
+    def setUp(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        self.factory = APIRequestFactory()
+
+    def get_queryset(self, view_class, params=None, user=None, **kwargs):
+        request = Request(self.factory.get('/', params or {}))
+        request.user = user
+        view = view_class()
+        view.request = request
+        view.kwargs = kwargs
+        return view.get_queryset()
+
+    def assertNoSeqScan(self, queryset):
+        plan = json.loads(queryset.explain(format='json'))
+        nodes = [plan[0]['Plan']]
+        while nodes:
+            node = nodes.pop()
+            if node.get('Relation Name') in CHECKED_TABLES:
+                self.assertNotEqual(
+                    node['Node Type'], 'Seq Scan',
+                    f"Seq Scan on {node['Relation Name']}:\n{queryset.query}"
+                )
+            nodes.extend(node.get('Plans', []))
+
+    def test_product_list(self):
+        """Test product list paths use indexes."""
+        cases = [
+            {},
+            {'category': self.categories[3].id},
+            {'min_price': '500', 'max_price': '600'},
+            {'category': self.categories[3].id, 'min_price': '500', 'max_price': '600'},
+            {'search': 'rare'},
+        ]
+        for params in cases:
+            with self.subTest(params=params):
+                queryset = self.get_queryset(ProductListView, params)
+                self.assertNoSeqScan(queryset[:20])
+
+    def test_product_list_cursor_page(self):
+        """Test cursor page on product list uses index."""
+        queryset = self.get_queryset(ProductListView).order_by('-created_at', 'id')
+        position = queryset[100].created_at
+        self.assertNoSeqScan(queryset.filter(created_at__lt=position)[:21])
+
+    def test_product_detail(self):
+        """Test product detail lookup uses index."""
+        product = Product.objects.filter(is_active=True).first()
+        queryset = ProductDetailView.queryset.filter(pk=product.pk)
+        self.assertNoSeqScan(queryset)
+
+    def test_order_list(self):
+        """Test user order list uses index."""
+        queryset = self.get_queryset(OrderListView, user=self.users[5])
+        self.assertNoSeqScan(queryset[:20])
+
+    def test_admin_order_list(self):
+        """Test admin order list paths use indexes."""
+        cases = [
+            {},
+            {'status': 'paid'},
+            {'user': self.users[5].id},
+            {'status': 'paid', 'user': self.users[5].id},
+        ]
+        for params in cases:
+            with self.subTest(params=params):
+                queryset = self.get_queryset(AdminOrderListView, params)
+                self.assertNoSeqScan(queryset[:20])
+
+    def test_cart_list(self):
+        """Test cart list uses index."""
+        queryset = self.get_queryset(CartListView, user=self.users[5])
+        self.assertNoSeqScan(queryset[:20])
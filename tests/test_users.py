@@ -1,9 +1,12 @@
 """
 Tests for users app.
 """
-from django.test import TestCase
+import threading
+import unittest
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
 from django.contrib.auth import get_user_model
-from rest_framework.test import APITestCase
+from rest_framework.test import APIClient, APITestCase
 from rest_framework import status
 from decimal import Decimal
 
@@ -44,6 +47,23 @@ class UserModelTest(TestCase):
         # Test insufficient balance
         with self.assertRaises(ValueError):
             user.subtract_balance(Decimal('100.00'))
+        self.assertEqual(user.balance, Decimal('50.00'))
+
+    def test_balance_change_keeps_other_fields(self):
+        """Test a stale instance changes only the balance of the row."""
+        user = User.objects.create_user(**self.user_data)
+        stale = User.objects.get(pk=user.pk)
+        user.add_balance(Decimal('30.00'))
+        user.set_password('newpass123')
+        user.save(update_fields=['password'])
+
+        with self.assertNumQueries(1 if connection.vendor == 'postgresql' else 2):
+            stale.add_balance(Decimal('20.00'))
+        self.assertEqual(stale.balance, Decimal('50.00'))
+
+        user.refresh_from_db()
+        self.assertEqual(user.balance, Decimal('50.00'))
+        self.assertTrue(user.check_password('newpass123'))
 
 
 class UserAPITest(APITestCase):
@@ -113,4 +133,126 @@ class UserAPITest(APITestCase):
         
         # Check if balance was updated
         user.refresh_from_db()
-        self.assertEqual(user.balance, Decimal('100.00')) 
\ No newline at end of file
+        self.assertEqual(user.balance, Decimal('100.00'))
+
+    def test_profile_update_keeps_concurrent_debit(self):
+        """Test a profile PATCH from a stale user does not undo a debit made meanwhile."""
+        user = User.objects.create_user(
+            username='testuser', email='test@example.com', password='testpass123', balance=Decimal('100.00')
+        )
+        # Пользователь запроса прочитан до списания
+        stale = User.objects.get(pk=user.pk)
+        user.subtract_balance(Decimal('40.00'))
+
+        self.client.force_authenticate(user=stale)
+        response = self.client.patch('/api/auth/profile/', {'first_name': 'New', 'balance': '1000.00'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        user.refresh_from_db()
+        self.assertEqual(user.first_name, 'New')
+        self.assertEqual(user.balance, Decimal('60.00'))
+
+    def test_admin_balance_edit_is_saved(self):
+        """Test a balance edit in the admin is applied although save() skips the balance."""
+        admin = User.objects.create_superuser(username='admin', email='admin@example.com', password='adminpass123')
+        user = User.objects.create_user(
+            username='testuser', email='test@example.com', password='testpass123', balance=Decimal('100.00')
+        )
+        self.client.force_login(admin)
+        url = f'/admin/users/user/{user.pk}/change/'
+        form = self.client.get(url).context['adminform'].form
+        data = {name: value for name, value in form.initial.items() if value is not None}
+        data.update({
+            'balance': '150.00', 'first_name': 'New', 'date_joined_0': '2024-01-01', 'date_joined_1': '00:00:00',
+            'groups': [], 'user_permissions': [],
+        })
+        for name in ('date_joined', 'last_login', 'password'):
+            data.pop(name, None)
+
+        response = self.client.post(url, data)
+        self.assertEqual(response.status_code, 302)
+        user.refresh_from_db()
+        self.assertEqual(user.first_name, 'New')
+        self.assertEqual(user.balance, Decimal('150.00'))
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'UPDATE ... RETURNING path requires PostgreSQL')
+class UserBalanceConcurrencyTest(TransactionTestCase):
+    """Test concurrent balance changes of one account."""
+
+    def test_concurrent_debits_and_credits_are_not_lost(self):
+        """Test parallel debits and credits neither lose updates nor overdraw."""
+        user = User.objects.create_user(
+            username='buyer', email='buyer@example.com', password='testpass123', balance=Decimal('100.00')
+        )
+        barrier = threading.Barrier(60)
+        debited, failed = [], []
+
+        def debit():
+            # Каждый поток работает со своим, заранее прочитанным экземпляром
+            account = User.objects.get(pk=user.pk)
+            barrier.wait()
+            try:
+                for _ in range(5):
+                    try:
+                        account.subtract_balance(Decimal('3.00'))
+                        debited.append(1)
+                    except ValueError:
+                        failed.append(1)
+            finally:
+                connection.close()
+
+        def credit():
+            account = User.objects.get(pk=user.pk)
+            barrier.wait()
+            try:
+                for _ in range(5):
+                    account.add_balance(Decimal('1.00'))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=debit) for _ in range(40)]
+        threads += [threading.Thread(target=credit) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        user.refresh_from_db()
+        self.assertEqual(len(debited) + len(failed), 200)
+        self.assertEqual(user.balance, Decimal('200.00') - 3 * len(debited))
+        self.assertGreaterEqual(user.balance, Decimal('0.00'))
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'waiting on the key index is tested on PostgreSQL')
+class UserBalanceIdempotencyTest(TransactionTestCase):
+    """Test concurrent top-ups sent with the same Idempotency-Key."""
+
+    def test_concurrent_duplicates_credit_once(self):
+        """Test in-flight duplicates wait for the first request and replay it."""
+        user = User.objects.create_user(username='buyer', email='buyer@example.com', password='testpass123')
+        barrier = threading.Barrier(10)
+        responses = []
+
+        def top_up():
+            client = APIClient()
+            client.force_authenticate(user=user)
+            barrier.wait()
+            try:
+                responses.append(client.post(
+                    '/api/auth/balance/', {'amount': '100.00'}, format='json', HTTP_IDEMPOTENCY_KEY='top-up-1'
+                ))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=top_up) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        user.refresh_from_db()
+        self.assertEqual(user.balance, Decimal('100.00'))
+        self.assertEqual({response.status_code for response in responses}, {status.HTTP_200_OK})
+        self.assertEqual(sum(response.has_header('Idempotent-Replayed') for response in responses), 9)
+        self.assertEqual(len({response.content for response in responses}), 1)